@@ -12,6 +12,34 @@ const Timetable = require("../models/Timetable");
 
 const upload = multer({ dest: "uploads/" });
 
+const PIPELINE_URL = "http://localhost:5000";
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+/**
+ * Submit a video to the pipeline as a background job and poll until it finishes.
+ * Keeps each HTTP call short instead of holding one connection open for the whole analysis.
+ */
+async function recognizeVideo(form, { pollMs = 2000, deadlineMs = 60 * 60 * 1000 } = {}) {
+  form.append("async", "1");
+  const submit = await axios.post(`${PIPELINE_URL}/video_recognize`, form, {
+    headers: form.getHeaders(),
+    maxContentLength: Infinity, maxBodyLength: Infinity, timeout: 120000
+  });
+  const jobId = submit.data.job_id;
+
+  const deadline = Date.now() + deadlineMs;
+  while (Date.now() < deadline) {
+    await sleep(pollMs);
+    const { data: job } = await axios.get(`${PIPELINE_URL}/jobs/${jobId}`, { timeout: 10000 });
+    if (job.status === "done") return job.result;
+    if (job.status === "failed" || job.status === "cancelled") {
+      throw new Error(job.error || `Video analysis ${job.status}`);
+    }
+  }
+  await axios.delete(`${PIPELINE_URL}/jobs/${jobId}`).catch(() => {});
+  throw new Error("Video analysis timed out");
+}
+
 // helper
 function getTodayInfo() {
   const today = new Date();
@@ -92,12 +120,12 @@ router.post("/upload", upload.single("video"), async (req, res) => {
     form.append("sample_fps", req.body.sample_fps || "1.0");
     form.append("min_confidence_frames", req.body.min_frames || "1");
 
-    const pyRes = await axios.post("http://localhost:5000/video_recognize", form, {
-      headers: form.getHeaders(),
-      maxContentLength: Infinity, maxBodyLength: Infinity, timeout: 120000
-    });
+    // No roster is sent: students are not stored per class, and a roster of
+    // every student would neither let the analysis stop early nor match the
+    // lecture's professor. Send one (with the professor's prof_<name>_<subject>
+    // id) once the class list of a lecture is known.
 
-    const result = pyRes.data;
+    const result = await recognizeVideo(form);
 
     if (result && result.summary && result.summary.length > 0) {
       for (const s of result.summary) {
@@ -1,26 +1,125 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 import os
+import queue
 import tempfile
+import threading
+import time
 import shutil
+from contextlib import ExitStack, contextmanager
+from functools import partial
 from werkzeug.utils import secure_filename
 from enroll import generate_embedding_for_person
-from run_pipeline import analyze_video
+from bulk_enroll import bulk_enroll
+from run_pipeline import analyze_video, analyze_videos, display_name
+from face_lib.engine import get_shared_engine, is_engine_loaded
+from face_lib.gallery import get_gallery
+from face_lib.log import configure_logging
+from face_lib.metrics import REGISTRY, StageTimings
+from face_lib.motion import MotionGate
+from jobs import JobManager, QueueFullError
+from streaming import UploadPipe
 import json
 
 app = Flask(__name__)
+# Levels, rate limit and JSON-lines sink from PIPELINE_LOG_LEVEL / PIPELINE_LOG_RATE / PIPELINE_LOG_JSON
+configure_logging()
 
 # Configuration
 UPLOAD_FOLDER = "temp_uploads"
 # Use relative path from the pipeline directory
 PIPELINE_DB_DIR = os.path.join(os.path.dirname(__file__), "data", "output", "embeddings", "known_db")
+# Latest snapshot of each live session (files, so every server worker sees them)
+LIVE_DIR = os.path.join(os.path.dirname(__file__), "data", "output", "live")
+# Worker processes per /video_recognize call (each loads its own model copy)
+VIDEO_WORKERS = int(os.environ.get("PIPELINE_VIDEO_WORKERS", "1"))
+# Background analysis jobs (POST /video_recognize with async=1)
+job_manager = JobManager(max_workers=int(os.environ.get("PIPELINE_JOB_WORKERS", "2")),
+                         max_pending=int(os.environ.get("PIPELINE_JOB_QUEUE", "16")),
+                         result_ttl=int(os.environ.get("PIPELINE_JOB_TTL", "3600")))
+# CPU-heavy inference (video analysis, enrollment) running at once in this process, and how
+# long a synchronous request waits for a free slot before it is turned away with 503
+INFERENCE_CONCURRENCY = int(os.environ.get("PIPELINE_INFERENCE_CONCURRENCY", "2"))
+INFERENCE_WAIT = float(os.environ.get("PIPELINE_INFERENCE_WAIT", "30"))
+# Largest accepted request body (uploads), in MB
+app.config["MAX_CONTENT_LENGTH"] = int(float(os.environ.get("PIPELINE_MAX_UPLOAD_MB", "1024")) * 1024 * 1024)
 if not os.path.exists(PIPELINE_DB_DIR):
     os.makedirs(PIPELINE_DB_DIR, exist_ok=True)
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
+# Values read when /metrics is scraped
+REGISTRY.gauge("pipeline_jobs_in_flight", job_manager.pending_count, "Background jobs queued or running")
+REGISTRY.gauge("pipeline_gallery_identities", lambda: len(get_gallery(PIPELINE_DB_DIR)), "Enrolled people")
+REGISTRY.gauge("pipeline_model_loaded", is_engine_loaded, "1 once the face models are loaded")
+
+class ServerBusyError(Exception):
+    """Raised when no inference slot frees up in time."""
+
+_inference_slots = threading.BoundedSemaphore(INFERENCE_CONCURRENCY)
+_inference_active = 0
+REGISTRY.gauge("pipeline_inference_active", lambda: _inference_active, "Inference calls running in this process")
+
+@contextmanager
+def inference_slot(wait=INFERENCE_WAIT):
+    """Holds one of the INFERENCE_CONCURRENCY slots; waits up to `wait` seconds (None = forever)."""
+    global _inference_active
+    if not _inference_slots.acquire(timeout=wait):
+        raise ServerBusyError(f"All {INFERENCE_CONCURRENCY} inference slots are busy")
+    _inference_active += 1
+    try:
+        yield
+    finally:
+        _inference_active -= 1
+        _inference_slots.release()
+
+@app.errorhandler(ServerBusyError)
+def _server_busy(e):
+    response = jsonify({"error": f"Server busy: {e}. Retry later or use async=1."})
+    response.headers["Retry-After"] = "30"
+    return response, 503
+
+@app.errorhandler(413)
+def _too_large(e):
+    limit_mb = app.config["MAX_CONTENT_LENGTH"] / (1024 * 1024)
+    return jsonify({"error": f"Upload too large (limit {limit_mb:g} MB)"}), 413
+
+@app.before_request
+def _start_timer():
+    g.request_start = time.perf_counter()
+    # Refuse oversized uploads before reading them (Flask would only notice when the form is parsed)
+    limit = app.config["MAX_CONTENT_LENGTH"]
+    if limit and request.content_length is not None and request.content_length > limit:
+        return _too_large(None)
+
+@app.after_request
+def _record_latency(response):
+    start = g.get("request_start")
+    if start is not None:
+        # Streaming responses are timed up to their first byte
+        endpoint = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        REGISTRY.observe("pipeline_request_seconds", time.perf_counter() - start, "API request latency",
+                         endpoint=endpoint, method=request.method, status=response.status_code)
+    return response
+
+def _save_upload(file, path, timings):
+    """Saves an uploaded file, timing it as the 'upload' stage."""
+    upload = StageTimings()
+    with upload.stage("upload"):
+        file.save(path)
+    REGISTRY.record(upload)
+    if timings is not None:
+        timings.merge(upload)
+
 @app.route("/health", methods=["GET"])
 def health_check():
     """Health check endpoint"""
-    return jsonify({"status": "healthy", "service": "pipeline-api"})
+    return jsonify({"status": "healthy", "service": "pipeline-api", "model_loaded": is_engine_loaded(),
+                    "pending_jobs": job_manager.pending_count()})
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """Prometheus metrics: request and per-stage latency histograms, frame/face/embedding
+    counters (use rate() for frames/s and faces/s), gallery size, in-flight jobs"""
+    return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
 
 @app.route("/enroll", methods=["POST"])
 def enroll_student():
@@ -57,16 +156,22 @@ def enroll_student():
         
         # Generate embeddings using pipeline
         person_id = f"{name}_{rollno}" if rollno else name
-        success = generate_embedding_for_person(temp_person_dir, PIPELINE_DB_DIR, person_id)
-        
-        # Cleanup temporary files
-        shutil.rmtree(temp_person_dir, ignore_errors=True)
+        try:
+            with inference_slot():
+                success = generate_embedding_for_person(temp_person_dir, PIPELINE_DB_DIR, person_id,
+                                                        engine=get_shared_engine(),
+                                                        gallery=get_gallery(PIPELINE_DB_DIR))
+        finally:
+            # Cleanup temporary files
+            shutil.rmtree(temp_person_dir, ignore_errors=True)
         
         if success:
             return jsonify({"message": f"Successfully enrolled {name}", "person_id": person_id})
         else:
             return jsonify({"error": "Failed to generate embeddings"}), 500
             
+    except ServerBusyError:
+        raise
     except Exception as e:
         return jsonify({"error": f"Enrollment failed: {str(e)}"}), 500
 
@@ -105,22 +210,183 @@ def enroll_professor():
         
         # Generate embeddings using pipeline
         person_id = f"prof_{name}_{subject}" if subject else f"prof_{name}"
-        success = generate_embedding_for_person(temp_person_dir, PIPELINE_DB_DIR, person_id)
-        
-        # Cleanup temporary files
-        shutil.rmtree(temp_person_dir, ignore_errors=True)
+        try:
+            with inference_slot():
+                success = generate_embedding_for_person(temp_person_dir, PIPELINE_DB_DIR, person_id,
+                                                        engine=get_shared_engine(),
+                                                        gallery=get_gallery(PIPELINE_DB_DIR))
+        finally:
+            # Cleanup temporary files
+            shutil.rmtree(temp_person_dir, ignore_errors=True)
         
         if success:
             return jsonify({"message": f"Successfully enrolled professor {name}", "person_id": person_id})
         else:
             return jsonify({"error": "Failed to generate embeddings"}), 500
             
+    except ServerBusyError:
+        raise
     except Exception as e:
         return jsonify({"error": f"Professor enrollment failed: {str(e)}"}), 500
 
+def _remove_files(*paths):
+    """Deletes uploaded temporary files that still exist."""
+    for path in paths:
+        if path and os.path.exists(path):
+            os.unlink(path)
+
+def _run_bulk_enroll(archive_path, wait=INFERENCE_WAIT, progress_callback=None):
+    """Enrolls everyone in an uploaded archive (may run as a background job)."""
+    with inference_slot(wait):
+        results = bulk_enroll(archive_path, PIPELINE_DB_DIR, engine=get_shared_engine(),
+                              gallery=get_gallery(PIPELINE_DB_DIR), progress_callback=progress_callback)
+    if "error" in results:
+        raise RuntimeError(results["error"])
+    return results
+
+@app.route("/enroll/bulk", methods=["POST"])
+def enroll_bulk():
+    """Enroll a whole class from one zip archive
+
+    The form field `archive` is a zip with one folder per person, named after
+    the person id (e.g. name_rollno), holding that person's photos. The
+    response lists who was enrolled or failed and, per person, the images
+    that were skipped and why. With async=1 the enrollment runs as a
+    background job (202 + job_id, poll GET /jobs/<job_id>).
+    """
+    try:
+        archive = request.files.get("archive")
+        if archive is None or archive.filename == '':
+            return jsonify({"error": "No archive provided"}), 400
+
+        with tempfile.NamedTemporaryFile(delete=False, suffix=".zip") as temp_file:
+            archive_path = temp_file.name
+            archive.save(archive_path)
+
+        if _parse_flag(request.form.get("async"), False):
+            try:
+                job = job_manager.submit("enroll_bulk", _run_bulk_enroll, archive_path, wait=None,
+                                         cleanup=partial(_remove_files, archive_path))
+            except QueueFullError as e:
+                _remove_files(archive_path)
+                response = jsonify({"error": str(e)})
+                response.headers["Retry-After"] = "30"
+                return response, 503
+            return jsonify({"job_id": job.id, "status": job.status, "status_url": f"/jobs/{job.id}"}), 202
+
+        try:
+            results = _run_bulk_enroll(archive_path)
+        finally:
+            _remove_files(archive_path)
+        return jsonify(results), (200 if results["success"] else 422)
+
+    except ServerBusyError:
+        raise
+    except Exception as e:
+        return jsonify({"error": f"Bulk enrollment failed: {str(e)}"}), 500
+
+def _parse_roster(value):
+    """Expected roster from a request field: a JSON list or comma-separated person ids
+    (or a list already decoded from JSON). Raises ValueError if malformed."""
+    if not value:
+        return None
+    if isinstance(value, list):
+        return [str(person_id) for person_id in value]
+    if not isinstance(value, str):
+        raise ValueError("roster must be a list of person ids")
+    value = value.strip()
+    if value.startswith("["):
+        try:
+            person_ids = json.loads(value)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"roster is not a valid JSON list: {e}")
+        return [str(person_id) for person_id in person_ids]
+    return [person_id.strip() for person_id in value.split(",") if person_id.strip()]
+
+def _parse_time_budget(value):
+    """Time budget in seconds from a request field, or None. Raises ValueError if not a number."""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        raise ValueError(f"time_budget must be a number of seconds, got {value!r}")
+
+def _parse_detection(fields):
+    """Per-request detection settings (det_size, det_max_side, min_face_size, max_faces), or None for the defaults."""
+    names = ("det_size", "det_max_side", "min_face_size", "max_faces")
+    if not any(fields.get(name) for name in names):
+        return None
+    def number(name):
+        return int(fields[name]) if fields.get(name) else None
+    return get_shared_engine().detection.replace(det_size=fields.get("det_size") or None,
+                                                 max_side=number("det_max_side"),
+                                                 min_face_size=number("min_face_size"),
+                                                 max_faces=number("max_faces"))
+
+def _parse_motion(fields):
+    """A MotionGate if motion_gate=1 (tuned by motion_threshold and motion_max_gap), else None."""
+    if not _parse_flag(fields.get("motion_gate"), False):
+        return None
+    settings = {}
+    if fields.get("motion_threshold"):
+        settings["threshold"] = float(fields["motion_threshold"])
+    if fields.get("motion_max_gap"):
+        settings["max_gap"] = int(fields["motion_max_gap"])
+    return MotionGate(**settings)
+
+def _parse_workers(value):
+    """Worker processes for one request, clamped to [1, PIPELINE_VIDEO_WORKERS]. Raises ValueError if not an integer."""
+    if not value:
+        return VIDEO_WORKERS
+    try:
+        workers = int(value)
+    except ValueError:
+        raise ValueError(f"workers must be an integer, got {value!r}")
+    return min(max(workers, 1), VIDEO_WORKERS)
+
+def _parse_flag(value, default):
+    """Boolean request field ("1"/"true"/"yes" or "0"/"false"/"no")."""
+    if not value:
+        return default
+    return value.lower() in ("1", "true", "yes")
+
+def _run_video_analysis(video_path, workers, roster=None, time_budget=None, tracking=True, detection=None,
+                        timings=None, debug=False, motion=None, progress_callback=None):
+    """Analyzes an uploaded video (runs as a background job)."""
+    engine = get_shared_engine() if workers <= 1 else None
+    with inference_slot(wait=None):
+        results = analyze_video(video_path, return_results=True, engine=engine, workers=workers,
+                                progress_callback=progress_callback, roster=roster, time_budget=time_budget,
+                                tracking=tracking, detection=detection, timings=timings, debug=debug,
+                                motion=motion)
+    if not results["success"]:
+        raise RuntimeError(results.get("error", "Video analysis failed"))
+    return results
+
 @app.route("/video_recognize", methods=["POST"])
 def video_recognize():
-    """Analyze video for face recognition using pipeline model"""
+    """Analyze video for face recognition using pipeline model
+
+    With the form field async=1 the analysis is queued as a background job and
+    the response (202) only carries its job_id; poll GET /jobs/<job_id>.
+    Optional form fields: roster (expected person ids, JSON list or
+    comma-separated; only they are matched and analysis stops once all are
+    found), time_budget (seconds), workers (parallel worker processes,
+    clamped to 1..PIPELINE_VIDEO_WORKERS; above 1 the video is analysed
+    without tracking and motion gate) and tracking (default 1; 0 embeds
+    every detected face instead of following faces across frames). Detection can
+    be tuned per request with det_size ("640x640", or "960" for the longest
+    side), det_max_side (downscale larger frames first), min_face_size and
+    max_faces; the defaults come from the PIPELINE_DET_* environment variables.
+    With motion_gate=1, sampled frames that barely differ from the last
+    analysed one skip detection (tune with motion_threshold, the fraction of
+    pixels that must change, and motion_max_gap, the most frames skipped in a
+    row); 'frames_motion_skipped' then reports how many were.
+    With timing=1 the results include a per-stage 'timing' breakdown, and with
+    debug=1 the best gallery candidates of every embedded face ('debug_matches',
+    also written to the server log).
+    """
     try:
         if 'file' not in request.files:
             return jsonify({"error": "No video file provided"}), 400
@@ -129,6 +395,19 @@ def video_recognize():
         if file.filename == '':
             return jsonify({"error": "No video file selected"}), 400
         
+        try:
+            workers = _parse_workers(request.form.get("workers"))
+            roster = _parse_roster(request.form.get("roster"))
+            time_budget = _parse_time_budget(request.form.get("time_budget"))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        run_async = _parse_flag(request.form.get("async"), False)
+        tracking = _parse_flag(request.form.get("tracking"), True)
+        detection = _parse_detection(request.form)
+        timings = StageTimings() if _parse_flag(request.form.get("timing"), False) else None
+        debug = _parse_flag(request.form.get("debug"), False)
+        motion = _parse_motion(request.form)
+        
         # Save uploaded video to temporary file
         temp_video_path = None
         try:
@@ -136,10 +415,28 @@ def video_recognize():
             suffix = os.path.splitext(secure_filename(file.filename))[1]
             with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
                 temp_video_path = temp_file.name
-                file.save(temp_video_path)
+            _save_upload(file, temp_video_path, timings)
+            
+            if run_async:
+                try:
+                    job = job_manager.submit("video_recognize", _run_video_analysis, temp_video_path, workers,
+                                             roster=roster, time_budget=time_budget, tracking=tracking,
+                                             detection=detection, timings=timings, debug=debug, motion=motion,
+                                             cleanup=partial(_remove_files, temp_video_path))
+                except QueueFullError as e:
+                    response = jsonify({"error": str(e)})
+                    response.headers["Retry-After"] = "30"
+                    return response, 503
+                temp_video_path = None  # the job owns the file now
+                return jsonify({"job_id": job.id, "status": job.status,
+                                "status_url": f"/jobs/{job.id}"}), 202
             
             # Analyze video using pipeline
-            results = analyze_video(temp_video_path, return_results=True)
+            engine = get_shared_engine() if workers <= 1 else None
+            with inference_slot():
+                results = analyze_video(temp_video_path, return_results=True, engine=engine, workers=workers,
+                                        roster=roster, time_budget=time_budget, tracking=tracking,
+                                        detection=detection, timings=timings, debug=debug, motion=motion)
             
             if results["success"]:
                 return jsonify(results)
@@ -148,12 +445,215 @@ def video_recognize():
                 
         finally:
             # Cleanup temporary video file
-            if temp_video_path and os.path.exists(temp_video_path):
-                os.unlink(temp_video_path)
+            _remove_files(temp_video_path)
                 
+    except ServerBusyError:
+        raise
+    except Exception as e:
+        return jsonify({"error": f"Video analysis failed: {str(e)}"}), 500
+
+def _run_batch_analysis(videos, workers, tracking=True, detection=None, timings=None, debug=False, motion=None,
+                        wait=None, progress_callback=None):
+    """Analyzes a batch of uploaded videos."""
+    with inference_slot(wait=wait):
+        results = analyze_videos(videos, workers=workers, engine=get_shared_engine() if workers <= 1 else None,
+                                 tracking=tracking, detection=detection, timings=timings, debug=debug,
+                                 motion=motion, progress_callback=progress_callback)
+    if not results["success"]:
+        raise RuntimeError(results.get("error", "Video analysis failed"))
+    for video, entry in zip(results["videos"], videos):
+        video["video"] = entry["filename"]  # the uploaded name, not the temporary one
+    return results
+
+@app.route("/video_recognize/batch", methods=["POST"])
+def video_recognize_batch():
+    """Analyze many videos (e.g. a day's classroom recordings) as one batch
+
+    Upload the videos as repeated `files` fields. The optional form field
+    `videos` is a JSON list with one object per file, in upload order, each
+    with a `tag` (e.g. the class) and/or a `roster` (person ids expected in
+    that video). The segments of all videos share one pool of `workers`
+    processes (default PIPELINE_VIDEO_WORKERS), so the batch finishes sooner
+    than the same videos sent one by one. tracking, timing, debug, the motion
+    gate and the detection settings apply to every video as for /video_recognize.
+
+    Runs as a background job by default (202 with job_id; poll GET
+    /jobs/<job_id>, whose result holds a summary per video); async=0 waits
+    for the results instead.
+    """
+    try:
+        files = [file for file in request.files.getlist("files") if file.filename]
+        if not files:
+            return jsonify({"error": "No video files provided"}), 400
+        try:
+            metadata = json.loads(request.form.get("videos") or "[]")
+        except json.JSONDecodeError:
+            metadata = None
+        if not isinstance(metadata, list) or len(metadata) > len(files) \
+                or not all(isinstance(meta, dict) for meta in metadata):
+            return jsonify({"error": "videos must be a JSON list with at most one object per file"}), 400
+        metadata += [{}] * (len(files) - len(metadata))
+
+        try:
+            workers = _parse_workers(request.form.get("workers"))
+            rosters = [_parse_roster(meta.get("roster")) for meta in metadata]
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        run_async = _parse_flag(request.form.get("async"), True)
+        tracking = _parse_flag(request.form.get("tracking"), True)
+        detection = _parse_detection(request.form)
+        timings = StageTimings() if _parse_flag(request.form.get("timing"), False) else None
+        debug = _parse_flag(request.form.get("debug"), False)
+        motion = _parse_motion(request.form)
+
+        videos = []
+        try:
+            for file, meta, roster in zip(files, metadata, rosters):
+                suffix = os.path.splitext(secure_filename(file.filename))[1]
+                with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
+                    videos.append({"video": temp_file.name, "filename": file.filename, "tag": meta.get("tag"),
+                                   "roster": roster})
+                _save_upload(file, temp_file.name, timings)
+
+            if run_async:
+                try:
+                    job = job_manager.submit("video_recognize_batch", _run_batch_analysis, videos, workers,
+                                             tracking=tracking, detection=detection, timings=timings,
+                                             debug=debug, motion=motion,
+                                             cleanup=partial(_remove_files, *[entry["video"] for entry in videos]))
+                except QueueFullError as e:
+                    response = jsonify({"error": str(e)})
+                    response.headers["Retry-After"] = "30"
+                    return response, 503
+                videos = []  # the job owns the files now
+                return jsonify({"job_id": job.id, "status": job.status,
+                                "status_url": f"/jobs/{job.id}"}), 202
+
+            results = _run_batch_analysis(videos, workers, tracking=tracking, detection=detection,
+                                          timings=timings, debug=debug, motion=motion, wait=INFERENCE_WAIT)
+            return jsonify(results)
+        finally:
+            _remove_files(*[entry["video"] for entry in videos])
+
+    except ServerBusyError:
+        raise
     except Exception as e:
         return jsonify({"error": f"Video analysis failed: {str(e)}"}), 500
 
+@app.route("/video_recognize/stream", methods=["POST"])
+def video_recognize_stream():
+    """Analyze a video while it is still being uploaded
+
+    The request body is the raw video (not multipart); pass ?filename=<name>
+    so the container type is known, and optionally roster, time_budget,
+    tracking, timing, debug, the motion gate and the detection settings as for /video_recognize. The response is newline-delimited JSON:
+    a "recognized" event as soon as each person is first found, then one
+    final "summary" (or "error") event.
+    """
+    suffix = os.path.splitext(secure_filename(request.args.get("filename", "upload.mp4")))[1] or ".mp4"
+    try:
+        roster = _parse_roster(request.args.get("roster"))
+        time_budget = _parse_time_budget(request.args.get("time_budget"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    tracking = _parse_flag(request.args.get("tracking"), True)
+    detection = _parse_detection(request.args)
+    timings = StageTimings() if _parse_flag(request.args.get("timing"), False) else None
+    debug = _parse_flag(request.args.get("debug"), False)
+    motion = _parse_motion(request.args)
+    # Claim the inference slot before accepting the upload; the analysis thread releases it
+    slot = ExitStack()
+    slot.enter_context(inference_slot())
+    try:
+        pipe = UploadPipe(request.stream, suffix=suffix).start()
+    except Exception:
+        slot.close()
+        raise
+    events = queue.Queue()
+
+    def on_recognized(person_id, confidence, frame_index):
+        events.put({"event": "recognized", "user": display_name(person_id), "person_id": person_id,
+                    "confidence": float(confidence), "frame": int(frame_index)})
+
+    def run():
+        try:
+            results = analyze_video(pipe.path, return_results=True, engine=get_shared_engine(),
+                                    on_recognized=on_recognized, roster=roster, time_budget=time_budget,
+                                    tracking=tracking, detection=detection, timings=timings, debug=debug,
+                                    motion=motion)
+            if results["success"] and results["frames_scanned"] == 0:
+                events.put({"event": "error", "error": "Could not decode the uploaded stream. Use a container that "
+                            "can be read front to back (MKV, WebM, MPEG-TS, AVI, faststart MP4) or /video_recognize"})
+            elif results["success"]:
+                results["bytes_received"] = pipe.bytes_received
+                events.put(dict(results, event="summary"))
+            else:
+                events.put({"event": "error", "error": results.get("error", "Video analysis failed")})
+        except Exception as e:
+            events.put({"event": "error", "error": f"Video analysis failed: {str(e)}"})
+        finally:
+            slot.close()
+            events.put(None)
+
+    threading.Thread(target=run, name="stream-analysis", daemon=True).start()
+
+    def generate():
+        try:
+            while True:
+                event = events.get()
+                if event is None:
+                    break
+                yield json.dumps(event) + "\n"
+        finally:
+            pipe.close()
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    """Status, progress and (once done) result of a background job"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Job not found or expired: {job_id}"}), 404
+    return jsonify(job.to_dict())
+
+@app.route("/jobs/<job_id>", methods=["DELETE"])
+def cancel_job(job_id):
+    """Cancel a queued or running background job"""
+    job = job_manager.cancel(job_id)
+    if job is None:
+        return jsonify({"error": f"Job not found or expired: {job_id}"}), 404
+    return jsonify(job.to_dict())
+
+def _live_session_path(session_id):
+    name = secure_filename(session_id)
+    return os.path.join(LIVE_DIR, f"{name}.json") if name else None
+
+@app.route("/live/<session_id>/recognitions", methods=["POST"])
+def live_recognitions(session_id):
+    """Receive the rolling recognitions of a live session (posted periodically by live_attendance.py)"""
+    path = _live_session_path(session_id)
+    snapshot = request.get_json(silent=True)
+    if path is None or not isinstance(snapshot, dict):
+        return jsonify({"error": "Expected a JSON session snapshot"}), 400
+    snapshot["session_id"] = session_id
+    snapshot["received_at"] = time.time()
+    os.makedirs(LIVE_DIR, exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f)
+    os.replace(temp_path, path)
+    return jsonify({"message": "Recorded", "recognized_count": len(snapshot.get("recognized", []))})
+
+@app.route("/live/<session_id>", methods=["GET"])
+def live_session(session_id):
+    """Latest recognitions of a live session"""
+    path = _live_session_path(session_id)
+    if path is None or not os.path.exists(path):
+        return jsonify({"error": f"Live session not found: {session_id}"}), 404
+    with open(path, encoding="utf-8") as f:
+        return jsonify(json.load(f))
+
 @app.route("/delete_person", methods=["POST"])
 def delete_person():
     """Delete a person's embedding from the pipeline database"""
@@ -164,13 +664,11 @@ def delete_person():
         if not person_id:
             return jsonify({"error": "Missing person_id parameter"}), 400
         
-        # Delete embedding file
-        embedding_path = os.path.join(PIPELINE_DB_DIR, f"{person_id}.npy")
-        if os.path.exists(embedding_path):
-            os.remove(embedding_path)
+        # Delete the embedding from the store and the in-memory gallery
+        if get_gallery(PIPELINE_DB_DIR).delete(person_id):
             return jsonify({"message": f"Successfully deleted {person_id}"})
         else:
-            return jsonify({"error": f"Embedding file not found for {person_id}"}), 404
+            return jsonify({"error": f"Embedding not found for {person_id}"}), 404
             
     except Exception as e:
         return jsonify({"error": f"Deletion failed: {str(e)}"}), 500
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Benchmark of enrollment throughput: one image at a time vs the bulk path.
+
+The serial baseline reads and embeds each image with cv2.imread() and
+get_embedding(), as enroll.py used to; the bulk path decodes on a thread
+pool and embeds faces in batches (face_lib.enrollment.embed_people).
+Nothing is written to the database.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import cv2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from face_lib.engine import get_shared_engine
+from face_lib.enrollment import embed_people, find_person_images
+
+def time_serial(engine, people):
+    """Returns (seconds, embedded images) for the one-image-at-a-time loop."""
+    start = time.perf_counter()
+    embedded = 0
+    for paths in people.values():
+        for path in paths:
+            if engine.get_embedding(cv2.imread(path)) is not None:
+                embedded += 1
+    return time.perf_counter() - start, embedded
+
+def time_bulk(engine, people, workers, batch_size):
+    """Returns (seconds, embedded images) for the threaded, batched path."""
+    start = time.perf_counter()
+    _, report = embed_people(engine, people, decode_workers=workers, batch_size=batch_size)
+    return time.perf_counter() - start, sum(entry["embedded"] for entry in report.values())
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark serial vs bulk enrollment.")
+    parser.add_argument('--source', type=str, default=os.path.join("data", "known_faces"),
+                        help='Folder with one sub-folder of photos per person (default: data/known_faces)')
+    parser.add_argument('--repeat', type=int, default=4,
+                        help='Enroll every person this many times, to simulate a larger intake (default: 4)')
+    parser.add_argument('--workers', type=int, default=8, help='Decoding threads for the bulk path (default: 8)')
+    parser.add_argument('--batch_size', type=int, default=64, help='Faces per recognition batch (default: 64)')
+    args = parser.parse_args()
+
+    people = {f"{person_id}#{i}": paths for i in range(args.repeat)
+              for person_id, paths in find_person_images(args.source).items()}
+    num_images = sum(len(paths) for paths in people.values())
+    print(f"🧠 {len(people)} people, {num_images} images from {args.source}")
+
+    engine = get_shared_engine()
+    # Warm up the ONNX sessions so neither side pays for the first call
+    embed_people(engine, dict(list(people.items())[:1]))
+
+    serial_seconds, serial_embedded = time_serial(engine, people)
+    bulk_seconds, bulk_embedded = time_bulk(engine, people, args.workers, args.batch_size)
+    print(f"  serial {serial_seconds:8.2f}s  {num_images / serial_seconds:7.1f} images/s  ({serial_embedded} embedded)")
+    print(f"  bulk   {bulk_seconds:8.2f}s  {num_images / bulk_seconds:7.1f} images/s  ({bulk_embedded} embedded)  "
+          f"{serial_seconds / bulk_seconds:5.1f}x")
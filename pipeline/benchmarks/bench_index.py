@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the gallery search indexes on a large synthetic gallery.
+
+Reports build time, query latency and recall@1 of each approximate index
+against the exact 'flat' scan.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from face_lib.index import make_index
+from benchmarks.synthetic import make_synthetic_gallery, make_probes
+
+def time_index(kind, matrix, probes, **params):
+    """Returns (build seconds, search seconds, top-1 rows) for one index type."""
+    index = make_index(kind, **params)
+    alive = np.ones(len(matrix), dtype=bool)
+    start = time.perf_counter()
+    index.build(matrix, alive)
+    built = time.perf_counter() - start
+
+    start = time.perf_counter()
+    rows, _ = index.search(probes, matrix, alive, 1)
+    searched = time.perf_counter() - start
+    return built, searched, rows[:, 0]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark gallery search indexes.")
+    parser.add_argument('--identities', type=int, default=50000, help='Gallery size (default: 50000)')
+    parser.add_argument('--probes', type=int, default=500, help='Number of query embeddings (default: 500)')
+    parser.add_argument('--nprobe', type=int, default=8, help='IVF buckets searched per query (default: 8)')
+    parser.add_argument('--rerank', type=int, default=64, help='PQ candidates re-scored exactly (default: 64)')
+    args = parser.parse_args()
+
+    _, matrix = make_synthetic_gallery(args.identities)
+    _, probes = make_probes(matrix, args.probes)
+    print(f"🗂️ Gallery: {args.identities} identities, {args.probes} probes")
+
+    params = {'flat': {}, 'ivf': {'nprobe': args.nprobe}, 'pq': {'rerank': args.rerank}}
+    exact = None
+    for kind in ('flat', 'ivf', 'pq'):
+        built, searched, top = time_index(kind, matrix, probes, **params[kind])
+        if exact is None:
+            exact = top
+        recall = float(np.mean(top == exact))
+        print(f"  {kind:4s} build {built:7.2f}s  search {1000 * searched / len(probes):7.3f} ms/probe  "
+              f"recall@1 {recall:.3f}")
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Benchmark of compact gallery storage: float32 ('flat'), float16 and int8.
+
+Reports the memory the scanned rows take, query latency, and how often the
+top-1 identity and the match / no-match decision at the threshold agree
+with the exact float32 scan.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from face_lib.index import make_index
+from face_lib.store import normalize_rows
+from benchmarks.synthetic import make_synthetic_gallery, make_probes
+
+PRECISIONS = (('float32', 'flat'), ('float16', 'fp16'), ('int8', 'int8'))
+
+def time_precision(kind, matrix, probes, repeat):
+    """Returns (bytes scanned per query, best search seconds, top-1 rows, top-1 scores) for one index type."""
+    index = make_index(kind)
+    alive = np.ones(len(matrix), dtype=bool)
+    index.build(matrix, alive)
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows, scores = index.search(probes, matrix, alive, 1)
+        best = min(best, time.perf_counter() - start)
+    nbytes = getattr(index, "nbytes", matrix.nbytes)
+    return nbytes, best, rows[:, 0], scores[:, 0]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark float32 / float16 / int8 gallery matching.")
+    parser.add_argument('--identities', type=int, default=100000, help='Gallery size (default: 100000)')
+    parser.add_argument('--probes', type=int, default=500, help='Number of query embeddings (default: 500)')
+    parser.add_argument('--noise', type=float, default=1.2,
+                        help='Probe noise; the default puts most scores near the threshold (default: 1.2)')
+    parser.add_argument('--threshold', type=float, default=0.6, help='Match threshold (default: 0.6)')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per measurement; the best is kept (default: 3)')
+    args = parser.parse_args()
+
+    _, matrix = make_synthetic_gallery(args.identities)
+    _, probes = make_probes(matrix, args.probes, noise=args.noise)
+    probes = normalize_rows(probes)
+    print(f"🗂️ Gallery: {args.identities} identities, {args.probes} probes, threshold {args.threshold}")
+
+    exact_rows = exact_scores = None
+    for precision, kind in PRECISIONS:
+        nbytes, seconds, rows, scores = time_precision(kind, matrix, probes, args.repeat)
+        if exact_rows is None:
+            exact_rows, exact_scores = rows, scores
+        same = float(np.mean(rows == exact_rows))
+        decisions = float(np.mean(np.where(scores >= args.threshold, rows, -1)
+                                  == np.where(exact_scores >= args.threshold, exact_rows, -1)))
+        print(f"  {precision:7s} {nbytes / 2**20:8.1f} MB  search {1000 * seconds / len(probes):7.3f} ms/probe  "
+              f"top-1 agreement {same:.4f}  decisions at {args.threshold} {decisions:.4f}")
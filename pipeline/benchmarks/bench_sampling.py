@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the frame sampling strategies on a long synthetic video.
+
+Compares the original decode-every-frame loop ('read') with grabbing ('grab')
+and seeking ('seek') over the skipped frames.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import cv2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from face_lib.sampling import FrameSampler, DECODE_STRATEGIES
+from benchmarks.synthetic import make_synthetic_video
+
+def time_strategy(video_path, strategy, interval_seconds):
+    """Returns (seconds, sampled frame indices) for one pass over the video."""
+    sampler = FrameSampler(interval_seconds=interval_seconds, strategy=strategy)
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    start = time.perf_counter()
+    indices = [frame_index for frame_index, _ in sampler.frames(cap, fps)]
+    elapsed = time.perf_counter() - start
+    cap.release()
+    return elapsed, indices
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark frame sampling strategies.")
+    parser.add_argument('--minutes', type=float, default=10, help='Length of the synthetic video (default: 10)')
+    parser.add_argument('--interval', type=float, default=2.0, help='Seconds between sampled frames (default: 2)')
+    parser.add_argument('--video', type=str, help='Benchmark this video instead of a synthetic one')
+    args = parser.parse_args()
+
+    video_path = args.video or make_synthetic_video(
+        os.path.join("data", "output", "bench", f"synthetic_{args.minutes:g}min.mp4"),
+        duration_seconds=args.minutes * 60)
+    print(f"🎬 Video: {video_path}")
+
+    baseline = None
+    for strategy in ('read',) + tuple(s for s in DECODE_STRATEGIES if s != 'read'):
+        elapsed, indices = time_strategy(video_path, strategy, args.interval)
+        if baseline is None:
+            baseline = (elapsed, indices)
+        same = "same frames" if indices == baseline[1] else "DIFFERENT frames"
+        print(f"  {strategy:5s} {elapsed:8.2f}s  {len(indices)} frames  "
+              f"{baseline[0] / elapsed:5.1f}x vs read  ({same})")
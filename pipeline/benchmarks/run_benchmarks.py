@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Reproducible benchmark suite for the face pipeline.
+
+Everything runs on synthetic fixtures with fixed seeds: galleries of random
+normalised 512-D embeddings (benchmarks.synthetic), a synthetic video, and a
+deterministic stub in place of the InsightFace models (benchmarks.stub_engine),
+so no model weights or network are needed. Measured:
+
+  gallery_load     loading a packed gallery of each size into memory
+  compare          compare_embeddings() calls per second (one probe at a
+                   time) and batched gallery.match() probes per second
+  sampling         decoding the sampled frames of the video, per strategy
+  analyze_video    end-to-end latency of analyze_video() with the stub engine,
+                   with and without face tracking, and on a still video with
+                   and without the motion gate (frames it skipped included)
+  split_analysis   whether analyze_video() and analyze_videos() with several
+                   workers give the same results as a serial run (1 = same)
+
+Every timing is the best of --repeat runs. Results are written to a JSON
+file; with --baseline they are compared metric by metric against an
+earlier results file and slowdowns beyond --tolerance are flagged.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import run_pipeline
+from face_lib.gallery import EmbeddingGallery
+from face_lib.log import configure_logging
+from face_lib.motion import MotionGate
+from face_lib.sampling import DECODE_STRATEGIES, FrameSampler
+from face_lib.store import PackedEmbeddingStore
+from benchmarks.stub_engine import StubEngine
+from benchmarks.synthetic import make_probes, make_synthetic_gallery, make_synthetic_video
+
+def best_of(repeat, fn):
+    """Runs fn() `repeat` times. Returns (fastest seconds, result of the last run)."""
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def write_gallery(db_dir, num_identities, seed=0):
+    """Fills db_dir with a synthetic gallery. Returns its (ids, matrix)."""
+    ids, matrix = make_synthetic_gallery(num_identities, seed=seed)
+    PackedEmbeddingStore(db_dir).update(put=dict(zip(ids, matrix)))
+    return ids, matrix
+
+def load_gallery(db_dir):
+    gallery = EmbeddingGallery(db_dir)
+    gallery.refresh(force=True)
+    return gallery
+
+def bench_gallery(db_dir, size, matrix, engine, num_probes, repeat):
+    """Gallery load time and matching throughput for one gallery size."""
+    metrics = {}
+    metrics[f"gallery_load/{size}/seconds"], gallery = best_of(repeat, lambda: load_gallery(db_dir))
+
+    _, probes = make_probes(matrix, num_probes)
+    single_probes = probes[:min(num_probes, 200)]
+    seconds, _ = best_of(repeat, lambda: [engine.compare_embeddings(p, gallery) for p in single_probes])
+    metrics[f"compare/{size}/calls_per_second"] = round(len(single_probes) / seconds, 2)
+    seconds, _ = best_of(repeat, lambda: gallery.match(probes))
+    metrics[f"compare/{size}/batched_probes_per_second"] = round(len(probes) / seconds, 2)
+    return metrics
+
+def bench_sampling(video_path, interval, repeat):
+    """Time to decode the sampled frames of the video with each strategy."""
+    metrics = {}
+    for strategy in DECODE_STRATEGIES:
+        def scan():
+            cap = cv2.VideoCapture(video_path)
+            try:
+                sampler = FrameSampler(interval_seconds=interval, strategy=strategy)
+                return sum(1 for _ in sampler.frames(cap, cap.get(cv2.CAP_PROP_FPS)))
+            finally:
+                cap.release()
+        metrics[f"sampling/{strategy}/seconds"], frames = best_of(repeat, scan)
+        metrics[f"sampling/{strategy}/frames"] = frames
+    return metrics
+
+def bench_analyze(db_dir, matrix, video_path, faces, interval, repeat, still_video=None):
+    """End-to-end analyze_video() latency with the stub engine, with and without tracking.
+
+    With still_video, also with and without a MotionGate on that video.
+    """
+    metrics = {}
+    engine = StubEngine(matrix[:faces], sampler=FrameSampler(interval_seconds=interval))
+    run_pipeline.DB_DIR = db_dir  # analyze_video reads the gallery from the module's DB_DIR
+    for tracking in (True, False):
+        name = "tracking" if tracking else "no_tracking"
+        seconds, results = best_of(repeat, lambda: run_pipeline.analyze_video(
+            video_path, return_results=True, engine=engine, tracking=tracking))
+        metrics[f"analyze_video/{name}/seconds"] = seconds
+        metrics[f"analyze_video/{name}/frames_per_second"] = round(results["frames_scanned"] / seconds, 2)
+        metrics[f"analyze_video/{name}/recognized"] = results["recognized_count"]
+    if still_video:
+        for name, motion in (("still", None), ("still_motion_gate", MotionGate())):
+            seconds, results = best_of(repeat, lambda: run_pipeline.analyze_video(
+                still_video, return_results=True, engine=engine, motion=motion))
+            metrics[f"analyze_video/{name}/seconds"] = seconds
+            metrics[f"analyze_video/{name}/recognized"] = results["recognized_count"]
+            if motion is not None:
+                metrics[f"analyze_video/{name}/frames_skipped"] = results["frames_motion_skipped"]
+    return metrics
+
+@contextmanager
+def in_process_workers(engine):
+    """Runs run_pipeline's worker segments on threads with `engine`.
+
+    Worker processes would load the real models, which the stub stands in for.
+    """
+    pool = ThreadPoolExecutor(max_workers=8)
+    saved = run_pipeline._get_pool, run_pipeline.get_shared_engine
+    run_pipeline._get_pool = lambda workers: (pool, min(workers, 8))
+    run_pipeline.get_shared_engine = lambda: engine
+    try:
+        yield
+    finally:
+        run_pipeline._get_pool, run_pipeline.get_shared_engine = saved
+        pool.shutdown()
+
+def check_split_analysis(db_dir, matrix, video_path, faces, interval, workers):
+    """Whether splitting a video across `workers` changes the results of a default analysis.
+
+    A split video is analysed without tracking or motion gate, so it must
+    match a serial run without them exactly.
+    """
+    engine = StubEngine(matrix[:faces], sampler=FrameSampler(interval_seconds=interval))
+    run_pipeline.DB_DIR = db_dir
+    ignored = ("timing", "video", "tag")
+    def comparable(results):
+        return {key: value for key, value in results.items() if key not in ignored}
+
+    serial = comparable(run_pipeline.analyze_video(video_path, return_results=True, engine=engine, tracking=False))
+    with in_process_workers(engine):
+        split = comparable(run_pipeline.analyze_video(video_path, return_results=True, workers=workers))
+        batch = comparable(run_pipeline.analyze_videos([{"video": video_path}], workers=workers,
+                                                       segment_seconds=10)["videos"][0])
+    metrics = {"split_analysis/analyze_video/same_as_serial": int(split == serial),
+               "split_analysis/analyze_videos/same_as_serial": int(batch == serial)}
+    for metric, same in metrics.items():
+        if not same:
+            print(f"  ❌ {metric}: results differ from the serial run")
+    return metrics
+
+def lower_is_better(metric):
+    """Direction of a metric, from its unit; None for counts, which are only reported."""
+    if metric.endswith("/seconds"):
+        return True
+    if metric.endswith("_per_second"):
+        return False
+    return None
+
+def compare(results, baseline, tolerance):
+    """Prints current vs baseline for every metric. Returns the names of the regressed metrics."""
+    regressions = []
+    print(f"\n📊 Against baseline ({baseline['meta'].get('created', 'unknown date')}), tolerance {tolerance:.0%}:")
+    for metric, value in results["metrics"].items():
+        before = baseline["metrics"].get(metric)
+        lower = lower_is_better(metric)
+        if before is None:
+            print(f"  {metric:45s} {value:>12.4g}  (new)")
+            continue
+        if lower is None or not before:
+            note = "" if value == before else f"  (was {before})"
+            print(f"  {metric:45s} {value:>12.4g}{note}")
+            continue
+        change = (value - before) / before
+        worse = change > tolerance if lower else change < -tolerance
+        better = change < -tolerance if lower else change > tolerance
+        status = "❌ REGRESSION" if worse else "✅ improved" if better else "ok"
+        print(f"  {metric:45s} {value:>12.4g}  vs {before:<12.4g} {change:+7.1%}  {status}")
+        if worse:
+            regressions.append(metric)
+    missing = sorted(set(baseline["metrics"]) - set(results["metrics"]))
+    if missing:
+        print(f"  (not measured this run: {', '.join(missing)})")
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the pipeline benchmark suite on synthetic fixtures.")
+    parser.add_argument('--gallery_sizes', type=str, default='1000,10000',
+                        help='Comma-separated gallery sizes (default: 1000,10000)')
+    parser.add_argument('--probes', type=int, default=1000, help='Probe embeddings per gallery (default: 1000)')
+    parser.add_argument('--video_seconds', type=float, default=120,
+                        help='Length of the synthetic video (default: 120)')
+    parser.add_argument('--interval', type=float, default=2.0, help='Seconds between sampled frames (default: 2)')
+    parser.add_argument('--faces', type=int, default=4, help='Faces per frame in the end-to-end run (default: 4)')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per measurement, best one kept (default: 3)')
+    parser.add_argument('--workers', type=int, default=3, help='Workers in the split analysis check (default: 3)')
+    parser.add_argument('--only', type=str,
+                        help='Comma-separated subset of: gallery, sampling, analyze, split_analysis')
+    parser.add_argument('--output', type=str, default=os.path.join("data", "output", "bench", "results.json"),
+                        help='Where to write the results (default: data/output/bench/results.json)')
+    parser.add_argument('--baseline', type=str, help='Earlier results file to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.15,
+                        help='Relative slowdown reported as a regression (default: 0.15)')
+    parser.add_argument('--fail_on_regression', action='store_true', help='Exit with status 1 on a regression')
+    args = parser.parse_args()
+
+    configure_logging(level="WARNING")
+    sizes = [int(size) for size in args.gallery_sizes.split(",") if size.strip()]
+    suites = set(args.only.split(",")) if args.only else {"gallery", "sampling", "analyze", "split_analysis"}
+    video_path = make_synthetic_video(os.path.join("data", "output", "bench", f"synthetic_{args.video_seconds:g}s.mp4"),
+                                      duration_seconds=args.video_seconds)
+    still_video = make_synthetic_video(os.path.join("data", "output", "bench", f"still_{args.video_seconds:g}s.mp4"),
+                                       duration_seconds=args.video_seconds, still=True)
+    print(f"🎬 Video: {video_path} (still: {still_video})")
+
+    metrics = {}
+    work_dir = tempfile.mkdtemp(prefix="pipeline_bench_")
+    try:
+        for size in sizes:
+            db_dir = os.path.join(work_dir, f"gallery_{size}")
+            _, matrix = write_gallery(db_dir, size)
+            if "gallery" in suites:
+                print(f"🧪 Gallery of {size} identities")
+                metrics.update(bench_gallery(db_dir, size, matrix, StubEngine(matrix[:1]), args.probes, args.repeat))
+            if "analyze" in suites and size == sizes[0]:
+                print(f"🧪 analyze_video with {args.faces} stub faces per frame, gallery of {size}")
+                metrics.update(bench_analyze(db_dir, matrix, video_path, args.faces, args.interval, args.repeat,
+                                             still_video))
+            if "split_analysis" in suites and size == sizes[0]:
+                print(f"🧪 Serial vs {args.workers}-way split analysis")
+                metrics.update(check_split_analysis(db_dir, matrix, video_path, args.faces, args.interval,
+                                                    args.workers))
+        if "sampling" in suites:
+            print("🧪 Frame sampling")
+            metrics.update(bench_sampling(video_path, args.interval, args.repeat))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    results = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "opencv": cv2.__version__,
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "args": vars(args),
+        },
+        "metrics": metrics,
+    }
+    for metric, value in metrics.items():
+        print(f"  {metric:45s} {value:>12.4g}")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"📝 Results written to: {args.output}")
+
+    mismatches = [metric for metric, value in metrics.items() if metric.startswith("split_analysis/") and not value]
+    if mismatches and args.fail_on_regression:
+        exit(1)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s): {', '.join(regressions)}")
+            if args.fail_on_regression:
+                exit(1)
+        else:
+            print("\n✅ No regressions")
@@ -0,0 +1,87 @@
+"""
+Deterministic stand-in for the InsightFace models, for benchmarks that must
+run offline and without model weights.
+"""
+
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from face_lib.detection import DetectionConfig
+from face_lib.engine import FaceRecognitionEngine
+from face_lib.sampling import FrameSampler
+
+class StubDetector:
+    """Reports the same faces in every frame: one per slot, side by side across the image."""
+
+    def __init__(self, num_faces):
+        self.num_faces = num_faces
+
+    def slot_box(self, slot, width, height):
+        cell = width / self.num_faces
+        side = min(cell, height) * 0.5
+        x1 = slot * cell + (cell - side) / 2
+        y1 = (height - side) / 2
+        return x1, y1, x1 + side, y1 + side
+
+    def detect(self, img, input_size=None, max_num=0, metric='default'):
+        height, width = img.shape[:2]
+        bboxes = np.empty((self.num_faces, 5), dtype=np.float32)
+        kpss = np.empty((self.num_faces, 5, 2), dtype=np.float32)
+        for slot in range(self.num_faces):
+            x1, y1, x2, y2 = self.slot_box(slot, width, height)
+            bboxes[slot] = (x1, y1, x2, y2, 0.9)
+            # Eyes, nose, mouth corners inside the box
+            kpss[slot] = [(x1 + (x2 - x1) * fx, y1 + (y2 - y1) * fy)
+                          for fx, fy in ((0.3, 0.4), (0.7, 0.4), (0.5, 0.55), (0.35, 0.75), (0.65, 0.75))]
+        return bboxes, kpss
+
+class StubEngine(FaceRecognitionEngine):
+    """FaceRecognitionEngine whose detector and recognizer are cheap and deterministic.
+
+    Every frame shows len(identities) faces at fixed positions; the face in
+    slot i embeds as identities[i] plus noise that depends only on the frame
+    content and the slot. Everything around the models (sampling, tracking,
+    batching, gallery matching, result merging) is the real code, so timings
+    measure the pipeline's own overhead.
+
+    Args:
+        identities: K×512 embeddings of the people "in the video" (e.g. gallery rows)
+        noise: Norm of the noise added to each embedding before re-normalising
+        sampler: FrameSampler (default: one frame every 2 seconds)
+        detection: DetectionConfig (default: 640×640, no filters)
+    """
+
+    def __init__(self, identities, noise=0.3, sampler=None, detection=None, rec_batch_size=64):
+        self.identities = np.asarray(identities, dtype=np.float32)
+        self.noise = noise
+        self.detection = detection or DetectionConfig()
+        self.sampler = sampler or FrameSampler()
+        self.rec_batch_size = rec_batch_size
+        self.det_model = StubDetector(len(self.identities))
+        self.rec_model = None
+        self.model_id = f"stub/{len(self.identities)}"
+
+    def get_embedding(self, image, debug=False):
+        if image is None:
+            return None
+        return self.embed_faces([image], [self.det_model.detect(image)[1][:1]])[0][0]
+
+    def embed_faces(self, frames, keypoints):
+        results = []
+        for frame, kpss in zip(frames, keypoints):
+            width = frame.shape[1]
+            # Cheap content fingerprint, so the same frame always gets the same noise
+            fingerprint = int(frame[::31, ::31].sum(dtype=np.int64))
+            embeddings = np.empty((len(kpss), self.identities.shape[1]), dtype=np.float32)
+            for i, kps in enumerate(kpss):
+                slot = min(int(kps[2, 0] / width * len(self.identities)), len(self.identities) - 1)
+                rng = np.random.default_rng((fingerprint, slot))
+                noise = rng.standard_normal(self.identities.shape[1]).astype(np.float32)
+                embeddings[i] = self.identities[slot] + self.noise * noise / np.linalg.norm(noise)
+            embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+            results.append(embeddings)
+        return results
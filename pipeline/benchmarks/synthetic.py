@@ -0,0 +1,56 @@
+"""
+Synthetic fixtures for the pipeline benchmarks
+"""
+
+import os
+import cv2
+import numpy as np
+
+def make_synthetic_video(path, duration_seconds=60, fps=25, width=640, height=360, seed=0, still=False):
+    """Writes a synthetic test video and returns its path.
+
+    Every frame has a slowly moving gradient, some noise and a frame counter,
+    so the encoder produces realistic inter-frames instead of trivially
+    compressible ones. With still=True the gradient stays put, like a
+    lecture recording from a fixed camera where only noise and the counter
+    change.
+    """
+    if os.path.exists(path):
+        return path
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    rng = np.random.default_rng(seed)
+    base = np.tile(np.linspace(0, 255, width, dtype=np.float32), (height, 1))
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    try:
+        for i in range(int(duration_seconds * fps)):
+            gray = (np.roll(base, 0 if still else i * 2, axis=1) + rng.normal(0, 8, base.shape)).clip(0, 255)
+            frame = cv2.cvtColor(gray.astype(np.uint8), cv2.COLOR_GRAY2BGR)
+            cv2.putText(frame, f"frame {i}", (20, 40), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0, 0, 255), 2)
+            writer.write(frame)
+    finally:
+        writer.release()
+    return path
+
+def make_synthetic_gallery(num_identities, dim=512, num_groups=64, spread=1.0, seed=0):
+    """Returns (ids, L2-normalised float32 embeddings) for a synthetic gallery.
+
+    Identities are scattered around `num_groups` shared directions instead of
+    being uniformly random, so near neighbours exist the way they do among
+    real face embeddings and approximate search is actually put to the test.
+    """
+    rng = np.random.default_rng(seed)
+    groups = rng.standard_normal((num_groups, dim)).astype(np.float32)
+    group_of = rng.integers(num_groups, size=num_identities)
+    matrix = groups[group_of] + spread * rng.standard_normal((num_identities, dim)).astype(np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    ids = [f"person_{i:06d}" for i in range(num_identities)]
+    return ids, matrix
+
+def make_probes(matrix, num_probes, noise=0.5, seed=1):
+    """Noisy, re-normalised copies of random gallery rows. Returns (row indices, probes)."""
+    rng = np.random.default_rng(seed)
+    rows = rng.integers(len(matrix), size=num_probes)
+    probes = matrix[rows] + noise * rng.standard_normal((num_probes, matrix.shape[1])).astype(np.float32) / np.sqrt(matrix.shape[1])
+    probes /= np.linalg.norm(probes, axis=1, keepdims=True)
+    return rows, probes
@@ -0,0 +1,157 @@
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+from face_lib.cache import get_embedding_cache
+from face_lib.engine import get_shared_engine
+from face_lib.enrollment import embed_people, find_person_images
+from face_lib.log import configure_logging, get_logger
+from face_lib.store import PackedEmbeddingStore
+from face_lib.templates import build_templates
+
+logger = get_logger("bulk_enroll")
+
+# Limits on an uploaded archive, checked before anything is extracted
+MAX_ARCHIVE_MB = float(os.environ.get("PIPELINE_BULK_MAX_MB", "2048"))  # total uncompressed size
+MAX_ARCHIVE_FILES = int(os.environ.get("PIPELINE_BULK_MAX_FILES", "20000"))
+
+def _check_archive(archive):
+    """Returns why a zip must not be extracted (too big, too many entries, unsafe paths), or None."""
+    members = archive.infolist()
+    if len(members) > MAX_ARCHIVE_FILES:
+        return f"Archive has {len(members)} entries (limit {MAX_ARCHIVE_FILES})"
+    total = sum(member.file_size for member in members)
+    if total > MAX_ARCHIVE_MB * 1024 * 1024:
+        return f"Archive unpacks to {total / 2**20:.0f} MB (limit {MAX_ARCHIVE_MB:g} MB)"
+    for member in members:
+        name = member.filename.replace("\\", "/")
+        if name.startswith("/") or (len(name) > 1 and name[1] == ":") or ".." in name.split("/"):
+            return f"Archive entry has an unsafe path: {member.filename}"
+    return None
+
+def _people_root(directory):
+    """Skips a single wrapping folder, as zip tools often add one (class.zip -> class/<person>/...)."""
+    entries = [name for name in os.listdir(directory) if not name.startswith(('.', '__'))]
+    if len(entries) == 1 and os.path.isdir(os.path.join(directory, entries[0])):
+        inner = os.path.join(directory, entries[0])
+        if any(os.path.isdir(os.path.join(inner, name)) for name in os.listdir(inner)):
+            return inner
+    return directory
+
+def bulk_enroll(source, output_dir, engine=None, gallery=None, decode_workers=8, batch_size=64,
+                progress_callback=None, use_cache=True):
+    """Enrolls every person found in a directory tree or zip archive in one go.
+
+    The source holds one folder per person, named after the person id, with
+    that person's photos inside. All images are embedded on one warm engine
+    (see face_lib.enrollment.embed_people) and every identity is written to
+    the store in a single transaction.
+
+    Args:
+        source: Directory or .zip file with one sub-folder per person
+        output_dir: Embedding database directory
+        engine: FaceRecognitionEngine to use (defaults to the shared, already-loaded engine)
+        gallery: Optional EmbeddingGallery for output_dir, updated in place
+        decode_workers: Threads decoding images
+        batch_size: Face crops per recognition-model call
+        progress_callback: Optional callable receiving a progress dict
+        use_cache: Reuse embeddings of images seen before (see face_lib.cache)
+
+    Returns:
+        Dict with 'success', 'enrolled', 'failed', totals, timing and a
+        per-person 'people' report (images, embedded, templates, skipped images)
+    """
+    if not os.path.exists(source):
+        logger.error("❌ Source does not exist: %s", source)
+        return {"success": False, "error": f"Source does not exist: {source}"}
+
+    start = time.perf_counter()
+    extracted = None
+    try:
+        if zipfile.is_zipfile(source):
+            extracted = tempfile.mkdtemp(prefix="bulk_enroll_")
+            with zipfile.ZipFile(source) as archive:
+                problem = _check_archive(archive)
+                if problem:
+                    logger.error("❌ %s", problem)
+                    return {"success": False, "error": problem}
+                archive.extractall(extracted)
+            root = _people_root(extracted)
+        elif os.path.isdir(source):
+            root = _people_root(source)
+        else:
+            return {"success": False, "error": "Source must be a directory or a zip archive"}
+
+        people = find_person_images(root)
+        num_images = sum(len(paths) for paths in people.values())
+        logger.info("🧠 Enrolling %d people from %d images", len(people), num_images)
+        if engine is None:
+            engine = get_shared_engine()
+        cache = get_embedding_cache(output_dir) if use_cache else None
+        embeddings, report = embed_people(engine, people, decode_workers=decode_workers, batch_size=batch_size,
+                                          progress_callback=progress_callback, cache=cache)
+    finally:
+        if extracted is not None:
+            shutil.rmtree(extracted, ignore_errors=True)
+    embed_seconds = time.perf_counter() - start
+
+    templates = {person_id: build_templates(embs) for person_id, embs in embeddings.items()}
+    metadata = {person_id: {"num_images": len(embs)} for person_id, embs in embeddings.items()}
+    if templates:
+        if gallery is not None:
+            gallery.put_many(templates, metadata=metadata)
+        else:
+            PackedEmbeddingStore(output_dir).update(put=templates, metadata=metadata)
+
+    for person_id, entry in report.items():
+        entry["templates"] = len(templates.get(person_id, ()))
+        entry["status"] = "enrolled" if person_id in templates else "failed"
+        icon = "✅" if person_id in templates else "❌"
+        logger.info("  %s %s: %d/%d images (%d cached), %d template(s), %d skipped", icon, person_id,
+                    entry["embedded"], entry["images"], entry["cached"], entry["templates"], len(entry["skipped"]))
+
+    elapsed = time.perf_counter() - start
+    enrolled = sorted(templates)
+    failed = sorted(set(report) - set(templates))
+    cached = sum(entry["cached"] for entry in report.values())
+    logger.info("✅ Enrolled %d people (%.1f images/s)", len(enrolled), num_images / max(embed_seconds, 1e-9))
+    if failed:
+        logger.error("❌ No usable face for: %s", ", ".join(failed))
+    return {
+        "success": bool(enrolled),
+        "enrolled": enrolled,
+        "failed": failed,
+        "num_people": len(people),
+        "num_images": num_images,
+        "seconds": round(elapsed, 2),
+        "images_per_second": round(num_images / max(embed_seconds, 1e-9), 2),
+        "cached_images": cached,
+        "cache": cache.stats() if cache is not None else None,
+        "people": report,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Enroll many people at once from a folder tree or zip archive.")
+    parser.add_argument('--source', type=str, required=True,
+                        help='Directory or .zip with one sub-folder of photos per person (folder name = person id)')
+    parser.add_argument('--output_dir', type=str, default='data/output/embeddings/known_db',
+                       help='Directory to save the embeddings (default: data/output/embeddings/known_db)')
+    parser.add_argument('--workers', type=int, default=8, help='Image decoding threads (default: 8)')
+    parser.add_argument('--batch_size', type=int, default=64, help='Faces per recognition batch (default: 64)')
+    parser.add_argument('--report', type=str, help='Also write the per-person report to this JSON file')
+    parser.add_argument('--no_cache', action='store_true', help='Re-embed every image instead of using the embedding cache')
+    args = parser.parse_args()
+    configure_logging()
+
+    result = bulk_enroll(os.path.abspath(args.source), os.path.abspath(args.output_dir),
+                         decode_workers=args.workers, batch_size=args.batch_size, use_cache=not args.no_cache)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"📝 Report written to: {args.report}")
+
+    if not result["success"]:
+        exit(1)
@@ -1,20 +1,28 @@
 import os
-import numpy as np
-import cv2
 import argparse
-from face_lib.engine import FaceRecognitionEngine
+from face_lib.cache import get_embedding_cache
+from face_lib.engine import get_shared_engine
+from face_lib.enrollment import embed_people
+from face_lib.log import configure_logging, get_logger
+from face_lib.store import PackedEmbeddingStore
+from face_lib.templates import build_templates
 
-def generate_embedding_for_person(input_dir, output_dir, person_name):
+logger = get_logger("enroll")
+
+def generate_embedding_for_person(input_dir, output_dir, person_name, engine=None, gallery=None, use_cache=True):
     """Generate embeddings for a person from their images.
     
     Args:
         input_dir: Directory containing images of the person
-        output_dir: Directory to save the embedding file
-        person_name: Name of the person (used for filename)
+        output_dir: Embedding database directory to save the embedding into
+        person_name: Name of the person (used as the person id)
+        engine: FaceRecognitionEngine to use (defaults to the shared, already-loaded engine)
+        gallery: Optional EmbeddingGallery for output_dir, updated in place with the new embedding
+        use_cache: Reuse embeddings of images seen before (see face_lib.cache)
     """
     # Validate input directory exists
     if not os.path.exists(input_dir):
-        print(f"❌ Input directory does not exist: {input_dir}")
+        logger.error("❌ Input directory does not exist: %s", input_dir)
         return False
     
     os.makedirs(output_dir, exist_ok=True)
@@ -22,60 +30,56 @@ def generate_embedding_for_person(input_dir, output_dir, person_name):
     image_files = [f for f in os.listdir(input_dir) if f.lower().endswith(('.jpg', '.jpeg', '.png'))]
 
     if not image_files:
-        print(f"❌ No image files found in: {input_dir}")
+        logger.error("❌ No image files found in: %s", input_dir)
         return False
 
-    print(f"🧠 Generating embeddings for person: {person_name}")
-    print(f"📁 From directory: {input_dir}")
-    print(f"💾 Saving to: {os.path.join(output_dir, person_name + '.npy')}")
-
-    engine = FaceRecognitionEngine()
-    embeddings = []
-
-    for img_name in image_files:
-        img_path = os.path.join(input_dir, img_name)
-        print(f"  ➤ Processing {img_name}")
-
-        try:
-            img = cv2.imread(img_path)
-            if img is None:
-                print(f"  ❌ Could not read image: {img_path}")
-                continue
+    logger.info("🧠 Generating embeddings for person: %s", person_name)
+    logger.info("📁 From directory: %s", input_dir)
+    logger.info("💾 Saving to: %s", output_dir)
 
-            embedding = engine.get_embedding(img)
-            if embedding is not None:
-                embeddings.append(embedding)
-            else:
-                print(f"  ⚠️ No embedding returned for {img_name}")
-        except Exception as e:
-            print(f"  ❌ Error processing {img_name}: {e}")
+    if engine is None:
+        engine = get_shared_engine()
+    cache = get_embedding_cache(output_dir) if use_cache else None
+    paths = [os.path.join(input_dir, img_name) for img_name in sorted(image_files)]
+    found, report = embed_people(engine, {person_name: paths}, cache=cache)
+    report = report[person_name]
+    for skipped in report["skipped"]:
+        logger.warning("  ⚠️ Skipped %s: %s", skipped["image"], skipped["reason"])
+    if report["cached"]:
+        logger.info("  ♻️ Reused %d cached embedding(s)", report["cached"])
 
-    if embeddings:
-        embeddings = np.stack(embeddings)
-        avg_embedding = np.mean(embeddings, axis=0)
+    if person_name in found:
+        embeddings = found[person_name]
+        # A few representative embeddings per person instead of one averaged vector
+        templates = build_templates(embeddings)
 
-        out_path = os.path.join(output_dir, f"{person_name}.npy")
-        np.save(out_path, avg_embedding)
-        print(f"\n✅ Saved average embedding to: {out_path}")
+        metadata = {"num_images": len(embeddings)}
+        if gallery is not None:
+            gallery.put(person_name, templates, metadata=metadata)
+        else:
+            PackedEmbeddingStore(output_dir).put(person_name, templates, metadata=metadata)
+        logger.info("✅ Saved %d template embedding(s) to: %s", len(templates), output_dir)
         return True
     else:
-        print("❌ No valid embeddings generated.")
+        logger.error("❌ No valid embeddings generated.")
         return False
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Generate face embeddings for a person from their images.")
-    parser.add_argument('--person', type=str, required=True, help='Name of the person (will be used as filename)')
+    parser.add_argument('--person', type=str, required=True, help='Name of the person (will be used as the person id)')
     parser.add_argument('--input_dir', type=str, required=True, help='Directory containing images of the person')
     parser.add_argument('--output_dir', type=str, default='data/output/embeddings/known_db', 
                        help='Directory to save the embedding file (default: data/output/embeddings/known_db)')
+    parser.add_argument('--no_cache', action='store_true', help='Re-embed every image instead of using the embedding cache')
     
     args = parser.parse_args()
+    configure_logging()
     
     # Convert relative paths to absolute paths
     input_dir = os.path.abspath(args.input_dir)
     output_dir = os.path.abspath(args.output_dir)
     
-    success = generate_embedding_for_person(input_dir, output_dir, args.person)
+    success = generate_embedding_for_person(input_dir, output_dir, args.person, use_cache=not args.no_cache)
     
     if success:
         print(f"\n✅ Successfully enrolled {args.person}!")
@@ -0,0 +1,134 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+CACHE_FILE = "embedding_cache.sqlite"
+NO_FACE = b""  # cached result for an image in which no face was found
+
+
+def default_cache_path(db_dir):
+    """Cache location for an embedding database: next to the known_db directory."""
+    return os.path.join(os.path.dirname(os.path.abspath(db_dir)), CACHE_FILE)
+
+
+class EmbeddingCache:
+    """Persistent cache of per-image embeddings, keyed by image content, model and detection settings.
+
+    The key is the SHA-256 of the encoded image file plus a model id and the
+    detection settings, so a renamed or copied photo still hits while a
+    modified photo, a different model or different detection settings miss. Images without a face are cached too. Entries live in a
+    SQLite file; once it holds more than `max_entries` rows the least
+    recently used ones are evicted. `hits` and `misses` count lookups.
+
+    Safe to share between threads; several processes may use the same file.
+    """
+
+    def __init__(self, path, max_entries=200_000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._touched = []  # keys hit since the last flush(), for the LRU order
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings ("
+                           "key TEXT PRIMARY KEY, embedding BLOB NOT NULL, last_used REAL NOT NULL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    @staticmethod
+    def key(data, model_id, settings=None):
+        """Cache key for the raw bytes of an image file, the model that embeds it and the
+        settings (a JSON-serialisable dict, e.g. DetectionConfig.to_dict()) it is detected with."""
+        key = f"{model_id}:{hashlib.sha256(data).hexdigest()}"
+        if settings:
+            canonical = json.dumps(settings, sort_keys=True, separators=(",", ":"))
+            key = f"{key}:{hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:16]}"
+        return key
+
+    def get(self, key):
+        """Returns the cached embedding, NO_FACE, or None on a miss."""
+        with self._lock:
+            row = self._conn.execute("SELECT embedding FROM embeddings WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._touched.append(key)
+        blob = bytes(row[0])
+        return NO_FACE if blob == NO_FACE else np.frombuffer(blob, dtype=np.float32).copy()
+
+    def put_many(self, entries):
+        """Stores (key, embedding or None for no face) pairs, then evicts down to max_entries."""
+        now = time.time()
+        rows = [(key, NO_FACE if emb is None else np.asarray(emb, dtype=np.float32).tobytes(), now)
+                for key, emb in entries]
+        with self._lock:
+            self._flush_locked(now)
+            if not rows:
+                self._conn.commit()
+                return
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings (key, embedding, last_used) "
+                                   "VALUES (?, ?, ?)", rows)
+            self._count += len(rows)
+            if self._count > self.max_entries:
+                # Recount first: replaced keys and other processes change the total
+                self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+                excess = self._count - self.max_entries
+                if excess > 0:
+                    self._conn.execute("DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings "
+                                       "ORDER BY last_used LIMIT ?)", (excess,))
+                    self._count -= excess
+            self._conn.commit()
+
+    def flush(self):
+        """Records the use of recently hit entries, so eviction keeps them."""
+        with self._lock:
+            self._flush_locked(time.time())
+            self._conn.commit()
+
+    def _flush_locked(self, now):
+        if self._touched:
+            self._conn.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?",
+                                   [(now, key) for key in self._touched])
+            self._touched = []
+
+    def stats(self):
+        """Hit/miss counters and current size."""
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "entries": self._count,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+def get_embedding_cache(db_dir):
+    """Returns the process-wide embedding cache for an embedding database.
+
+    The location can be overridden with PIPELINE_EMBEDDING_CACHE (a file
+    path, or "off" to disable caching, in which case None is returned) and
+    the size with PIPELINE_EMBEDDING_CACHE_SIZE (entries).
+    """
+    path = os.environ.get("PIPELINE_EMBEDDING_CACHE") or default_cache_path(db_dir)
+    if path.lower() == "off":
+        return None
+    path = os.path.abspath(path)
+    with _caches_lock:
+        cache = _caches.get(path)
+        if cache is None:
+            max_entries = int(os.environ.get("PIPELINE_EMBEDDING_CACHE_SIZE", "200000"))
+            cache = _caches[path] = EmbeddingCache(path, max_entries=max_entries)
+    return cache
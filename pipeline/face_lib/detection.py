@@ -0,0 +1,101 @@
+import os
+
+import cv2
+import numpy as np
+
+
+def parse_det_size(value):
+    """Parses a detection size: "640" (longest side, aspect ratio kept) or "640x480" (width x height)."""
+    if value is None or isinstance(value, (int, tuple)):
+        return value
+    value = str(value).lower().strip()
+    if "x" in value:
+        width, height = value.split("x", 1)
+        return int(width), int(height)
+    return int(value)
+
+
+class DetectionConfig:
+    """How frames are prepared for the face detector and which detections are kept.
+
+    Args:
+        det_size: Detector input size. A (width, height) tuple letterboxes every
+                  frame into that size (InsightFace's behaviour, default
+                  640×640); an int is the longest side and the other side
+                  follows the frame's aspect ratio, so no compute is spent on
+                  padding (e.g. 640 -> 640×352 for 16:9 video).
+        max_side: If set, frames whose longest side exceeds it are downscaled
+                  (with area interpolation) before detection. Boxes and
+                  landmarks are mapped back, so faces are still cropped from
+                  the full-resolution frame for recognition.
+        min_face_size: Drop faces whose box is smaller than this many pixels
+                  (shorter side, in full-resolution coordinates)
+        max_faces: Keep at most this many faces per frame, most confident
+                  first (0 = no limit)
+
+    Larger det_size / max_side find smaller faces at the cost of CPU time per frame.
+    """
+
+    def __init__(self, det_size=(640, 640), max_side=None, min_face_size=0, max_faces=0):
+        self.det_size = parse_det_size(det_size)
+        self.max_side = max_side
+        self.min_face_size = min_face_size
+        self.max_faces = max_faces
+
+    def input_size(self, shape):
+        """Detector input (width, height) for a frame of the given shape."""
+        if isinstance(self.det_size, tuple):
+            return self.det_size
+        height, width = shape[:2]
+        scale = self.det_size / max(height, width)
+        # SCRFD needs multiples of 32
+        return (max(32, int(round(width * scale / 32)) * 32), max(32, int(round(height * scale / 32)) * 32))
+
+    def downscale(self, frame):
+        """Returns (frame for the detector, scale factor applied)."""
+        height, width = frame.shape[:2]
+        if not self.max_side or max(height, width) <= self.max_side:
+            return frame, 1.0
+        scale = self.max_side / max(height, width)
+        size = (max(1, int(round(width * scale))), max(1, int(round(height * scale))))
+        return cv2.resize(frame, size, interpolation=cv2.INTER_AREA), scale
+
+    def postprocess(self, bboxes, kpss, scale):
+        """Maps detections back to full resolution and applies the size and count limits."""
+        if kpss is None:
+            kpss = np.empty((0, 5, 2), dtype=np.float32)
+        if scale != 1.0 and len(bboxes):
+            bboxes = bboxes.copy()
+            bboxes[:, :4] /= scale
+            kpss = kpss / scale
+
+        if self.min_face_size and len(bboxes):
+            sides = np.minimum(bboxes[:, 2] - bboxes[:, 0], bboxes[:, 3] - bboxes[:, 1])
+            keep = sides >= self.min_face_size
+            bboxes, kpss = bboxes[keep], kpss[keep]
+
+        if self.max_faces and len(bboxes) > self.max_faces:
+            keep = np.sort(np.argsort(-bboxes[:, 4], kind='stable')[:self.max_faces])
+            bboxes, kpss = bboxes[keep], kpss[keep]
+        return bboxes, kpss
+
+    @classmethod
+    def from_env(cls):
+        """Settings from PIPELINE_DET_SIZE, PIPELINE_DET_MAX_SIDE, PIPELINE_MIN_FACE_SIZE and PIPELINE_MAX_FACES."""
+        max_side = os.environ.get("PIPELINE_DET_MAX_SIDE")
+        return cls(det_size=os.environ.get("PIPELINE_DET_SIZE", "640x640"),
+                   max_side=int(max_side) if max_side else None,
+                   min_face_size=int(os.environ.get("PIPELINE_MIN_FACE_SIZE", "0")),
+                   max_faces=int(os.environ.get("PIPELINE_MAX_FACES", "0")))
+
+    def replace(self, **changes):
+        """Copy with some settings changed (None values are ignored)."""
+        settings = dict(det_size=self.det_size, max_side=self.max_side,
+                        min_face_size=self.min_face_size, max_faces=self.max_faces)
+        settings.update({name: value for name, value in changes.items() if value is not None})
+        return DetectionConfig(**settings)
+
+    def to_dict(self):
+        det_size = "x".join(map(str, self.det_size)) if isinstance(self.det_size, tuple) else self.det_size
+        return {"det_size": det_size, "max_side": self.max_side,
+                "min_face_size": self.min_face_size, "max_faces": self.max_faces}
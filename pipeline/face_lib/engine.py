@@ -1,156 +1,373 @@
 import cv2
 import numpy as np
 import os
-from insightface.app import FaceAnalysis
-from sklearn.metrics.pairwise import cosine_similarity
+import threading
+import time
+from insightface.utils import face_align
+from .cache import get_embedding_cache
+from .detection import DetectionConfig
+from .enrollment import embed_people, find_person_images
+from .gallery import EmbeddingGallery, get_gallery
+from .live import LiveFrameReader
+from .log import get_logger
+from .metrics import REGISTRY, StageTimings, timed
+from .models import ModelConfig, load_models
+from .sampling import FrameSampler
+from .store import PackedEmbeddingStore
+from .templates import build_templates
+
+logger = get_logger("engine")
+
+def _model_file_id(model):
+    """Model file name plus size, enough to tell model versions apart without hashing them."""
+    path = getattr(model, 'model_file', None) or type(model).__name__
+    size = os.path.getsize(path) if os.path.exists(path) else 0
+    return f"{os.path.basename(path)}@{size}"
 
 class FaceRecognitionEngine:
-    def __init__(self):
-        """Initializes the FaceAnalysis model."""
-        print("Loading InsightFace model... This may take a moment.")
-        self.app = FaceAnalysis(name='buffalo_l', providers=['CPUExecutionProvider'])
-        self.app.prepare(ctx_id=0)
-        print("Model loaded successfully.")
+    def __init__(self, rec_batch_size=64, sampler=None, detection=None, models=None):
+        """Loads the face models.
+
+        `models` (a ModelConfig, default: buffalo_l) chooses the model pack,
+        an optional replacement recognition model and the ONNX Runtime
+        session settings. Only the detection and recognition models are
+        loaded by default; the landmark and gender/age models in the pack are
+        never used for attendance. `detection` (a DetectionConfig) sets the
+        default detection resolution and face filters for detect_faces() and
+        scan_video().
+        """
+        logger.info("Loading InsightFace model... This may take a moment.")
+        self.detection = detection or DetectionConfig()
+        self.models = models or ModelConfig()
+        det_size = self.detection.det_size
+        self.modules = load_models(self.models)
+        self.det_model = self.modules['detection']
+        self.rec_model = self.modules['recognition']
+        self.det_model.prepare(ctx_id=0, input_size=det_size if isinstance(det_size, tuple) else (det_size, det_size),
+                               det_thresh=0.5)
+        for name, model in self.modules.items():
+            if name != 'detection':
+                model.prepare(ctx_id=0)
+        # Identifies the models behind an embedding, e.g. for the embedding cache
+        self.model_id = f"{self.models.pack}/{_model_file_id(self.det_model)}/{_model_file_id(self.rec_model)}"
+        self.rec_batch_size = rec_batch_size
+        self.sampler = sampler or FrameSampler()
+        logger.info("Model loaded successfully.")
 
     def get_embedding(self, image, debug=False):
         """Generates a 512D embedding for a single face image."""
         if debug:
-            print(f"    Input image shape: {image.shape if image is not None else 'None'}")
+            logger.info("    Input image shape: %s", image.shape if image is not None else None)
         
         if image is None:
             if debug:
-                print("    Error: Input image is None")
+                logger.info("    Error: Input image is None")
             return None
             
-        faces = self.app.get(image)
+        _, kpss = self.detect_faces(image)
         if debug:
-            print(f"    InsightFace detected {len(faces) if faces else 0} faces")
+            logger.info("    InsightFace detected %d faces", len(kpss))
             
-        if not faces:
+        if not len(kpss):
             return None
-        return faces[0].normed_embedding
-
-    def prepare_known_database(self, known_faces_dir, output_db_dir):
-        """Processes all images in the known_faces directory and saves averaged embeddings."""
-        os.makedirs(output_db_dir, exist_ok=True)
-        for person_name in os.listdir(known_faces_dir):
-            person_path = os.path.join(known_faces_dir, person_name)
-            if not os.path.isdir(person_path):
-                continue
-
-            print(f"[•] Processing {person_name}...")
-            embeddings = []
-            for img_name in os.listdir(person_path):
-                img_path = os.path.join(person_path, img_name)
-                img = cv2.imread(img_path)
-                if img is None:
-                    continue
-                
-                # Resize image for consistency before embedding
-                img_resized = cv2.resize(img, (112, 112))
-                emb = self.get_embedding(img_resized)
-                if emb is not None:
-                    embeddings.append(emb)
-            
-            if embeddings:
-                avg_embedding = np.mean(embeddings, axis=0)
-                out_path = os.path.join(output_db_dir, f"{person_name}.npy")
-                np.save(out_path, avg_embedding)
-                print(f"[+] Saved average embedding for {person_name}")
+        # The detector lists the most confident face first
+        return self.embed_faces([image], [kpss[:1]])[0][0]
+
+    def prepare_known_database(self, known_faces_dir, output_db_dir, use_cache=True):
+        """Processes all images in the known_faces directory and saves template embeddings per person.
+
+        Images are decoded on a thread pool and embedded in batches (see
+        face_lib.enrollment.embed_people); everyone is written in one store
+        transaction. With use_cache, images embedded before (same content,
+        same model) are taken from the embedding cache.
+        """
+        people = find_person_images(known_faces_dir)
+        cache = get_embedding_cache(output_db_dir) if use_cache else None
+        embeddings, report = embed_people(self, people, cache=cache)
+        if cache is not None:
+            logger.info("[*] Embedding cache: %s", cache.stats())
+        templates = {}
+        for person_name in people:
+            if person_name in embeddings:
+                templates[person_name] = build_templates(embeddings[person_name])
+                logger.info("[+] Computed %d template(s) for %s", len(templates[person_name]), person_name)
             else:
-                print(f"[!] Skipped {person_name}: No valid faces found.")
-        print("\n✅ Known faces database is up to date.")
+                logger.warning("[!] Skipped %s: No valid faces found.", person_name)
+            for skipped in report[person_name]["skipped"]:
+                logger.info("    - %s: %s", skipped['image'], skipped['reason'])
 
-    def detect_faces_and_embeddings(self, video_path):
-        """Detects faces in a video and yields their embeddings directly."""
+        # Write everyone in one store transaction
+        if templates:
+            PackedEmbeddingStore(output_db_dir).update(put=templates)
+        logger.info("✅ Known faces database is up to date.")
+
+    def detect_faces(self, frame, detection=None):
+        """Runs only the detector on a frame. Returns (bboxes K×5 with scores, keypoints K×5×2).
+
+        `detection` (default: the engine's DetectionConfig) chooses the detector
+        resolution and filters the faces. Coordinates are always in the pixels
+        of `frame`, so crops for recognition come from the full-resolution frame.
+        """
+        detection = detection or self.detection
+        small, scale = detection.downscale(frame)
+        bboxes, kpss = self.det_model.detect(small, input_size=detection.input_size(small.shape),
+                                             max_num=0, metric='default')
+        return detection.postprocess(bboxes, kpss, scale)
+
+    def embed_faces(self, frames, keypoints):
+        """Embeds the faces of several frames with batched recognition-model calls.
+
+        Args:
+            frames: List of BGR images
+            keypoints: List (parallel to frames) of K×5×2 landmark arrays from detect_faces
+
+        Returns:
+            List (parallel to frames) of K×512 L2-normalised embedding arrays
+        """
+        input_size = self.rec_model.input_size[0]
+        crops = []
+        for frame, kpss in zip(frames, keypoints):
+            for kps in kpss:
+                crops.append(face_align.norm_crop(frame, landmark=kps, image_size=input_size))
+
+        if crops:
+            feats = np.concatenate([self.rec_model.get_feat(crops[i:i + self.rec_batch_size])
+                                    for i in range(0, len(crops), self.rec_batch_size)])
+            feats = feats / np.linalg.norm(feats, axis=1, keepdims=True)
+        else:
+            feats = np.empty((0, 512), dtype=np.float32)
+
+        results = []
+        offset = 0
+        for kpss in keypoints:
+            results.append(feats[offset:offset + len(kpss)])
+            offset += len(kpss)
+        return results
+
+    def _open_video(self, video_path):
+        """Opens a video for reading. Returns (cap, fps), or None if it cannot be used."""
         # Validate video file exists
         if not os.path.exists(video_path):
-            print(f"❌ Error: Video file does not exist: {video_path}")
-            return
+            logger.error("❌ Error: Video file does not exist: %s", video_path)
+            return None
         
         # Check file extension
         valid_extensions = ('.mp4', '.avi', '.mov', '.mkv', '.flv', '.wmv')
         if not video_path.lower().endswith(valid_extensions):
-            print(f"⚠️ Warning: File may not be a supported video format: {video_path}")
+            logger.warning("⚠️ Warning: File may not be a supported video format: %s", video_path)
         
         cap = cv2.VideoCapture(video_path)
         if not cap.isOpened():
-            print(f"❌ Error: Could not open video file: {video_path}")
-            print("Possible issues: corrupted file, unsupported codec, or insufficient permissions")
-            return
+            logger.error("❌ Error: Could not open video file: %s\n"
+                         "Possible issues: corrupted file, unsupported codec, or insufficient permissions", video_path)
+            return None
 
         fps = cap.get(cv2.CAP_PROP_FPS)
         if fps <= 0:
-            print("❌ Error: Could not determine video FPS")
+            logger.error("❌ Error: Could not determine video FPS")
             cap.release()
+            return None
+        return cap, fps
+
+    def scan_video(self, video_path, batch_frames=8, sampler=None, start_frame=0, end_frame=None, tracker=None,
+                   detection=None, timings=None, motion=None):
+        """Detects and embeds faces in sampled video frames.
+
+        Detection runs frame by frame, but the aligned face crops of up to
+        `batch_frames` sampled frames are embedded together in one batch.
+        `sampler` (a FrameSampler, default: the engine's) decides which frames
+        are analysed; skipped frames are grabbed or seeked over, not decoded.
+        Only frames in [start_frame, end_frame) are scanned. `detection` (a
+        DetectionConfig, default: the engine's) controls face detection.
+
+        With a FaceTracker, detections are linked across frames and only faces
+        the tracker asks for (new tracks and periodic re-checks) are embedded;
+        every face then also carries its 'track' and the others have
+        'embedding' None.
+
+        With a MotionGate, frames that barely differ from the last analysed
+        one skip detection: the previous frame's faces are carried forward
+        (with their embeddings, or without a tracker, extending their tracks
+        and never embedded again).
+
+        If given, `timings` (a StageTimings) accumulates the time spent in the
+        decode, motion, detect, track and embed stages and counts frames,
+        frames skipped by the motion gate, faces and embeddings.
+
+        Yields:
+            (frame_index, faces) for every sampled frame, in order, where faces
+            is a list of dicts with 'bbox', 'det_score' and 'embedding'
+        """
+        opened = self._open_video(video_path)
+        if opened is None:
             return
-            
-        frame_interval = int(2 * fps) # Process every 5 seconds
-        frame_count = 0
-        
+        cap, fps = opened
+        sampler = sampler or self.sampler
         try:
-            while True:
-                ret, frame = cap.read()
-                if not ret:
-                    break
-
-                if frame_count % frame_interval == 0:
-                    print(f"-> Scanning video at {frame_count / fps:.2f} seconds...")
-                    try:
-                        # Use InsightFace for both detection and cropping
-                        faces = self.app.get(frame)
-                        print(f"   InsightFace detected {len(faces) if faces else 0} face(s)")
-                        
-                        if faces:
-                            for i, face in enumerate(faces):
-                                # Get the bounding box for debugging
-                                bbox = face.bbox.astype(int)
-                                x1, y1, x2, y2 = bbox
-                                print(f"   Face {i+1}: bbox=({x1},{y1},{x2},{y2})")
-                                
-                                # Directly yield the embedding from the detected face
-                                if hasattr(face, 'normed_embedding') and face.normed_embedding is not None:
-                                    print(f"   Face {i+1}: Got embedding directly from InsightFace")
-                                    yield face.normed_embedding
-                                else:
-                                    print(f"   Face {i+1}: No embedding available")
-                        else:
-                            print(f"   No faces detected by InsightFace")
-                    except Exception as e:
-                        print(f"⚠️ Warning: Face detection failed at frame {frame_count}: {e}")
-                        
-                frame_count += 1
+            yield from self._scan_frames(sampler.frames(cap, fps, start_frame, end_frame), fps, batch_frames,
+                                         tracker, detection, timings, motion)
         finally:
             cap.release()
 
-    def compare_embeddings(self, input_embedding, known_db_dir, threshold=0.6, debug=False):
-        """Compares a single input embedding against the known database."""
-        if not os.path.exists(known_db_dir) or not os.listdir(known_db_dir):
+    def scan_stream(self, source, interval_seconds=1.0, tracker=None, detection=None, timings=None,
+                    queue_size=2, realtime=False, reader=None, motion=None):
+        """Detects and embeds faces in a live source (camera, RTSP/HTTP URL, or a file replayed live).
+
+        Frames come from a LiveFrameReader: a background thread keeps the
+        newest `queue_size` frames, one every `interval_seconds`, and drops
+        older ones whenever inference falls behind, so results stay close to
+        real time. Each frame is embedded as soon as it is detected (no
+        batching across frames, which would add latency). Runs until the
+        source ends or the reader is stopped; pass your own started `reader`
+        to be able to stop it and read its drop counters.
+
+        Yields:
+            (frame_index, faces) like scan_video
+        """
+        reader = reader or LiveFrameReader(source, interval_seconds=interval_seconds, queue_size=queue_size,
+                                           realtime=realtime).start()
+        try:
+            yield from self._scan_frames(reader.frames(), reader.fps, 1, tracker, detection, timings, motion)
+        finally:
+            reader.stop()
+
+    def _scan_frames(self, frames, fps, batch_frames, tracker, detection, timings, motion=None):
+        """Detection, tracking and batched recognition for (frame_index, frame) pairs; see scan_video."""
+        timings = timings if timings is not None else StageTimings()
+        if tracker is not None:
+            tracker.fps = fps
+        pending = []  # (frame_index, frame, bboxes, kpss, tracks, carried) awaiting recognition
+        detected = None  # (bboxes, kpss) of the last analysed frame, for the motion gate to carry forward
+        previous = []  # faces of the last frame yielded, whose embeddings carried frames reuse without a tracker
+
+        def flush():
+            # Which faces to embed: all of them, unless the tracker says otherwise
+            wanted = [np.array([needs for _, needs in tracks], dtype=bool) if tracks is not None
+                      else np.full(len(bboxes), not carried)
+                      for _, _, bboxes, _, tracks, carried in pending]
+            try:
+                with timings.stage("embed"):
+                    embeddings = self.embed_faces([p[1] for p in pending],
+                                                  [p[3][mask] for p, mask in zip(pending, wanted)])
+                timings.count("embeddings", sum(len(embs) for embs in embeddings))
+            except Exception as e:
+                logger.warning("⚠️ Warning: Face recognition failed for frames %d-%d: %s",
+                               pending[0][0], pending[-1][0], e)
+                embeddings = [np.empty((0, 512), dtype=np.float32)] * len(pending)
+            for (frame_index, _, bboxes, _, tracks, carried), mask, embs in zip(pending, wanted, embeddings):
+                if carried and tracks is None:
+                    # Same faces as the frame before, embeddings and all
+                    faces = [dict(face) for face in previous]
+                    previous[:] = faces
+                    yield frame_index, faces
+                    continue
+                embs = iter(embs)
+                faces = []
+                for i, bbox in enumerate(bboxes):
+                    face = {"bbox": bbox[:4], "det_score": float(bbox[4]),
+                            "embedding": next(embs, None) if mask[i] else None}
+                    if tracks is not None:
+                        track = tracks[i][0]
+                        if face["embedding"] is not None:
+                            face["track"] = tracker.observe(frame_index, track, face["embedding"])
+                        else:
+                            face["track"] = tracker.current(track, frame_index)
+                    faces.append(face)
+                previous[:] = faces
+                yield frame_index, faces
+            pending.clear()
+
+        for frame_index, frame in timed(frames, timings, "decode"):
+            logger.debug("-> Scanning video at %.2f seconds...", frame_index / fps)
+            timings.count("frames")
+            carried = False
+            if motion is not None:
+                with timings.stage("motion"):
+                    carried = not motion.should_analyze(frame) and detected is not None
+            try:
+                if carried:
+                    bboxes, kpss = detected
+                    logger.debug("   Frame unchanged, carrying %d face(s) forward", len(bboxes))
+                    timings.count("frames_skipped")
+                else:
+                    with timings.stage("detect"):
+                        bboxes, kpss = self.detect_faces(frame, detection)
+                    logger.debug("   InsightFace detected %d face(s)", len(bboxes))
+                    detected = (bboxes, kpss)
+                timings.count("faces", len(bboxes))
+                tracks = None
+                if tracker is not None:
+                    with timings.stage("track"):
+                        tracks = tracker.assign(frame_index, bboxes, recheck=not carried)
+                pending.append((frame_index, frame, bboxes, kpss, tracks, carried))
+            except Exception as e:
+                logger.warning("⚠️ Warning: Face detection failed at frame %d: %s", frame_index, e)
+                detected = None  # nothing to carry forward; analyse the next frame
+                if motion is not None:
+                    motion.reset()
+
+            if len(pending) >= batch_frames:
+                yield from flush()
+
+        if pending:
+            yield from flush()
+
+    def detect_faces_and_embeddings(self, video_path, batch_frames=8, sampler=None):
+        """Detects faces in a video and yields their embeddings directly."""
+        for _, faces in self.scan_video(video_path, batch_frames=batch_frames, sampler=sampler):
+            for face in faces:
+                yield face["embedding"]
+
+    def compare_embeddings(self, input_embedding, known_db, threshold=0.6, debug=False):
+        """Compares a single input embedding against the known database.
+
+        `known_db` is either the known_db directory or an EmbeddingGallery.
+        The match goes through the gallery's index (PIPELINE_GALLERY_INDEX);
+        only with debug are all identities scored, to log every similarity.
+        """
+        gallery = known_db if isinstance(known_db, EmbeddingGallery) else get_gallery(known_db)
+        if len(gallery) == 0:
             return "Unknown", -1 # Return if database is empty
 
-        best_match = "Unknown"
-        best_score = -1
-        all_scores = []
-
-        for filename in os.listdir(known_db_dir):
-            if filename.endswith('.npy'):
-                known_name = os.path.splitext(filename)[0]
-                known_emb = np.load(os.path.join(known_db_dir, filename))
-                
-                score = cosine_similarity([input_embedding], [known_emb])[0][0]
-                all_scores.append((known_name, score))
-                
-                if debug:
-                    print(f"    Similarity with {known_name}: {score:.4f}")
-                
-                if score > best_score:
-                    best_score = score
-                    best_match = known_name
-        
-        if debug:
-            print(f"    Best match: {best_match} (score: {best_score:.4f}, threshold: {threshold})")
+        if not debug:
+            return gallery.match(input_embedding, threshold=threshold)[0]
+
+        ids, scores = gallery.scores(input_embedding)
+        scores = scores[0]
+        best_idx = int(np.argmax(scores))
+        best_match = ids[best_idx]
+        best_score = float(scores[best_idx])
+
+        # One record for the whole dump, so the rate limit cannot cut it short
+        lines = [f"    Similarity with {known_name}: {score:.4f}" for known_name, score in zip(ids, scores)]
+        lines.append(f"    Best match: {best_match} (score: {best_score:.4f}, threshold: {threshold})")
+        logger.info("\n".join(lines))
         
         if best_score >= threshold:
             return best_match, best_score
         else:
             return "Unknown", best_score
+
+
+# Process-wide engine shared by the API server and the CLI scripts.
+# InsightFace/ONNX Runtime sessions are safe to call from several threads,
+# so only the (slow) construction needs to be guarded.
+_shared_engine = None
+_shared_engine_lock = threading.Lock()
+
+def get_shared_engine():
+    """Returns the process-wide FaceRecognitionEngine, loading it on first use."""
+    global _shared_engine
+    if _shared_engine is None:
+        with _shared_engine_lock:
+            if _shared_engine is None:
+                start = time.perf_counter()
+                _shared_engine = FaceRecognitionEngine(detection=DetectionConfig.from_env(),
+                                                       models=ModelConfig.from_env())
+                REGISTRY.observe("pipeline_model_load_seconds", time.perf_counter() - start,
+                                 "Time taken to load the face models")
+    return _shared_engine
+
+def is_engine_loaded():
+    """True once the shared engine has been created."""
+    return _shared_engine is not None
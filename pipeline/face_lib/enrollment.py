@@ -0,0 +1,146 @@
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+def find_person_images(root):
+    """Lists the enrollment images of every person in a directory tree.
+
+    Each sub-directory of `root` is one person (the directory name is the
+    person id) and the images directly inside it are their photos.
+
+    Returns:
+        Dict of person id -> sorted list of image paths
+    """
+    people = {}
+    for person_id in sorted(os.listdir(root)):
+        person_dir = os.path.join(root, person_id)
+        if not os.path.isdir(person_dir) or person_id.startswith(('.', '__')):
+            continue
+        people[person_id] = sorted(os.path.join(person_dir, name) for name in os.listdir(person_dir)
+                                   if name.lower().endswith(IMAGE_EXTENSIONS))
+    return people
+
+
+def _load(path, cache, model_id, settings):
+    """Reads one image. Returns (image, error, cache key, cached result); cache hits are not decoded."""
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+        key = None
+        if cache is not None:
+            key = cache.key(data, model_id, settings)
+            cached = cache.get(key)
+            if cached is not None:
+                return None, None, key, cached
+        image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        return image, None, key, None
+    except Exception as e:
+        return None, str(e), None, None
+
+
+def embed_people(engine, people, decode_workers=8, batch_size=64, progress_callback=None, cache=None):
+    """Embeds the enrollment images of many people with one engine.
+
+    Images are decoded on a pool of `decode_workers` threads (OpenCV releases
+    the GIL while decoding) while the engine detects faces; the face crops of
+    up to `batch_size` images are embedded together in one recognition call.
+    The most confident face of each image is used, as get_embedding() does.
+    With an EmbeddingCache, images already embedded by the same model are
+    neither decoded nor embedded again, and new results are added to it.
+
+    Args:
+        engine: FaceRecognitionEngine
+        people: Dict of person id -> list of image paths (see find_person_images)
+        progress_callback: Optional callable receiving a progress dict after
+            every batch; it may raise to abort
+
+    Returns:
+        (embeddings, report): embeddings maps person id -> K×512 array (only
+        people with at least one face), report maps person id -> dict with
+        'images', 'embedded' (of which 'cached' came from the cache) and
+        'skipped' (list of {'image', 'reason'})
+    """
+    report = {person_id: {"images": len(paths), "embedded": 0, "cached": 0, "skipped": []}
+              for person_id, paths in people.items()}
+    model_id = getattr(engine, "model_id", None)
+    if model_id is None:
+        cache = None
+    # Faces found under other detection settings would give other embeddings
+    settings = engine.detection.to_dict() if getattr(engine, "detection", None) is not None else None
+    found = {person_id: [] for person_id in people}
+    jobs = [(person_id, path) for person_id, paths in people.items() for path in paths]
+    pending = []  # (person_id, image, keypoints, path, cache key) awaiting recognition
+    new_entries = []  # (cache key, embedding or None) to add to the cache
+    done = 0
+
+    def flush():
+        try:
+            embeddings = engine.embed_faces([p[1] for p in pending], [p[2] for p in pending])
+        except Exception as e:
+            for person_id, _, _, path, _ in pending:
+                report[person_id]["skipped"].append({"image": os.path.basename(path),
+                                                     "reason": f"recognition failed: {e}"})
+        else:
+            for (person_id, _, _, _, key), emb in zip(pending, embeddings):
+                found[person_id].append(emb[0])
+                report[person_id]["embedded"] += 1
+                if key is not None:
+                    new_entries.append((key, emb[0]))
+        pending.clear()
+        if cache is not None:
+            cache.put_many(new_entries)
+            new_entries.clear()
+        if progress_callback is not None:
+            progress_callback({"images_done": done, "images": len(jobs),
+                               "percent": round(100.0 * done / len(jobs), 1) if jobs else 100.0})
+
+    with ThreadPoolExecutor(max_workers=decode_workers, thread_name_prefix="enroll-decode") as pool:
+        # Decode a bounded number of images ahead of the detector, in input order
+        read_ahead = deque()
+        next_job = 0
+        while read_ahead or next_job < len(jobs):
+            while next_job < len(jobs) and len(read_ahead) < 2 * decode_workers:
+                read_ahead.append(pool.submit(_load, jobs[next_job][1], cache, model_id, settings))
+                next_job += 1
+            person_id, path = jobs[done]
+            image, error, key, cached = read_ahead.popleft().result()
+            done += 1
+            skipped = report[person_id]["skipped"]
+            if cached is not None:
+                if len(cached):
+                    found[person_id].append(cached)
+                    report[person_id]["embedded"] += 1
+                    report[person_id]["cached"] += 1
+                else:
+                    skipped.append({"image": os.path.basename(path), "reason": "no face detected (cached)"})
+                continue
+            if image is None:
+                skipped.append({"image": os.path.basename(path), "reason": error or "unreadable image"})
+                continue
+            try:
+                bboxes, kpss = engine.detect_faces(image)
+            except Exception as e:
+                skipped.append({"image": os.path.basename(path), "reason": f"detection failed: {e}"})
+                continue
+            if len(bboxes) == 0:
+                skipped.append({"image": os.path.basename(path), "reason": "no face detected"})
+                if key is not None:
+                    new_entries.append((key, None))
+                continue
+            best = int(np.argmax(bboxes[:, 4]))
+            pending.append((person_id, image, kpss[best:best + 1], path, key))
+            if len(pending) >= batch_size:
+                flush()
+        if pending:
+            flush()
+    if cache is not None:
+        cache.put_many(new_entries)
+
+    embeddings = {person_id: np.stack(embs) for person_id, embs in found.items() if embs}
+    return embeddings, report
@@ -0,0 +1,460 @@
+import copy
+import os
+import threading
+import time
+
+import numpy as np
+
+from .index import FlatIndex, best_columns, make_index
+from .log import get_logger
+from .store import EMBEDDING_DIM, PackedEmbeddingStore, normalize_rows
+from .templates import MAX_TEMPLATES, build_templates
+
+logger = get_logger("gallery")
+
+
+def group_rows(owners, rows=None):
+    """Groups template rows by person, for max_per_identity.
+
+    Args:
+        owners: Length-R array with the person id of every template row
+        rows: Optional indices of the rows to group (e.g. the live ones); default all
+
+    Returns:
+        (ids, columns, starts): the M distinct ids (sorted), the grouped rows'
+        indices ordered by person, and where each person's run starts in
+        them (None when everyone has a single row)
+    """
+    rows = np.arange(len(owners)) if rows is None else np.asarray(rows)
+    ids, inverse = np.unique(owners[rows].astype(str), return_inverse=True)
+    if len(ids) == len(rows):
+        return ids.astype(object), rows[np.argsort(inverse)], None
+    order = np.argsort(inverse, kind='stable')
+    starts = np.searchsorted(inverse[order], np.arange(len(ids)))
+    return ids.astype(object), rows[order], starts
+
+
+def max_per_identity(owners, row_scores, grouping=None):
+    """Reduces N×R per-template scores to N×M per-identity maxima.
+
+    Args:
+        owners: Length-R array with the person id of every template row
+        row_scores: N×R similarity matrix
+        grouping: group_rows(owners) if already computed
+
+    Returns:
+        (ids, scores) with the M distinct ids (sorted) and their N×M best scores
+    """
+    ids, columns, starts = grouping if grouping is not None else group_rows(owners)
+    if starts is None:
+        return ids, row_scores[:, columns]
+    return ids, np.maximum.reduceat(row_scores[:, columns], starts, axis=1)
+
+
+class _MatchingMixin:
+    """Vectorised matching shared by the gallery and its views; needs `_grouped_snapshot()`.
+
+    `_grouped_snapshot()` returns (owners, matrix, grouping) with one matrix
+    row per template, so a person may own several rows; an identity scores
+    the best similarity over its templates. The grouping (see group_rows)
+    only covers live rows and is computed once per snapshot.
+    """
+
+    def scores(self, probes):
+        """Cosine similarity of each probe (N×512) against every known identity (N×M)."""
+        owners, matrix, grouping = self._grouped_snapshot()
+        probes = normalize_rows(np.atleast_2d(probes))
+        return max_per_identity(owners, probes @ matrix.T, grouping)
+
+    def search(self, probes, top_k=1):
+        """Returns the top_k (ids, scores) per probe, best first. Both arrays are N×k."""
+        ids, scores = self.scores(probes)
+        top, values = best_columns(scores, top_k)
+        return ids[top], values
+
+    def match(self, probes, threshold=0.6):
+        """Best match for each probe as a list of (name, score); 'Unknown' below threshold."""
+        top_ids, top_scores = self.search(probes, top_k=1)
+        if top_ids.shape[1] == 0:
+            return [("Unknown", -1)] * top_ids.shape[0]
+
+        results = []
+        for name, score in zip(top_ids[:, 0], top_scores[:, 0]):
+            if name is None:
+                # The index found no live candidate for this probe
+                results.append(("Unknown", -1))
+                continue
+            score = float(score)
+            results.append((name, score) if score >= threshold else ("Unknown", score))
+        return results
+
+
+class EmbeddingGallery(_MatchingMixin):
+    """In-memory matrix of all known embeddings for fast vectorised matching.
+
+    The database in `known_db_dir` (see PackedEmbeddingStore) is held as one
+    contiguous, L2-normalised float32 matrix with the person ids in a parallel
+    array, so cosine similarity against a batch of probes is a single matrix
+    multiply. Each person owns up to MAX_TEMPLATES rows (templates) and a
+    match takes the best of them. Right after a load the matrix is the store's read-only memory
+    map, shared between every process that serves the same database.
+
+    Rows live in a pre-allocated buffer that grows by doubling, so adding an
+    identity is an O(1) append. Replacing or deleting an identity marks its
+    old rows dead (a tombstone) instead of rebuilding the matrix; once enough
+    rows are dead the buffer is compacted. Writers publish a new snapshot
+    tuple after each change, so matching never waits on an enrollment.
+
+    Searches go through a pluggable index (see face_lib.index): 'flat' scores
+    every row exactly, while 'ivf' and 'pq' trade a little recall for speed
+    or memory on very large galleries. 'fp16' and 'int8' scan a compact copy
+    of the rows and re-rank exactly, so their results match 'flat'; with the
+    matrix memory-mapped only the compact copy stays resident. The index is
+    rebuilt whenever the buffer is reloaded or compacted and updated
+    incrementally otherwise, always on a copy that is published in the same
+    snapshot as the matrix it describes.
+
+    `put()` and `delete()` write through to the store and update the matrix
+    in place. `refresh()` picks up changes made by other processes: a new
+    store version triggers a reload, while legacy per-person files are
+    applied one by one. That check runs at most once every `check_interval`
+    seconds.
+    """
+
+    def __init__(self, known_db_dir, check_interval=2.0, compact_ratio=0.25, compact_min=64, index=None):
+        self.known_db_dir = known_db_dir
+        self.store = PackedEmbeddingStore(known_db_dir)
+        self.check_interval = check_interval
+        self.compact_ratio = compact_ratio
+        self.compact_min = compact_min
+        # Never searched itself: every published snapshot holds its own copy
+        self._prototype = make_index(index) if isinstance(index, str) else (index or FlatIndex())
+        self._lock = threading.Lock()
+        # (matrix buffer, ids buffer, alive mask, used row count, index); replaced as a whole,
+        # and republished after every change to the alive mask, so the tuple names one version
+        self._state = (*self._empty_state(0), copy.copy(self._prototype))
+        self._rows = {}  # person id -> list of its row indices in the current buffer
+        self._grouping = None  # (state, _grouped_snapshot()) it was computed for
+        self._dead = 0
+        self._signature = None  # PackedEmbeddingStore.signature() as of the last refresh
+        self._version = 0  # store version the in-memory matrix corresponds to
+        self._last_check = 0.0
+
+    @staticmethod
+    def _empty_state(capacity):
+        return (np.zeros((capacity, EMBEDDING_DIM), dtype=np.float32),
+                np.empty(capacity, dtype=object),
+                np.zeros(capacity, dtype=bool),
+                0)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, person_id):
+        return person_id in self._rows
+
+    @property
+    def ids(self):
+        """Distinct person ids."""
+        return np.array(list(self._rows), dtype=object)
+
+    def _snapshot(self):
+        """Live (row owners, matrix) at this instant, safe to use without holding the lock."""
+        matrix, ids, alive, n, _ = self._state
+        matrix, ids, alive = matrix[:n], ids[:n], alive[:n].copy()
+        if not alive.all():
+            return ids[alive], matrix[alive]
+        return ids, matrix
+
+    def _grouped_snapshot(self):
+        """(row owners, matrix, grouping of the live rows) of the current snapshot, grouped once per snapshot."""
+        # One load: every change publishes a new state tuple, so it alone keys the cache
+        state = self._state
+        cached = self._grouping
+        if cached is not None and cached[0] is state:
+            return cached[1]
+        matrix, ids, alive, n, _ = state
+        grouped = (ids[:n], matrix[:n], group_rows(ids[:n], np.flatnonzero(alive[:n])))
+        self._grouping = (state, grouped)
+        return grouped
+
+    def search(self, probes, top_k=1):
+        """Returns the top_k (ids, scores) per probe through the index. Both arrays are N×k.
+
+        Where the index finds fewer than k live candidates the remaining ids are
+        None and the scores -inf.
+        """
+        # The index must come from the same snapshot as the matrix it was built for
+        matrix, ids, alive, n, index = self._state
+        probes = normalize_rows(np.atleast_2d(probes))
+        k = min(top_k, len(self._rows))
+        if k == 0:
+            return np.empty((len(probes), 0), dtype=object), np.empty((len(probes), 0), dtype=np.float32)
+
+        # The best row is the best person; for k > 1 fetch enough rows to skip
+        # other templates of people already listed
+        fetch = k if k == 1 else k * MAX_TEMPLATES
+        rows, scores = index.search(probes, matrix[:n], alive[:n].copy(), fetch)
+        found = rows >= 0
+        top_ids = np.full(rows.shape, None, dtype=object)
+        top_ids[found] = ids[rows[found]]
+        if fetch == k:
+            return top_ids, scores
+
+        unique_ids = np.full((len(probes), k), None, dtype=object)
+        unique_scores = np.full((len(probes), k), -np.inf, dtype=np.float32)
+        for i in range(len(probes)):
+            seen = []
+            for person_id, score in zip(top_ids[i], scores[i]):
+                if person_id is not None and person_id not in seen:
+                    unique_ids[i, len(seen)] = person_id
+                    unique_scores[i, len(seen)] = score
+                    seen.append(person_id)
+                    if len(seen) == k:
+                        break
+        return unique_ids, unique_scores
+
+    # ------------------------------------------------------------------
+    # Incremental updates
+    # ------------------------------------------------------------------
+    def put(self, person_id, embeddings, metadata=None):
+        """Persists one identity (one embedding or K×512 templates) to the store and memory."""
+        version = self.store.put(person_id, embeddings, metadata=metadata)
+        self.upsert(person_id, embeddings)
+        self._note_own_write(version)
+
+    def put_many(self, embeddings, metadata=None):
+        """Persists many identities in one store transaction and adds or replaces them in memory.
+
+        Args:
+            embeddings: Dict of person id -> embedding or K×512 templates
+            metadata: Optional dict of person id -> metadata dict
+        """
+        version = self.store.update(put=embeddings, metadata=metadata)
+        for person_id, person_embeddings in embeddings.items():
+            self.upsert(person_id, person_embeddings)
+        self._note_own_write(version)
+
+    def delete(self, person_id):
+        """Deletes one identity from the store and memory. Returns False if it was unknown."""
+        version = self.store.delete(person_id)
+        if version is None:
+            return False
+        self.remove(person_id)
+        self._note_own_write(version)
+        return True
+
+    def upsert(self, person_id, embeddings):
+        """Adds or replaces a single identity in memory only."""
+        templates = build_templates(np.asarray(embeddings, dtype=np.float32).reshape(-1, EMBEDDING_DIM))
+        with self._lock:
+            self._upsert_locked(person_id, templates)
+            self._sync_file_locked(person_id)
+            self._maybe_compact_locked()
+
+    def remove(self, person_id):
+        """Tombstones a single identity in memory only. Returns False if it was not in the gallery."""
+        with self._lock:
+            removed = self._remove_locked(person_id)
+            self._sync_file_locked(person_id)
+            self._maybe_compact_locked()
+        return removed
+
+    def _note_own_write(self, version):
+        # If nobody else wrote in between, the in-memory matrix already matches
+        # this version and the next refresh() does not need to reload it.
+        with self._lock:
+            if version == self._version + 1:
+                self._version = version
+
+    def compact(self):
+        """Rewrites the buffer without dead rows."""
+        with self._lock:
+            self._compact_locked()
+
+    def _upsert_locked(self, person_id, templates):
+        matrix, ids, alive, n, index = self._state
+        end = n + len(templates)
+        if end > len(matrix):
+            matrix, ids, alive = self._grow(matrix, ids, alive, n, end)
+
+        # Append first and tombstone afterwards so readers always see the person
+        matrix[n:end] = templates
+        ids[n:end] = person_id
+        alive[n:end] = True
+        new_rows = list(range(n, end))
+        # Index the rows on a copy before publishing both, so readers never see them unindexed
+        index = copy.copy(index)
+        index.add(new_rows, matrix)
+        self._state = (matrix, ids, alive, end, index)
+
+        old_rows = self._rows.get(person_id)
+        if old_rows is not None:
+            alive[old_rows] = False
+            self._dead += len(old_rows)
+            # A grouping cached for the state above may predate the tombstones
+            self._state = (matrix, ids, alive, end, index)
+        self._rows[person_id] = new_rows
+
+    def _remove_locked(self, person_id):
+        rows = self._rows.pop(person_id, None)
+        if rows is None:
+            return False
+        matrix, ids, alive, n, index = self._state
+        alive[rows] = False
+        self._dead += len(rows)
+        self._state = (matrix, ids, alive, n, index)  # a new version for _grouped_snapshot()
+        return True
+
+    @staticmethod
+    def _grow(matrix, ids, alive, n, needed):
+        capacity = max(16, 2 * len(matrix), needed)
+        new_matrix = np.zeros((capacity, EMBEDDING_DIM), dtype=np.float32)
+        new_ids = np.empty(capacity, dtype=object)
+        new_alive = np.zeros(capacity, dtype=bool)
+        new_matrix[:n] = matrix[:n]
+        new_ids[:n] = ids[:n]
+        new_alive[:n] = alive[:n]
+        return new_matrix, new_ids, new_alive
+
+    def _maybe_compact_locked(self):
+        n = self._state[3]
+        if self._dead >= self.compact_min and self._dead > self.compact_ratio * n:
+            self._compact_locked()
+
+    def _compact_locked(self):
+        matrix, ids, alive, n, _ = self._state
+        keep = np.flatnonzero(alive[:n])
+        new_matrix, new_ids, new_alive, _ = self._empty_state(max(16, len(keep)))
+        new_matrix[:len(keep)] = matrix[keep]
+        new_ids[:len(keep)] = ids[keep]
+        new_alive[:len(keep)] = True
+        index = self._build_index(new_matrix[:len(keep)], new_alive[:len(keep)])
+        self._state = (new_matrix, new_ids, new_alive, len(keep), index)
+        self._rows = self._rows_by_person(new_ids[:len(keep)])
+        self._dead = 0
+
+    def _build_index(self, matrix, alive):
+        """A new index built for these rows; searches on older snapshots keep their own."""
+        index = copy.copy(self._prototype)
+        index.build(matrix, alive)
+        return index
+
+    @staticmethod
+    def _rows_by_person(owners):
+        rows = {}
+        for i, person_id in enumerate(owners):
+            if person_id is not None:
+                rows.setdefault(person_id, []).append(i)
+        return rows
+
+    # ------------------------------------------------------------------
+    # Keeping in sync with the store
+    # ------------------------------------------------------------------
+    def _sync_file_locked(self, person_id):
+        """Records the current state of a person's legacy file so refresh() won't reapply our own write."""
+        if self._signature is None:
+            return
+        filename = f"{person_id}.npy"
+        files = self._signature["files"]
+        try:
+            st = os.stat(os.path.join(self.known_db_dir, filename))
+            files[filename] = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            files.pop(filename, None)
+
+    def _reload_locked(self):
+        ids, matrix, _, version = self.store.load()
+        n = len(ids)
+        # Rows the store has tombstoned stay in its memory map as dead rows
+        alive = np.array([person_id is not None for person_id in ids], dtype=bool)
+        index = self._build_index(matrix, alive)
+        self._state = (matrix, np.array(ids, dtype=object), alive, n, index)
+        self._rows = self._rows_by_person(ids)
+        self._dead = n - int(alive.sum())
+        self._version = version
+
+    def refresh(self, force=False):
+        """Applies any changes made to the store. Returns True if anything changed."""
+        now = time.monotonic()
+        if not force and self._signature is not None and now - self._last_check < self.check_interval:
+            return False
+
+        with self._lock:
+            self._last_check = now
+            signature = self.store.signature()
+            old = self._signature
+            if force or old is None:
+                reload = True
+            else:
+                reload = signature["packed"] != old["packed"] and self.store.version() != self._version
+                # A removed legacy file may uncover an older packed row, so rebuild
+                reload = reload or any(name not in signature["files"] for name in old["files"])
+
+            if reload:
+                self._reload_locked()
+                self._signature = signature
+                return True
+
+            changed = [name for name, stat in signature["files"].items() if old["files"].get(name) != stat]
+            for filename in sorted(changed):
+                try:
+                    templates = self.store.load_legacy(filename)
+                except (OSError, ValueError) as e:
+                    logger.warning("⚠️ Warning: Could not load embedding %s: %s", filename, e)
+                    signature["files"].pop(filename)
+                    continue
+                self._upsert_locked(os.path.splitext(filename)[0], templates)
+
+            self._signature = signature
+            self._maybe_compact_locked()
+            return bool(changed)
+
+    def subset(self, person_ids):
+        """Read-only view restricted to the given person ids (unknown ids are ignored)."""
+        owners, matrix = self._snapshot()
+        wanted = set(person_ids)
+        keep = np.array([person_id in wanted for person_id in owners], dtype=bool)
+        return GalleryView(owners[keep], np.ascontiguousarray(matrix[keep]))
+
+
+class GalleryView(_MatchingMixin):
+    """Fixed set of identities, e.g. the expected roster of one class."""
+
+    def __init__(self, owners, matrix):
+        self._owners = owners  # person id of each template row
+        self._matrix = matrix
+        self._ids = set(owners)
+        self._grouping = group_rows(owners)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, person_id):
+        return person_id in self._ids
+
+    @property
+    def ids(self):
+        """Distinct person ids."""
+        return np.array(sorted(self._ids), dtype=object)
+
+    def _grouped_snapshot(self):
+        return self._owners, self._matrix, self._grouping
+
+
+_galleries = {}
+_galleries_lock = threading.Lock()
+
+def get_gallery(known_db_dir):
+    """Returns the process-wide gallery for a directory, refreshed if it changed.
+
+    The search index type comes from PIPELINE_GALLERY_INDEX ('flat' by default).
+    """
+    key = os.path.abspath(known_db_dir)
+    with _galleries_lock:
+        gallery = _galleries.get(key)
+        if gallery is None:
+            index = os.environ.get("PIPELINE_GALLERY_INDEX", "flat")
+            gallery = _galleries[key] = EmbeddingGallery(key, index=index)
+    gallery.refresh()
+    return gallery
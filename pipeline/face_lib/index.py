@@ -0,0 +1,374 @@
+import numpy as np
+
+# The gallery publishes each index together with the matrix snapshot it was
+# built for, and build() / add() run on a fresh copy.copy() of the published
+# index. They may therefore rebind attributes freely, but must not change an
+# array or list an older copy still reads, except at rows that copy does not
+# cover yet (row >= its snapshot's row count, which its searches never read).
+
+
+def _cluster_sums(vectors, assignment, k):
+    sums = np.zeros((k, vectors.shape[1]), dtype=np.float32)
+    np.add.at(sums, assignment, vectors)
+    return sums, np.bincount(assignment, minlength=k)
+
+
+def kmeans(vectors, k, iterations=20, seed=0, spherical=True):
+    """k-means on the rows of `vectors`. Returns (centroids k×d, assignment).
+
+    With spherical=True (for L2-normalised embeddings) points are assigned by
+    cosine similarity and centroids are re-normalised; otherwise plain
+    Euclidean k-means is used.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    k = min(k, len(vectors))
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), size=k, replace=False)].copy()
+    assignment = np.zeros(len(vectors), dtype=np.int64)
+    for _ in range(iterations):
+        if spherical:
+            assignment = np.argmax(vectors @ centroids.T, axis=1)
+        else:
+            # argmin ||x - c||^2 == argmin (||c||^2 - 2 x.c)
+            assignment = np.argmin((centroids ** 2).sum(axis=1) - 2 * vectors @ centroids.T, axis=1)
+        sums, counts = _cluster_sums(vectors, assignment, k)
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, None]
+        # Re-seed empty clusters so every centroid stays useful
+        centroids[empty] = vectors[rng.integers(len(vectors), size=int(empty.sum()))]
+        if spherical:
+            centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+    return centroids, assignment
+
+
+def best_columns(scores, k):
+    """Column indices and values of the k largest entries per row, best first."""
+    k = min(k, scores.shape[1])
+    if k == 0:
+        return np.empty((scores.shape[0], 0), dtype=np.int64), np.empty((scores.shape[0], 0), dtype=scores.dtype)
+    if k == 1:
+        top = np.argmax(scores, axis=1)[:, None]
+    else:
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+    return top, np.take_along_axis(scores, top, axis=1)
+
+
+class FlatIndex:
+    """Exact search: scores every row with one matrix multiply."""
+
+    name = 'flat'
+
+    def build(self, matrix, alive):
+        pass
+
+    def add(self, rows, matrix):
+        pass
+
+    def search(self, probes, matrix, alive, k):
+        """Returns (row indices, scores), both N×k; missing candidates have index -1."""
+        scores = probes @ matrix.T
+        if not alive.all():
+            scores[:, ~alive] = -np.inf
+        rows, values = best_columns(scores, k)
+        rows[~np.isfinite(values)] = -1
+        return rows, values
+
+
+class IVFIndex:
+    """Inverted-file index: rows are bucketed by their nearest k-means centroid.
+
+    A query is compared with the `nprobe` closest centroids and then scored
+    exactly against the rows in those buckets only. New rows are assigned to
+    the nearest existing centroid; centroids are re-trained on build(). Dead
+    rows stay in their buckets and are filtered by the alive mask.
+    Galleries smaller than `min_train` rows are searched exhaustively.
+    """
+
+    name = 'ivf'
+
+    def __init__(self, nlist=None, nprobe=8, min_train=1024):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_train = min_train
+        self.centroids = None
+        self.lists = []
+
+    def build(self, matrix, alive):
+        rows = np.flatnonzero(alive)
+        if len(rows) < self.min_train:
+            self.centroids, self.lists = None, []
+            return
+        nlist = self.nlist or int(4 * np.sqrt(len(rows)))
+        self.centroids, assignment = kmeans(matrix[rows], nlist)
+        self.lists = [list(rows[assignment == c]) for c in range(len(self.centroids))]
+
+    def add(self, rows, matrix):
+        if self.centroids is None:
+            return
+        assignment = np.argmax(matrix[rows] @ self.centroids.T, axis=1)
+        # Copy the touched buckets; older copies of the index still share the rest
+        self.lists = list(self.lists)
+        for c in np.unique(assignment):
+            self.lists[c] = self.lists[c] + [int(row) for row in np.asarray(rows)[assignment == c]]
+
+    def search(self, probes, matrix, alive, k):
+        if self.centroids is None:
+            return FlatIndex().search(probes, matrix, alive, k)
+
+        nprobe = min(self.nprobe, len(self.centroids))
+        probe_lists, _ = best_columns(probes @ self.centroids.T, nprobe)
+        all_rows = np.full((len(probes), k), -1, dtype=np.int64)
+        all_scores = np.full((len(probes), k), -np.inf, dtype=np.float32)
+        for i, lists in enumerate(probe_lists):
+            candidates = np.fromiter((row for c in lists for row in self.lists[c]), dtype=np.int64)
+            # Rows indexed after the caller took its snapshot are not in `alive` yet
+            candidates = candidates[candidates < len(alive)]
+            candidates = candidates[alive[candidates]]
+            if not len(candidates):
+                continue
+            scores = matrix[candidates] @ probes[i]
+            top, values = best_columns(scores[None, :], k)
+            all_rows[i, :top.shape[1]] = candidates[top[0]]
+            all_scores[i, :top.shape[1]] = values[0]
+        return all_rows, all_scores
+
+
+class PQIndex:
+    """Product quantisation in pure NumPy.
+
+    Each vector is split into `m` sub-vectors and every sub-vector is stored as
+    the id of its nearest of up to 256 sub-centroids, so a 512-D float32 row
+    (2 KB) becomes `m` bytes. Queries score all codes through per-sub-space
+    lookup tables, then the best `rerank` candidates are re-scored exactly
+    against the full vectors so returned scores (and threshold decisions) are
+    exact. Galleries smaller than `min_train` rows are searched exhaustively.
+    """
+
+    name = 'pq'
+
+    def __init__(self, m=32, ksub=256, rerank=64, min_train=1024):
+        self.m = m
+        self.ksub = ksub
+        self.rerank = rerank
+        self.min_train = min_train
+        self.codebooks = None  # m × ksub × dsub
+        # Stored sub-space-major (m × rows) so each lookup pass reads contiguous codes
+        self.codes = np.empty((m, 0), dtype=np.uint8)
+
+    def _encode(self, vectors):
+        dsub = vectors.shape[1] // self.m
+        sub = vectors.reshape(len(vectors), self.m, dsub)
+        codes = np.empty((len(vectors), self.m), dtype=np.uint8)
+        for j in range(self.m):
+            codebook = self.codebooks[j]
+            # argmin ||x - c||^2 == argmin (||c||^2 - 2 x.c)
+            codes[:, j] = np.argmin((codebook ** 2).sum(axis=1) - 2 * sub[:, j] @ codebook.T, axis=1)
+        return codes
+
+    def build(self, matrix, alive, max_train=20000):
+        rows = np.flatnonzero(alive)
+        if len(rows) < self.min_train:
+            self.codebooks = None
+            return
+        rng = np.random.default_rng(0)
+        train_rows = rows if len(rows) <= max_train else rng.choice(rows, size=max_train, replace=False)
+        train = np.asarray(matrix[np.sort(train_rows)], dtype=np.float32)
+        dsub = train.shape[1] // self.m
+        sub = train.reshape(len(train), self.m, dsub)
+        self.codebooks = np.stack([kmeans(np.ascontiguousarray(sub[:, j]), self.ksub, iterations=10,
+                                          spherical=False)[0]
+                                   for j in range(self.m)])
+        self.codes = np.zeros((self.m, len(matrix)), dtype=np.uint8)
+        self.codes[:, rows] = self._encode(np.asarray(matrix[rows], dtype=np.float32)).T
+
+    def add(self, rows, matrix):
+        if self.codebooks is None:
+            return
+        rows = np.asarray(rows)
+        capacity = self.codes.shape[1]
+        if rows.max() >= capacity:
+            codes = np.zeros((self.m, max(2 * capacity, rows.max() + 1)), dtype=np.uint8)
+            codes[:, :capacity] = self.codes
+            self.codes = codes
+        self.codes[:, rows] = self._encode(np.asarray(matrix[rows], dtype=np.float32)).T
+
+    def search(self, probes, matrix, alive, k):
+        if self.codebooks is None:
+            return FlatIndex().search(probes, matrix, alive, k)
+
+        n = len(alive)
+        codes = self.codes[:, :n]
+        dsub = probes.shape[1] // self.m
+        # tables[j, i, c] = <probe i sub-vector j, sub-centroid c>
+        tables = np.einsum('imd,mcd->mic', probes.reshape(len(probes), self.m, dsub), self.codebooks)
+        approx = np.zeros((len(probes), n), dtype=np.float32)
+        for j in range(self.m):
+            approx += np.take(tables[j], codes[j], axis=1)
+        approx[:, ~alive] = -np.inf
+
+        candidates, values = best_columns(approx, max(k, self.rerank))
+        all_rows = np.full((len(probes), k), -1, dtype=np.int64)
+        all_scores = np.full((len(probes), k), -np.inf, dtype=np.float32)
+        for i in range(len(probes)):
+            rows = candidates[i][np.isfinite(values[i])]
+            if not len(rows):
+                continue
+            exact = matrix[rows] @ probes[i]
+            top, scores = best_columns(exact[None, :], k)
+            all_rows[i, :top.shape[1]] = rows[top[0]]
+            all_scores[i, :top.shape[1]] = scores[0]
+        return all_rows, all_scores
+
+
+class ScalarQuantizedIndex:
+    """Keeps a float16 or int8 copy of every row and scores probes against it.
+
+    float16 halves the bytes scanned per query and int8 quarters them (each
+    dimension is scaled by the largest magnitude it had at build time; rows
+    added later are clipped to that range). The compact rows are stored in
+    blocks of `block_rows` that are converted to float32 one at a time for
+    the matrix multiply, so the scan never needs a full-precision copy of
+    the gallery. Blocks are never written once a search can see them: add()
+    copies the block it appends to, so older copies of the index keep their
+    codes.
+
+    Each row also records how far its compact copy is from the original (the
+    L2 norm of the difference), which bounds the error of its approximate
+    score against a unit probe. Every row whose score could still be among
+    the best k after that error is re-scored exactly against the full
+    vectors, so the results, and every threshold decision, are exactly the
+    flat index's.
+    """
+
+    name = 'sq'
+    PRECISIONS = ('float16', 'int8')
+
+    def __init__(self, precision='int8', block_rows=1024):
+        if precision not in self.PRECISIONS:
+            raise ValueError(f"Unknown precision: {precision}")
+        self.precision = precision
+        self.block_rows = block_rows
+        self.dtype = np.float16 if precision == 'float16' else np.int8
+        self.scale = None  # per-dimension int8 step
+        # (codes block_rows×d, ||row - decoded row|| per row) for rows [i * block_rows, (i + 1) * block_rows)
+        self.blocks = []
+
+    @property
+    def nbytes(self):
+        """Memory held by the compact rows."""
+        scale = self.scale.nbytes if self.scale is not None else 0
+        return scale + sum(codes.nbytes + errors.nbytes for codes, errors in self.blocks)
+
+    def _decode(self, codes):
+        decoded = codes.astype(np.float32)
+        return decoded if self.scale is None else decoded * self.scale
+
+    def _encode(self, vectors):
+        """(codes, errors) of a few full-precision rows."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.precision == 'float16':
+            codes = vectors.astype(np.float16)
+        else:
+            codes = np.clip(np.rint(vectors / self.scale), -127, 127).astype(np.int8)
+        # Rounded up a little to absorb float32 rounding in the scores
+        return codes, np.linalg.norm(vectors - self._decode(codes), axis=1) + 1e-5
+
+    def _new_block(self, dim):
+        return np.zeros((self.block_rows, dim), dtype=self.dtype), np.zeros(self.block_rows, dtype=np.float32)
+
+    def build(self, matrix, alive):
+        rows = np.flatnonzero(alive)
+        # Block by block, so a memory-mapped gallery is never copied to float32 in full
+        ranges = [(start, min(start + self.block_rows, len(matrix)))
+                  for start in range(0, len(matrix), self.block_rows)]
+        if self.precision == 'int8':
+            # An embedding component rarely exceeds 0.5, so that range serves an empty gallery
+            peak = np.full(matrix.shape[1], 0.5 if not len(rows) else 0.0, dtype=np.float32)
+            for start, end in ranges:
+                block_rows = rows[(rows >= start) & (rows < end)]
+                if len(block_rows):
+                    peak = np.maximum(peak, np.abs(np.asarray(matrix[block_rows], dtype=np.float32)).max(axis=0))
+            self.scale = np.maximum(peak, 1e-6) / 127
+        self.blocks = []
+        for start, end in ranges:
+            codes, errors = self._new_block(matrix.shape[1])
+            block_rows = rows[(rows >= start) & (rows < end)]
+            if len(block_rows):
+                codes[block_rows - start], errors[block_rows - start] = self._encode(matrix[block_rows])
+            self.blocks.append((codes, errors))
+
+    def add(self, rows, matrix):
+        rows = np.asarray(rows)
+        if self.precision == 'int8' and self.scale is None:
+            # Rows added before the first build
+            self.build(matrix[:0], np.zeros(0, dtype=bool))
+        blocks = list(self.blocks)
+        for b in np.unique(rows // self.block_rows):
+            while len(blocks) <= b:
+                blocks.append(self._new_block(matrix.shape[1]))
+            codes, errors = blocks[b][0].copy(), blocks[b][1].copy()
+            block_rows = rows[rows // self.block_rows == b]
+            offsets = block_rows - b * self.block_rows
+            codes[offsets], errors[offsets] = self._encode(matrix[block_rows])
+            blocks[b] = (codes, errors)
+        self.blocks = blocks
+
+    def search(self, probes, matrix, alive, k):
+        n = len(alive)
+        # Folding the int8 step into the probes makes each block a plain cast
+        scaled = probes if self.scale is None else probes * self.scale
+        approx = np.empty((len(probes), n), dtype=np.float32)
+        errors = np.empty(n, dtype=np.float32)
+        for b, (block_codes, block_errors) in enumerate(self.blocks):
+            start = b * self.block_rows
+            if start >= n:
+                break
+            end = min(start + self.block_rows, n)
+            approx[:, start:end] = scaled @ block_codes[:end - start].astype(np.float32).T
+            errors[start:end] = block_errors[:end - start]
+        approx[:, ~alive] = -np.inf
+
+        # The k-th best guaranteed score; rows whose best case falls below it cannot make the top k
+        _, lower = best_columns(approx - errors, k)
+        candidates = approx + errors >= lower[:, -1:]
+        all_rows = np.full((len(probes), k), -1, dtype=np.int64)
+        all_scores = np.full((len(probes), k), -np.inf, dtype=np.float32)
+        for i in range(len(probes)):
+            rows = np.flatnonzero(candidates[i] & np.isfinite(approx[i]))
+            if not len(rows):
+                continue
+            exact = matrix[rows] @ probes[i]
+            top, scores = best_columns(exact[None, :], k)
+            all_rows[i, :top.shape[1]] = rows[top[0]]
+            all_scores[i, :top.shape[1]] = scores[0]
+        return all_rows, all_scores
+
+
+class Float16Index(ScalarQuantizedIndex):
+    """ScalarQuantizedIndex holding float16 rows (2 bytes per dimension)."""
+
+    name = 'fp16'
+
+    def __init__(self, block_rows=1024):
+        super().__init__('float16', block_rows=block_rows)
+
+
+class Int8Index(ScalarQuantizedIndex):
+    """ScalarQuantizedIndex holding int8 rows (1 byte per dimension)."""
+
+    name = 'int8'
+
+    def __init__(self, block_rows=1024):
+        super().__init__('int8', block_rows=block_rows)
+
+
+INDEX_TYPES = {'flat': FlatIndex, 'ivf': IVFIndex, 'pq': PQIndex, 'fp16': Float16Index, 'int8': Int8Index}
+
+
+def make_index(kind='flat', **params):
+    """Creates a gallery search index by name ('flat', 'ivf', 'pq', 'fp16' or 'int8')."""
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type: {kind}")
+    return INDEX_TYPES[kind](**params)
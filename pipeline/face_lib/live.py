@@ -0,0 +1,144 @@
+import collections
+import os
+import threading
+import time
+
+import cv2
+
+from .log import get_logger
+
+logger = get_logger("live")
+
+# Frame rate assumed when a camera does not report one
+DEFAULT_FPS = 25.0
+
+
+def parse_source(source):
+    """A cv2.VideoCapture source from a string: "0" -> camera 0, anything else as given (URL or path)."""
+    if isinstance(source, str) and source.isdigit():
+        return int(source)
+    return source
+
+
+class LiveFrameReader:
+    """Reads a live video source on a background thread, keeping only the newest frames.
+
+    The reader grabs every frame as it arrives, so the camera's buffer never
+    fills up and the picture never lags, but only decodes one frame every
+    `interval_seconds` and puts it in a queue of at most `queue_size` frames.
+    When the consumer (inference) is slower than that, the oldest queued
+    frame is dropped: analysis always works on recent frames and never falls
+    behind real time. `frames_dropped` counts those.
+
+    Args:
+        source: Anything cv2.VideoCapture opens: camera index, RTSP/HTTP URL or file path
+        interval_seconds: Seconds of video between frames handed out (0 = every frame)
+        queue_size: Frames kept waiting for the consumer
+        realtime: Replay a file at its own frame rate instead of as fast as
+                  possible, to test the live path with a recording
+        reconnect_delay: Seconds to wait before reopening a stream that broke
+                  off (cameras and RTSP servers drop connections). Files end
+                  at their last frame instead
+    """
+
+    def __init__(self, source, interval_seconds=1.0, queue_size=2, realtime=False, reconnect_delay=5.0):
+        self.source = parse_source(source)
+        self.interval_seconds = interval_seconds
+        self.realtime = realtime
+        self.reconnect_delay = reconnect_delay
+        self.is_file = isinstance(self.source, str) and os.path.isfile(self.source)
+        self.fps = None
+        self.frames_read = 0
+        self.frames_queued = 0
+        self.frames_dropped = 0
+        self.reconnects = 0
+        self._queue = collections.deque(maxlen=queue_size)
+        self._ready = threading.Condition()
+        self._stopped = threading.Event()
+        self._finished = False
+        self._cap = None
+        self._thread = None
+
+    def _open(self):
+        cap = cv2.VideoCapture(self.source)
+        if not cap.isOpened():
+            cap.release()
+            return None
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        self.fps = fps if 0 < fps < 1000 else DEFAULT_FPS
+        return cap
+
+    def start(self):
+        """Opens the source and starts reading. Returns self; raises IOError if it cannot be opened."""
+        self._cap = self._open()
+        if self._cap is None:
+            raise IOError(f"Could not open video source: {self.source}")
+        self._thread = threading.Thread(target=self._read, name="live-reader", daemon=True)
+        self._thread.start()
+        return self
+
+    def _read(self):
+        frame_index = 0  # frames since start, across reconnects
+        next_index = 0
+        started = time.monotonic()
+        try:
+            while not self._stopped.is_set():
+                if not self._cap.grab():
+                    if self.is_file or self.reconnect_delay is None:
+                        break
+                    logger.warning("⚠️ Warning: Lost video source %s, reconnecting in %gs",
+                                   self.source, self.reconnect_delay)
+                    self._cap.release()
+                    self._cap = None
+                    while self._cap is None and not self._stopped.wait(self.reconnect_delay):
+                        self._cap = self._open()
+                    if self._cap is None:
+                        break
+                    self.reconnects += 1
+                    continue
+
+                if self.realtime and self.is_file:
+                    delay = started + frame_index / self.fps - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                self.frames_read += 1
+                if frame_index >= next_index:
+                    next_index = frame_index + max(1, int(round(self.interval_seconds * self.fps)))
+                    ok, frame = self._cap.retrieve()
+                    if ok:
+                        with self._ready:
+                            if len(self._queue) == self._queue.maxlen:
+                                self.frames_dropped += 1  # the deque drops the oldest on append
+                            self._queue.append((frame_index, frame))
+                            self.frames_queued += 1
+                            self._ready.notify()
+                frame_index += 1
+        finally:
+            if self._cap is not None:
+                self._cap.release()
+            with self._ready:
+                self._finished = True
+                self._ready.notify_all()
+
+    def frames(self):
+        """Yields the queued (frame_index, frame) pairs in order until the source ends or stop() is called."""
+        while True:
+            with self._ready:
+                while not self._queue and not self._finished and not self._stopped.is_set():
+                    self._ready.wait(0.5)
+                if self._stopped.is_set() or not self._queue:
+                    return
+                item = self._queue.popleft()
+            yield item
+
+    def stop(self):
+        """Stops reading and releases the source."""
+        self._stopped.set()
+        with self._ready:
+            self._ready.notify_all()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=10)
+
+    def stats(self):
+        return {"frames_read": self.frames_read, "frames_queued": self.frames_queued,
+                "frames_dropped": self.frames_dropped, "reconnects": self.reconnects}
@@ -0,0 +1,119 @@
+import json
+import logging
+import os
+import sys
+import threading
+from datetime import datetime, timezone
+
+LOGGER_NAME = "pipeline"
+
+
+def get_logger(name=None):
+    """Logger under the 'pipeline' hierarchy, e.g. get_logger("engine") -> pipeline.engine."""
+    return logging.getLogger(f"{LOGGER_NAME}.{name}" if name else LOGGER_NAME)
+
+
+class RateLimitFilter(logging.Filter):
+    """Lets at most `burst` records per call site through every `interval` seconds.
+
+    A call site is one logging statement (file and line), so a message logged
+    for every frame or face is throttled without hiding rarer ones. Warnings
+    and errors always pass. The next record let through from a throttled site
+    carries the number of records dropped in between (record.suppressed).
+    """
+
+    def __init__(self, burst=10, interval=1.0):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self._sites = {}  # (pathname, lineno) -> [window start, records passed, records dropped]
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or self.burst <= 0:
+            return True
+        key = (record.pathname, record.lineno)
+        with self._lock:
+            site = self._sites.get(key)
+            if site is None or record.created - site[0] >= self.interval:
+                if site is not None and site[2]:
+                    record.suppressed = site[2]
+                self._sites[key] = [record.created, 1, 0]
+                return True
+            if site[1] < self.burst:
+                site[1] += 1
+                return True
+            site[2] += 1
+            return False
+
+
+class ConsoleFormatter(logging.Formatter):
+    """The bare message, as the scripts always printed it, plus a note on throttled lines."""
+
+    def format(self, record):
+        message = super().format(record)
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            message += f"  (+{suppressed} similar message(s) suppressed)"
+        return message
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """One JSON object per record: time, level, logger, message and any `extra={"fields": {...}}`."""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "suppressed", 0):
+            entry["suppressed"] = record.suppressed
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging(level=None, json_path=None, rate_limit=None):
+    """Sets up the 'pipeline' loggers for a script, server or worker process.
+
+    Args:
+        level: Level name or number (default: PIPELINE_LOG_LEVEL, else INFO).
+               DEBUG adds per-frame and per-face detail
+        json_path: Also append every record as a JSON line to this file
+               (default: PIPELINE_LOG_JSON; unset = console only)
+        rate_limit: Records per second let through from any one logging
+               statement below WARNING (default: PIPELINE_LOG_RATE, else 10;
+               0 = unlimited)
+
+    Calling it again replaces the previous configuration.
+    """
+    level = level or os.environ.get("PIPELINE_LOG_LEVEL", "INFO")
+    json_path = json_path or os.environ.get("PIPELINE_LOG_JSON")
+    if rate_limit is None:
+        rate_limit = int(os.environ.get("PIPELINE_LOG_RATE", "10"))
+
+    logger = get_logger()
+    logger.setLevel(level.upper() if isinstance(level, str) else level)
+    logger.propagate = False
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
+
+    console = logging.StreamHandler(sys.stdout)
+    console.setFormatter(ConsoleFormatter())
+    handlers = [console]
+    if json_path:
+        os.makedirs(os.path.dirname(os.path.abspath(json_path)), exist_ok=True)
+        sink = logging.FileHandler(json_path, encoding="utf-8")
+        sink.setFormatter(JsonLinesFormatter())
+        handlers.append(sink)
+    for handler in handlers:
+        # One filter per handler, so each sink throttles independently
+        handler.addFilter(RateLimitFilter(burst=rate_limit))
+        logger.addHandler(handler)
+    return logger
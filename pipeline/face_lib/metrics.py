@@ -0,0 +1,186 @@
+import bisect
+import threading
+import time
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+                   60.0, 120.0, 300.0, 600.0)
+
+
+class Histogram:
+    """Bucketed distribution of observed values (Prometheus histogram semantics)."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def merge(self, other):
+        for i, n in enumerate(other.counts):
+            self.counts[i] += n
+        self.sum += other.sum
+        self.count += other.count
+
+
+class _Stage:
+    __slots__ = ("timings", "name", "start")
+
+    def __init__(self, timings, name):
+        self.timings = timings
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.timings.add(self.name, time.perf_counter() - self.start)
+
+
+class StageTimings:
+    """Per-stage durations and counters of one unit of work (e.g. one video).
+
+    Not thread-safe: each analysis (or worker process) fills its own and the
+    results are merged afterwards, so timing the hot path costs a couple of
+    perf_counter() calls and no locking. Instances pickle, so worker
+    processes can send theirs back.
+    """
+
+    def __init__(self):
+        self.stages = {}  # stage name -> Histogram of durations
+        self.counters = {}
+
+    def stage(self, name):
+        """Context manager timing one occurrence of a stage."""
+        return _Stage(self, name)
+
+    def add(self, name, seconds):
+        histogram = self.stages.get(name)
+        if histogram is None:
+            histogram = self.stages[name] = Histogram()
+        histogram.observe(seconds)
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def merge(self, other):
+        for name, histogram in other.stages.items():
+            self.stages.setdefault(name, Histogram()).merge(histogram)
+        for name, n in other.counters.items():
+            self.count(name, n)
+
+    def to_dict(self):
+        """Total seconds and number of calls per stage, plus the counters."""
+        return {
+            "stages": {name: {"seconds": round(h.sum, 4), "calls": h.count} for name, h in self.stages.items()},
+            "counters": dict(self.counters),
+        }
+
+
+def timed(iterable, timings, stage):
+    """Yields from `iterable`, adding the time spent producing each item to `stage`."""
+    iterator = iter(iterable)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        timings.add(stage, time.perf_counter() - start)
+        yield item
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in labels) + "}"
+
+
+class MetricsRegistry:
+    """Process-wide metrics rendered in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help = {}
+        self._histograms = {}  # (name, labels) -> Histogram
+        self._counters = {}  # (name, labels) -> value
+        self._gauges = {}  # name -> callable returning the current value
+
+    def _key(self, name, help, labels):
+        self._help.setdefault(name, help)
+        return name, tuple(sorted(labels.items()))
+
+    def observe(self, name, value, help="", **labels):
+        with self._lock:
+            key = self._key(name, help, labels)
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def merge(self, name, histogram, help="", **labels):
+        with self._lock:
+            self._histograms.setdefault(self._key(name, help, labels), Histogram()).merge(histogram)
+
+    def inc(self, name, value=1, help="", **labels):
+        with self._lock:
+            key = self._key(name, help, labels)
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def gauge(self, name, callback, help=""):
+        """Registers a gauge whose value is read from callback() at scrape time."""
+        with self._lock:
+            self._help[name] = help
+            self._gauges[name] = callback
+
+    def record(self, timings):
+        """Adds one analysis' StageTimings to the stage histograms and counters."""
+        for stage, histogram in timings.stages.items():
+            self.merge("pipeline_stage_seconds", histogram, "Time spent per pipeline stage", stage=stage)
+        for name, n in timings.counters.items():
+            self.inc(f"pipeline_{name}_total", n, f"Total {name.replace('_', ' ')}")
+
+    def render(self):
+        with self._lock:
+            histograms = {key: (list(h.counts), h.sum, h.count, h.buckets) for key, h in self._histograms.items()}
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            help_text = dict(self._help)
+
+        lines = []
+        described = set()
+
+        def describe(name, kind):
+            if name not in described:
+                described.add(name)
+                lines.append(f"# HELP {name} {help_text.get(name, '')}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), (counts, total, count, buckets) in sorted(histograms.items()):
+            describe(name, "histogram")
+            cumulative = 0
+            for bound, n in zip(list(buckets) + ["+Inf"], counts):
+                cumulative += n
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', bound),))} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        for (name, labels), value in sorted(counters.items()):
+            describe(name, "counter")
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+        for name, callback in sorted(gauges.items()):
+            try:
+                value = float(callback())
+            except Exception:
+                continue
+            describe(name, "gauge")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
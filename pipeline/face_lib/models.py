@@ -0,0 +1,138 @@
+import glob
+import os
+
+import onnxruntime
+from insightface.model_zoo.model_zoo import ModelRouter
+from insightface.utils import ensure_available
+
+from .log import get_logger
+
+logger = get_logger("models")
+
+# InsightFace model packs, largest and most accurate first
+MODEL_PACKS = ('buffalo_l', 'antelopev2', 'buffalo_m', 'buffalo_s', 'buffalo_sc')
+REQUIRED_MODULES = ('detection', 'recognition')
+GRAPH_OPTIMIZATION_LEVELS = {
+    "disable": onnxruntime.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    "basic": onnxruntime.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    "extended": onnxruntime.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    "all": onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+# Pack files of the optional modules, so the ones not asked for are never even opened
+_MODULE_FILES = {"1k3d68.onnx": "landmark_3d_68", "2d106det.onnx": "landmark_2d_106", "genderage.onnx": "genderage"}
+
+
+class ModelConfig:
+    """Which face models the engine loads and how ONNX Runtime runs them.
+
+    Args:
+        pack: InsightFace model pack (downloaded to `root` on first use).
+              buffalo_l has the most accurate recognizer (ResNet-50);
+              buffalo_s / buffalo_sc use a MobileFaceNet recognizer and a
+              lighter detector and run several times faster on CPU
+        root: Directory holding the packs (default ~/.insightface)
+        modules: Modules of the pack to load. Attendance needs only
+              detection and recognition; the landmark and gender/age models
+              can be added for other uses
+        rec_model: Path of an ONNX recognition model used instead of the
+              pack's, e.g. an INT8 one written by quantize_model.py
+        intra_op_threads: Threads ONNX Runtime uses inside one operator
+              (0 = one per core). With several worker processes, divide the
+              cores between them
+        inter_op_threads: Threads running independent operators in parallel
+              (0 = ONNX Runtime's default; above 1 enables parallel execution)
+        graph_optimization: ONNX Runtime graph optimisation level: disable,
+              basic, extended or all (default)
+        providers: ONNX Runtime execution providers, in order of preference
+
+    Embeddings of different packs (or recognition models) are not
+    comparable: re-enroll everyone after changing `pack` or `rec_model`.
+    """
+
+    def __init__(self, pack='buffalo_l', root='~/.insightface', modules=REQUIRED_MODULES, rec_model=None,
+                 intra_op_threads=0, inter_op_threads=0, graph_optimization='all',
+                 providers=('CPUExecutionProvider',)):
+        if graph_optimization not in GRAPH_OPTIMIZATION_LEVELS:
+            raise ValueError(f"Unknown graph optimisation level: {graph_optimization}")
+        missing = [module for module in REQUIRED_MODULES if module not in modules]
+        if missing:
+            raise ValueError(f"The engine needs the {', '.join(missing)} module(s)")
+        self.pack = pack
+        self.root = root
+        self.modules = tuple(modules)
+        self.rec_model = rec_model
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self.graph_optimization = graph_optimization
+        self.providers = tuple(providers)
+
+    def session_options(self):
+        """onnxruntime.SessionOptions with the thread and optimisation settings."""
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = GRAPH_OPTIMIZATION_LEVELS[self.graph_optimization]
+        if self.intra_op_threads:
+            options.intra_op_num_threads = self.intra_op_threads
+        if self.inter_op_threads:
+            options.inter_op_num_threads = self.inter_op_threads
+            if self.inter_op_threads > 1:
+                options.execution_mode = onnxruntime.ExecutionMode.ORT_PARALLEL
+        return options
+
+    @classmethod
+    def from_env(cls):
+        """Settings from PIPELINE_MODEL_PACK, PIPELINE_MODEL_ROOT, PIPELINE_MODEL_MODULES, PIPELINE_REC_MODEL,
+        PIPELINE_ORT_INTRA_THREADS, PIPELINE_ORT_INTER_THREADS and PIPELINE_ORT_OPT_LEVEL."""
+        modules = os.environ.get("PIPELINE_MODEL_MODULES")
+        return cls(pack=os.environ.get("PIPELINE_MODEL_PACK", "buffalo_l"),
+                   root=os.environ.get("PIPELINE_MODEL_ROOT", "~/.insightface"),
+                   modules=[m.strip() for m in modules.split(",") if m.strip()] if modules else REQUIRED_MODULES,
+                   rec_model=os.environ.get("PIPELINE_REC_MODEL") or None,
+                   intra_op_threads=int(os.environ.get("PIPELINE_ORT_INTRA_THREADS", "0")),
+                   inter_op_threads=int(os.environ.get("PIPELINE_ORT_INTER_THREADS", "0")),
+                   graph_optimization=os.environ.get("PIPELINE_ORT_OPT_LEVEL", "all"))
+
+    def replace(self, **changes):
+        """Copy with some settings changed (None values are ignored)."""
+        settings = self.to_dict()
+        settings.update({name: value for name, value in changes.items() if value is not None})
+        return ModelConfig(**settings)
+
+    def to_dict(self):
+        return {"pack": self.pack, "root": self.root, "modules": list(self.modules), "rec_model": self.rec_model,
+                "intra_op_threads": self.intra_op_threads, "inter_op_threads": self.inter_op_threads,
+                "graph_optimization": self.graph_optimization, "providers": list(self.providers)}
+
+
+def load_model(path, config):
+    """Loads one ONNX model as the matching InsightFace model class, with the config's session settings."""
+    return ModelRouter(path).get_model(sess_options=config.session_options(), providers=list(config.providers))
+
+
+def load_models(config):
+    """Loads the configured modules of a model pack. Returns {taskname: model}.
+
+    The pack is downloaded on first use. A `rec_model` in the config takes
+    the place of the pack's recognition model.
+    """
+    model_dir = ensure_available('models', config.pack, root=os.path.expanduser(config.root))
+    models = {}
+    for path in sorted(glob.glob(os.path.join(model_dir, '*.onnx'))):
+        module = _MODULE_FILES.get(os.path.basename(path))
+        if module is not None and module not in config.modules:
+            continue
+        model = load_model(path, config)
+        if model is None or model.taskname not in config.modules or model.taskname in models:
+            continue
+        if model.taskname == 'recognition' and config.rec_model:
+            continue
+        logger.debug("   Loaded %s model %s", model.taskname, os.path.basename(path))
+        models[model.taskname] = model
+    if config.rec_model:
+        model = load_model(config.rec_model, config)
+        if model is None or model.taskname != 'recognition':
+            raise ValueError(f"Not a face recognition model: {config.rec_model}")
+        models['recognition'] = model
+    missing = [module for module in config.modules if module not in models]
+    if missing:
+        raise IOError(f"Model pack {config.pack} in {model_dir} has no {', '.join(missing)} model")
+    return models
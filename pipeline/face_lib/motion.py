@@ -0,0 +1,72 @@
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """Skips face detection on sampled frames that barely differ from the last analysed one.
+
+    Each frame is shrunk to a small grayscale thumbnail (`width` pixels
+    wide) and compared with the thumbnail of the last frame that was
+    analysed. When fewer than `threshold` of its pixels changed by more than
+    `pixel_delta` grey levels, the frame is skipped and the scan carries the
+    previous frame's faces forward. Comparing with the last *analysed* frame
+    rather than the previous one means slow drift (lighting, someone
+    shuffling in) still adds up to a detection.
+
+    Args:
+        threshold: Fraction of thumbnail pixels that must change for a frame to
+                   be analysed. Lower is more sensitive; 0 analyses every frame
+        max_gap: Analyse at least every this many sampled frames however still
+                   the picture is, so faces turning towards the camera are
+                   not missed for long (0 = no limit)
+        pixel_delta: Grey-level change below which a pixel counts as unchanged
+                   (absorbs compression noise)
+        width: Thumbnail width; the height follows the frame's aspect ratio
+
+    A gate keeps state (the reference thumbnail and its counters), so use
+    one per scan; copy() gives a fresh gate with the same settings.
+    """
+
+    def __init__(self, threshold=0.002, max_gap=5, pixel_delta=12, width=160):
+        self.threshold = threshold
+        self.max_gap = max_gap
+        self.pixel_delta = pixel_delta
+        self.width = width
+        self.analyzed = 0
+        self.skipped = 0
+        self._reference = None
+        self._gap = 0
+
+    def copy(self):
+        """A gate with the same settings and no state."""
+        return MotionGate(threshold=self.threshold, max_gap=self.max_gap, pixel_delta=self.pixel_delta,
+                          width=self.width)
+
+    def thumbnail(self, frame):
+        height, width = frame.shape[:2]
+        size = (self.width, max(1, int(round(height * self.width / width))))
+        small = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+
+    def changed_fraction(self, thumbnail):
+        """Fraction of pixels that differ from the reference by more than pixel_delta."""
+        return float(np.count_nonzero(cv2.absdiff(thumbnail, self._reference) > self.pixel_delta)) / thumbnail.size
+
+    def should_analyze(self, frame):
+        """True if the frame needs face detection; False if the previous faces can be carried forward."""
+        thumbnail = self.thumbnail(frame)
+        if (self._reference is None or self._reference.shape != thumbnail.shape
+                or (self.max_gap and self._gap >= self.max_gap)
+                or self.changed_fraction(thumbnail) >= self.threshold):
+            self._reference = thumbnail
+            self._gap = 0
+            self.analyzed += 1
+            return True
+        self._gap += 1
+        self.skipped += 1
+        return False
+
+    def reset(self):
+        """Forgets the reference frame, so the next frame is always analysed."""
+        self._reference = None
+        self._gap = 0
@@ -0,0 +1,84 @@
+import itertools
+
+import cv2
+import numpy as np
+
+SAMPLING_POLICIES = ('interval', 'count')
+DECODE_STRATEGIES = ('grab', 'seek', 'read')
+
+
+class FrameSampler:
+    """Chooses which video frames get analysed and how the skipped ones are passed over.
+
+    Policies:
+        interval: one frame every `interval_seconds` (the original behaviour)
+        count:    `num_frames` frames spread evenly over the whole video
+
+    Decode strategies:
+        grab: skipped frames are only grabbed, never converted to BGR images
+        seek: jumps straight to the next sampled frame when the gap is larger
+              than `seek_threshold` frames (defaults to one second of video),
+              so frames between keyframes are not decoded at all
+        read: decodes every frame, as the original loop did (for comparison)
+    """
+
+    def __init__(self, policy='interval', interval_seconds=2.0, num_frames=None,
+                 strategy='grab', seek_threshold=None):
+        if policy not in SAMPLING_POLICIES:
+            raise ValueError(f"Unknown sampling policy: {policy}")
+        if strategy not in DECODE_STRATEGIES:
+            raise ValueError(f"Unknown decode strategy: {strategy}")
+        if policy == 'count' and not num_frames:
+            raise ValueError("The 'count' sampling policy needs num_frames")
+        self.policy = policy
+        self.interval_seconds = interval_seconds
+        self.num_frames = num_frames
+        self.strategy = strategy
+        self.seek_threshold = seek_threshold
+
+    def frame_interval(self, fps):
+        return max(1, int(self.interval_seconds * fps))
+
+    def target_frames(self, fps, total_frames):
+        """Ascending frame indices to analyse (endless for the interval policy)."""
+        if self.policy == 'count' and total_frames > 0:
+            n = min(self.num_frames, total_frames)
+            return iter(np.unique(np.linspace(0, total_frames - 1, n).round().astype(int)).tolist())
+        # Reported frame counts are estimates, so read until the decoder runs dry
+        return itertools.count(0, self.frame_interval(fps))
+
+    def frames(self, cap, fps, start_frame=0, end_frame=None):
+        """Yields (frame_index, frame) for each sampled frame of a freshly opened capture.
+
+        Only sampled frames in [start_frame, end_frame) are returned, so a
+        video split into ranges yields exactly the frames of a single pass.
+        """
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        seek_threshold = self.seek_threshold if self.seek_threshold is not None else int(fps)
+        position = 0  # index of the frame the next read()/grab() returns
+
+        for target in self.target_frames(fps, total_frames):
+            if target < start_frame:
+                continue
+            if end_frame is not None and target >= end_frame:
+                break
+
+            gap = target - position
+            seek = self.strategy == 'seek' and gap > seek_threshold
+            # A range that starts mid-video always seeks to its first frame
+            seek = seek or (position == 0 and start_frame > 0 and target > 0)
+            if seek:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+                position = target
+            else:
+                while position < target:
+                    ok = cap.read()[0] if self.strategy == 'read' else cap.grab()
+                    if not ok:
+                        return
+                    position += 1
+
+            ret, frame = cap.read()
+            if not ret:
+                return
+            position += 1
+            yield target, frame
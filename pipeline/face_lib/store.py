@@ -0,0 +1,306 @@
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from .log import get_logger
+from .templates import build_templates
+
+logger = get_logger("store")
+
+EMBEDDING_DIM = 512
+INDEX_FILE = "gallery.json"
+LOCK_FILE = "gallery.lock"
+# The matrix file is rewritten once more than this fraction of its used rows are dead
+COMPACT_RATIO = 0.25
+
+
+def normalize_rows(matrix):
+    """L2-normalises each row of a 2D array (zero rows are left as zeros)."""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class _FileLock:
+    """Minimal cross-process lock based on exclusive creation of a lock file."""
+
+    def __init__(self, path, timeout=30.0, stale_after=60.0):
+        self.path = path
+        self.timeout = timeout
+        self.stale_after = stale_after
+
+    def __enter__(self):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.write(fd, str(os.getpid()).encode())
+                os.close(fd)
+                return self
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(self.path) > self.stale_after:
+                        os.remove(self.path)  # left behind by a crashed writer
+                        continue
+                except OSError:
+                    continue
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"Timed out waiting for lock: {self.path}")
+                time.sleep(0.05)
+
+    def __exit__(self, *exc):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+class PackedEmbeddingStore:
+    """Packed on-disk embedding database.
+
+    All identities live in one L2-normalised float32 matrix
+    (`gallery.v<version>.npy`) that can be memory-mapped, with `gallery.json`
+    holding the owner id of every row, per-person metadata, the current
+    version number, the name of the matrix file and how many of its rows
+    are in use.
+
+    The matrix file has spare capacity: a write appends the new rows after
+    the used ones and marks replaced or deleted rows dead (their id becomes
+    null) before atomically swapping `gallery.json`, so an enrollment costs
+    disk I/O for its own rows only. Readers never look past the row count
+    they read, so they never see a half-written database. Once the file is
+    full or too many rows are dead it is rewritten as a new version; the
+    previous file is kept so processes that still map it keep working.
+
+    A person has up to MAX_TEMPLATES rows (templates, see build_templates),
+    so their rows share the same id.
+
+    Per-person `<id>.npy` files from the old layout are still read. They take
+    precedence over the packed matrix, so tools that write the old format keep
+    working; `migrate()` folds them into the packed matrix.
+    """
+
+    def __init__(self, db_dir):
+        self.db_dir = db_dir
+        self._lock = threading.Lock()
+
+    @property
+    def index_path(self):
+        return os.path.join(self.db_dir, INDEX_FILE)
+
+    def exists(self):
+        return os.path.exists(self.index_path)
+
+    def read_index(self):
+        """Returns the parsed gallery.json, or None if there is no packed matrix yet."""
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def version(self):
+        index = self.read_index()
+        return index["version"] if index else 0
+
+    def legacy_files(self):
+        """{file name: (mtime_ns, size)} for every per-person .npy file (old layout)."""
+        if not os.path.isdir(self.db_dir):
+            return {}
+        entries = {}
+        with os.scandir(self.db_dir) as it:
+            for entry in it:
+                if (entry.name.endswith('.npy') and not entry.name.startswith('gallery.')
+                        and entry.is_file()):
+                    st = entry.stat()
+                    entries[entry.name] = (st.st_mtime_ns, st.st_size)
+        return entries
+
+    def signature(self):
+        """Cheap change fingerprint: stat of gallery.json plus the legacy file listing."""
+        try:
+            st = os.stat(self.index_path)
+            packed = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            packed = None
+        return {"packed": packed, "files": self.legacy_files()}
+
+    def load_legacy(self, filename):
+        """Loads one per-person .npy file as normalised float32 templates (T×512)."""
+        emb = np.asarray(np.load(os.path.join(self.db_dir, filename)), dtype=np.float32)
+        return build_templates(emb.reshape(-1, emb.shape[-1]))
+
+    def load(self, mmap=True):
+        """Loads the whole database.
+
+        Returns (ids, matrix, metadata, version), where ids holds the owner of
+        each matrix row, or None for a dead row. With mmap=True and no legacy
+        files the matrix is a read-only memory map shared with other processes.
+        """
+        for attempt in range(3):
+            index = self.read_index()
+            ids, metadata, version = [], {}, 0
+            matrix = np.empty((0, EMBEDDING_DIM), dtype=np.float32)
+            if not index:
+                break
+            ids = list(index["ids"])
+            metadata = dict(index.get("metadata", {}))
+            version = index["version"]
+            if not ids:
+                break
+            try:
+                matrix = np.load(os.path.join(self.db_dir, index["matrix"]),
+                                 mmap_mode='r' if mmap else None)[:index.get("rows", len(ids))]
+                break
+            except FileNotFoundError:
+                # Another process rewrote the matrix twice since gallery.json was read
+                if attempt == 2:
+                    raise
+
+        legacy = {}
+        for filename in sorted(self.legacy_files()):
+            try:
+                legacy[os.path.splitext(filename)[0]] = self.load_legacy(filename)
+            except (OSError, ValueError) as e:
+                logger.warning("⚠️ Warning: Could not load embedding %s: %s", filename, e)
+
+        if legacy:
+            keep = [i for i, person_id in enumerate(ids) if person_id is not None and person_id not in legacy]
+            ids = [ids[i] for i in keep] + [person_id for person_id, rows in legacy.items() for _ in rows]
+            matrix = np.concatenate([np.asarray(matrix[keep], dtype=np.float32)] + list(legacy.values()))
+        return ids, matrix, metadata, version
+
+    def _write_matrix(self, rows, version):
+        """Writes live rows to a new matrix file with room to append as many again. Returns its name."""
+        os.makedirs(self.db_dir, exist_ok=True)
+        matrix_name = f"gallery.v{version}.npy"
+        tmp_matrix = os.path.join(self.db_dir, matrix_name + ".tmp")
+        matrix = np.lib.format.open_memmap(tmp_matrix, mode="w+", dtype=np.float32,
+                                           shape=(max(64, 2 * len(rows)), EMBEDDING_DIM))
+        matrix[:len(rows)] = rows
+        matrix.flush()
+        del matrix
+        os.replace(tmp_matrix, os.path.join(self.db_dir, matrix_name))
+        return matrix_name
+
+    def _write_index(self, ids, matrix_name, metadata, version):
+        """Atomically replaces gallery.json."""
+        index = {
+            "version": version,
+            "dim": EMBEDDING_DIM,
+            "matrix": matrix_name,
+            "rows": len(ids),
+            "ids": list(ids),
+            "metadata": metadata,
+        }
+        tmp_index = self.index_path + ".tmp"
+        with open(tmp_index, "w", encoding="utf-8") as f:
+            # dumps() uses the C encoder; dump() streams through the pure-Python one
+            f.write(json.dumps(index))
+        os.replace(tmp_index, self.index_path)
+
+    def _drop_old_matrices(self, keep):
+        # Windows refuses while they are mapped; the next rewrite tries again
+        for name in os.listdir(self.db_dir):
+            if name.startswith("gallery.v") and name.endswith(".npy") and name not in keep:
+                try:
+                    os.remove(os.path.join(self.db_dir, name))
+                except OSError:
+                    pass
+
+    def update(self, put=None, delete=(), metadata=None, fold_legacy=False):
+        """Applies a batch of changes as one transaction and returns the new version.
+
+        Args:
+            put: Dict of person id -> embedding, or K×512 embeddings, to add or
+                 replace; more than MAX_TEMPLATES are reduced with build_templates
+            delete: Person ids to remove
+            metadata: Optional dict of person id -> metadata dict for the ids in `put`
+            fold_legacy: Also move every legacy .npy file into the packed matrix
+        """
+        put = put or {}
+        metadata = metadata or {}
+        os.makedirs(self.db_dir, exist_ok=True)
+        with self._lock, _FileLock(os.path.join(self.db_dir, LOCK_FILE)):
+            index = self.read_index()
+            ids, meta, version, matrix_name = [], {}, 0, None
+            if index:
+                ids, meta, version = list(index["ids"]), dict(index.get("metadata", {})), index["version"]
+                ids = ids[:index.get("rows", len(ids))]
+                if ids:
+                    matrix_name = index["matrix"]
+
+            legacy = self.legacy_files() if fold_legacy else {}
+            new_rows = {}
+            for filename in sorted(legacy):
+                try:
+                    new_rows[os.path.splitext(filename)[0]] = self.load_legacy(filename)
+                except (OSError, ValueError) as e:
+                    logger.warning("⚠️ Warning: Skipping unreadable embedding %s: %s", filename, e)
+            for person_id, emb in put.items():
+                new_rows[person_id] = build_templates(np.asarray(emb, dtype=np.float32).reshape(-1, EMBEDDING_DIM))
+
+            drop = set(delete) | set(new_rows)
+            ids = [None if person_id in drop else person_id for person_id in ids]
+            added_ids = [person_id for person_id, rows in new_rows.items() for _ in rows]
+            added = (np.concatenate(list(new_rows.values())) if new_rows
+                     else np.empty((0, EMBEDDING_DIM), dtype=np.float32))
+            used, total = len(ids), len(ids) + len(added_ids)
+            dead = sum(person_id is None for person_id in ids)
+
+            matrix = None
+            if matrix_name is not None:
+                matrix = np.load(os.path.join(self.db_dir, matrix_name), mmap_mode="r+")
+            version += 1
+            if matrix is not None and total <= len(matrix) and dead <= COMPACT_RATIO * total:
+                # Append after the used rows; readers of the current version never look there
+                matrix[used:total] = added
+                matrix.flush()
+                ids = ids + added_ids
+                rewritten = False
+            else:
+                keep = [i for i, person_id in enumerate(ids) if person_id is not None]
+                live = np.asarray(matrix[keep], dtype=np.float32) if matrix is not None else added[:0]
+                ids = [ids[i] for i in keep] + added_ids
+                previous, matrix_name = matrix_name, self._write_matrix(np.concatenate([live, added]), version)
+                rewritten = True
+            del matrix
+
+            now = time.strftime("%Y-%m-%dT%H:%M:%S")
+            for person_id in delete:
+                meta.pop(person_id, None)
+            for person_id, rows in new_rows.items():
+                meta[person_id] = dict(metadata.get(person_id, {}), num_templates=len(rows), updated_at=now)
+            self._write_index(ids, matrix_name, meta, version)
+            if rewritten:
+                # Older files go, but the one just replaced stays for readers that still map it
+                self._drop_old_matrices({matrix_name, previous})
+
+            # The packed copy is now authoritative for these people
+            for person_id in list(new_rows) + list(delete):
+                path = os.path.join(self.db_dir, f"{person_id}.npy")
+                if os.path.exists(path):
+                    os.remove(path)
+            return version
+
+    def put(self, person_id, embeddings, metadata=None):
+        """Adds or replaces one identity (one embedding or K×512 templates). Returns the new version."""
+        return self.update(put={person_id: embeddings},
+                           metadata={person_id: metadata} if metadata else None)
+
+    def delete(self, person_id):
+        """Removes one identity. Returns the new version, or None if it was not stored."""
+        index = self.read_index()
+        packed = bool(index) and person_id in index["ids"]
+        legacy = os.path.exists(os.path.join(self.db_dir, f"{person_id}.npy"))
+        if not packed and not legacy:
+            return None
+        return self.update(delete=[person_id])
+
+    def migrate(self):
+        """Folds every legacy per-person .npy file into the packed matrix."""
+        return self.update(fold_legacy=True)
@@ -0,0 +1,30 @@
+import numpy as np
+
+from .index import kmeans
+
+# Upper bound on stored embeddings per identity, so the gallery grows linearly with people
+MAX_TEMPLATES = 5
+
+
+def build_templates(embeddings, max_templates=MAX_TEMPLATES):
+    """Reduces a person's enrollment embeddings to at most `max_templates` representative ones.
+
+    The embeddings are clustered with spherical k-means and each cluster
+    centroid (L2-normalised) becomes a template, so distinct looks (pose,
+    lighting, augmentations such as flips or blur) each keep their own
+    vector instead of being averaged into one blurry centroid.
+
+    Args:
+        embeddings: K×512 array (or list) of face embeddings of one person
+
+    Returns:
+        T×512 float32 array of L2-normalised templates, T = min(K, max_templates)
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float32).reshape(-1, np.shape(embeddings)[-1])
+    embeddings = embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+    if len(embeddings) <= max_templates:
+        return embeddings
+    centroids, assignment = kmeans(embeddings, max_templates)
+    # Largest clusters first, so the most typical look comes first
+    order = np.argsort(-np.bincount(assignment, minlength=len(centroids)), kind='stable')
+    return np.ascontiguousarray(centroids[order])
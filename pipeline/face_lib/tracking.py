@@ -0,0 +1,222 @@
+import numpy as np
+
+
+def iou_matrix(boxes_a, boxes_b):
+    """Intersection over union of every box in boxes_a (N×4) with every box in boxes_b (M×4)."""
+    a = np.asarray(boxes_a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(boxes_b, dtype=np.float32).reshape(-1, 4)
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+
+class Track:
+    """One face followed across sampled frames, with the identity votes of its embeddings."""
+
+    def __init__(self, track_id, frame_index, bbox):
+        self.id = track_id
+        self.bbox = np.asarray(bbox[:4], dtype=np.float32)
+        self.frames = [frame_index]  # sampled frames the face was seen in
+        self.missed = 0  # sampled frames since it was last seen
+        self.since_check = 0  # times seen since it was last embedded
+        self.embedded = 0
+        self.votes = {}  # person id -> (matching embeddings, best score)
+        self.successor = None  # track that took over after a split
+        self._embedding_sum = None
+
+    @property
+    def first_frame(self):
+        return self.frames[0]
+
+    @property
+    def last_frame(self):
+        return self.frames[-1]
+
+    @property
+    def embedding(self):
+        """Mean of the embeddings seen so far (L2-normalised), or None."""
+        if self._embedding_sum is None:
+            return None
+        return self._embedding_sum / max(np.linalg.norm(self._embedding_sum), 1e-12)
+
+    def add_embedding(self, embedding):
+        self.embedded += 1
+        if self._embedding_sum is None:
+            self._embedding_sum = np.array(embedding, dtype=np.float32)
+        else:
+            self._embedding_sum += embedding
+
+    def vote(self, person_id, score):
+        """Records the gallery match of one of this track's embeddings."""
+        if person_id == "Unknown":
+            return
+        count, best = self.votes.get(person_id, (0, -1.0))
+        self.votes[person_id] = (count + 1, max(best, score))
+
+    @property
+    def person_id(self):
+        """Identity matched most often (ties go to the higher score); None if never matched."""
+        if not self.votes:
+            return None
+        return max(self.votes, key=lambda person_id: self.votes[person_id])
+
+    @property
+    def confidence(self):
+        person_id = self.person_id
+        return None if person_id is None else self.votes[person_id][1]
+
+
+class FaceTracker:
+    """Links face detections across sampled frames so each face is embedded only occasionally.
+
+    Detections are matched greedily to live tracks by bounding-box IoU. A
+    detection that starts a new track is always embedded; a tracked face is
+    embedded again every `recheck_every` sightings, or every
+    `unknown_recheck_every` while the track has no identity yet. If a
+    re-check embedding no longer resembles the track (cosine below
+    `split_threshold`, e.g. someone else took the seat) the track is split
+    in two. Tracks not seen for more than `max_missed` sampled frames end.
+
+    `fps` is set by the engine when the video is opened so track timelines
+    can be reported in seconds.
+    """
+
+    def __init__(self, iou_threshold=0.3, max_missed=2, recheck_every=10, unknown_recheck_every=3,
+                 split_threshold=0.3):
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.recheck_every = recheck_every
+        self.unknown_recheck_every = unknown_recheck_every
+        self.split_threshold = split_threshold
+        self.fps = None
+        self.sample_gap = 1  # frames between consecutive sampled frames
+        self.tracks = []
+        self.track_count = 0
+        self.embedded = 0
+        self.skipped = 0
+        self._active = []
+        self._last_frame = None
+
+    def _new_track(self, frame_index, bbox):
+        self.track_count += 1
+        track = Track(self.track_count, frame_index, bbox)
+        self.tracks.append(track)
+        return track
+
+    def assign(self, frame_index, bboxes, recheck=True):
+        """Matches one frame's detections to tracks.
+
+        With recheck=False (detections carried over from an unchanged frame)
+        matched tracks are only extended, never scheduled for a re-check.
+
+        Returns:
+            List of (track, needs_embedding), one per detection
+        """
+        if self._last_frame is not None and frame_index > self._last_frame:
+            self.sample_gap = frame_index - self._last_frame
+        self._last_frame = frame_index
+
+        assigned = [None] * len(bboxes)
+        matched = set()
+        if len(bboxes) and self._active:
+            ious = iou_matrix([bbox[:4] for bbox in bboxes], [track.bbox for track in self._active])
+            pairs = np.argwhere(ious >= self.iou_threshold)
+            for d, t in sorted(pairs.tolist(), key=lambda pair: -ious[pair[0], pair[1]]):
+                if assigned[d] is not None or t in matched:
+                    continue
+                matched.add(t)
+                track = self._active[t]
+                track.bbox = np.asarray(bboxes[d][:4], dtype=np.float32)
+                track.frames.append(frame_index)
+                track.missed = 0
+                needs_embedding = False
+                if recheck:
+                    track.since_check += 1
+                    interval = self.recheck_every if track.votes else self.unknown_recheck_every
+                    needs_embedding = track.since_check >= interval
+                    if needs_embedding:
+                        track.since_check = 0
+                assigned[d] = (track, needs_embedding)
+
+        still_active = []
+        for t, track in enumerate(self._active):
+            if t not in matched:
+                track.missed += 1
+            if track.missed <= self.max_missed:
+                still_active.append(track)
+
+        for d, bbox in enumerate(bboxes):
+            if assigned[d] is None:
+                track = self._new_track(frame_index, bbox)
+                still_active.append(track)
+                assigned[d] = (track, True)
+        self._active = still_active
+
+        for _, needs_embedding in assigned:
+            if needs_embedding:
+                self.embedded += 1
+            else:
+                self.skipped += 1
+        return assigned
+
+    def current(self, track, frame_index):
+        """The track a face assigned to `track` belongs to at frame_index, following splits."""
+        while track.successor is not None and track.successor.first_frame <= frame_index:
+            track = track.successor
+        return track
+
+    def observe(self, frame_index, track, embedding):
+        """Adds a face's embedding to its track. Returns the track the face belongs to."""
+        track = self.current(track, frame_index)
+        reference = track.embedding
+        if reference is not None and float(reference @ embedding) < self.split_threshold:
+            track = self._split(track, frame_index)
+        track.add_embedding(embedding)
+        return track
+
+    def _split(self, track, frame_index):
+        new = self._new_track(frame_index, track.bbox)
+        new.frames = [f for f in track.frames if f >= frame_index]
+        track.frames = [f for f in track.frames if f < frame_index]
+        new.missed, new.since_check = track.missed, 0
+        track.successor = new
+        self._active = [new if t is track else t for t in self._active]
+        return new
+
+    def pop_finished(self):
+        """Removes the tracks that have ended and returns their timelines.
+
+        A tracker running on a live stream calls this now and then so it only
+        holds the tracks still on screen.
+        """
+        active = {id(track) for track in self._active}
+        finished = [track for track in self.tracks if id(track) not in active]
+        self.tracks = [track for track in self.tracks if id(track) in active]
+        return self.timelines(finished)
+
+    def timelines(self, tracks=None):
+        """Per-track summaries: identity, confidence, first/last frame and (if fps is known) seconds."""
+        result = []
+        for track in self.tracks if tracks is None else tracks:
+            if not track.frames:
+                continue
+            entry = {
+                "track_id": track.id,
+                "person_id": track.person_id,
+                "confidence": None if track.confidence is None else float(track.confidence),
+                "first_frame": int(track.first_frame),
+                "last_frame": int(track.last_frame),
+                "sightings": len(track.frames),
+                "embedded": track.embedded,
+            }
+            if self.fps:
+                entry["start_seconds"] = round(track.first_frame / self.fps, 2)
+                # Each sighting stands for the time until the next sampled frame
+                entry["end_seconds"] = round((track.last_frame + self.sample_gap) / self.fps, 2)
+            result.append(entry)
+        return result
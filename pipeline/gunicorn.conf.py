@@ -0,0 +1,26 @@
+"""
+gunicorn settings for the Pipeline API Server: gunicorn -c gunicorn.conf.py wsgi:application
+
+Every setting can be overridden with the environment variable named next to it.
+"""
+
+import os
+
+bind = os.environ.get("PIPELINE_BIND", "0.0.0.0:5000")
+# Worker processes (each runs inference in parallel with the others)
+workers = int(os.environ.get("PIPELINE_WEB_WORKERS", "2"))
+# Threads per worker: I/O such as uploads, /health and /jobs polling is
+# served while PIPELINE_INFERENCE_CONCURRENCY inference calls run
+worker_class = "gthread"
+threads = int(os.environ.get("PIPELINE_WEB_THREADS", "8"))
+# Import wsgi.py (models + gallery) once in the master, then fork: workers share those pages
+preload_app = os.environ.get("PIPELINE_PRELOAD", "1") != "0"
+# Synchronous video analysis can take minutes
+timeout = int(os.environ.get("PIPELINE_WEB_TIMEOUT", "900"))
+graceful_timeout = int(os.environ.get("PIPELINE_WEB_GRACEFUL_TIMEOUT", "120"))
+keepalive = 5
+
+def post_fork(server, worker):
+    # Threads do not survive fork, so each worker starts its own gallery watcher
+    from wsgi import start_gallery_watcher
+    start_gallery_watcher()
@@ -0,0 +1,155 @@
+"""
+Background job queue for long-running pipeline work (video analysis)
+"""
+
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from face_lib.log import get_logger
+
+logger = get_logger("jobs")
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at capacity."""
+
+
+class JobCancelled(Exception):
+    """Raised inside a job's progress callback once the job has been cancelled."""
+
+
+class Job:
+    """One unit of background work plus its status, progress and result."""
+
+    def __init__(self, kind):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = "queued"  # queued -> running -> done | failed | cancelled
+        self.progress = {}
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.future = None
+        self._cancel = threading.Event()
+        self._cleanup = None
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    @property
+    def finished(self):
+        return self.status in ("done", "failed", "cancelled")
+
+    def update_progress(self, progress):
+        """Progress callback handed to the work function; stops the work once cancelled."""
+        self.progress = dict(progress)
+        if self.cancelled:
+            raise JobCancelled()
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "progress": self.progress,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+def _run_cleanup(job):
+    """Runs the job's cleanup callable once; its errors must not change the job's outcome."""
+    cleanup, job._cleanup = job._cleanup, None
+    if cleanup is not None:
+        try:
+            cleanup()
+        except Exception:
+            logger.exception("Cleanup of %s job %s failed", job.kind, job.id)
+
+
+class JobManager:
+    """Runs jobs on a bounded pool of background threads.
+
+    At most `max_pending` jobs may be queued or running at once; further
+    submissions raise QueueFullError so a burst of uploads is turned away
+    instead of piling up. Finished jobs are forgotten `result_ttl` seconds
+    after they complete.
+    """
+
+    def __init__(self, max_workers=2, max_pending=16, result_ttl=3600):
+        self.max_pending = max_pending
+        self.result_ttl = result_ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pipeline-job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind, fn, *args, cleanup=None, **kwargs):
+        """Queues fn(*args, progress_callback=job.update_progress, **kwargs) and returns the Job.
+
+        `cleanup` (no arguments) runs once the job is over, however it ends,
+        including when it is cancelled before it starts; use it to remove the
+        job's uploaded files.
+        """
+        job = Job(kind)
+        job._cleanup = cleanup
+        with self._lock:
+            self._expire_locked()
+            if self.pending_count() >= self.max_pending:
+                raise QueueFullError(f"Job queue is full ({self.max_pending} pending)")
+            self._jobs[job.id] = job
+            job.future = self._executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def _run(self, job, fn, args, kwargs):
+        try:
+            if job.cancelled:
+                # Cancelled after the executor picked it up but before it started
+                job.status = "cancelled"
+                return
+            job.status = "running"
+            job.started_at = time.time()
+            job.result = fn(*args, progress_callback=job.update_progress, **kwargs)
+            job.status = "done"
+        except JobCancelled:
+            job.status = "cancelled"
+        except Exception as e:
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            _run_cleanup(job)
+            job.finished_at = time.time()
+
+    def get(self, job_id):
+        with self._lock:
+            self._expire_locked()
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """Requests cancellation. Returns the Job, or None if it is unknown."""
+        job = self.get(job_id)
+        if job is None:
+            return None
+        job._cancel.set()
+        if job.future is not None and job.future.cancel():
+            # Never started, so _run will not get the chance to mark it or clean up
+            job.status = "cancelled"
+            _run_cleanup(job)
+            job.finished_at = time.time()
+        return job
+
+    def pending_count(self):
+        return sum(1 for job in self._jobs.values() if not job.finished)
+
+    def _expire_locked(self):
+        cutoff = time.time() - self.result_ttl
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job.finished and job.finished_at < cutoff]:
+            del self._jobs[job_id]
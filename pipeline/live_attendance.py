@@ -0,0 +1,207 @@
+import argparse
+import json
+import signal
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime, timezone
+import numpy as np
+from face_lib.detection import DetectionConfig
+from face_lib.engine import get_shared_engine
+from face_lib.gallery import get_gallery
+from face_lib.live import LiveFrameReader
+from face_lib.log import configure_logging, get_logger
+from face_lib.motion import MotionGate
+from face_lib.tracking import FaceTracker
+from run_pipeline import DB_DIR, display_name
+
+logger = get_logger("live_attendance")
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+class LiveSession:
+    """Rolling attendance of one live session: who was recognized, when, and how confidently."""
+
+    def __init__(self, session_id, source, roster=None):
+        self.session_id = session_id
+        self.source = source
+        self.roster = set(roster) if roster is not None else None
+        self.started_at = _now()
+        self.people = {}  # person id -> first/last seen, best confidence, sightings
+        self.frames_analyzed = 0
+        self.tracks_finished = 0
+
+    def see(self, person_id, confidence, frame_index):
+        now = _now()
+        entry = self.people.get(person_id)
+        if entry is None:
+            logger.info("[+] Found %s! (Similarity: %.2f)", person_id, confidence)
+            entry = self.people[person_id] = {"user": display_name(person_id), "person_id": person_id,
+                                              "first_seen": now, "first_frame": int(frame_index),
+                                              "confidence": float(confidence), "sightings": 0}
+        entry["last_seen"] = now
+        entry["sightings"] += 1
+        entry["confidence"] = max(entry["confidence"], float(confidence))
+
+    def snapshot(self, stream_stats=None, final=False):
+        recognized = sorted(self.people.values(), key=lambda entry: entry["first_seen"])
+        snapshot = {
+            "session_id": self.session_id,
+            "source": self.source,
+            "started_at": self.started_at,
+            "updated_at": _now(),
+            "final": final,
+            "frames_analyzed": self.frames_analyzed,
+            "recognized_count": len(recognized),
+            "recognized": recognized,
+            "stream": stream_stats or {},
+        }
+        if self.roster is not None:
+            snapshot["roster"] = {"expected": len(self.roster), "absent": sorted(self.roster - self.people.keys())}
+        return snapshot
+
+def flush(api_url, snapshot, timeout=10):
+    """POSTs a session snapshot to {api_url}/live/<session_id>/recognitions. Returns True on success."""
+    url = f"{api_url.rstrip('/')}/live/{snapshot['session_id']}/recognitions"
+    request = urllib.request.Request(url, data=json.dumps(snapshot).encode("utf-8"), method="POST",
+                                     headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout):
+            return True
+    except (urllib.error.URLError, OSError) as e:
+        # The next flush sends the full state again, so nothing is lost
+        logger.warning("⚠️ Warning: Could not flush session %s to %s: %s", snapshot["session_id"], url, e)
+        return False
+
+def _gallery(roster):
+    gallery = get_gallery(DB_DIR)
+    return gallery.subset(roster) if roster is not None else gallery
+
+def run_live(source, session_id, api_url=None, interval_seconds=1.0, flush_interval=10.0, roster=None,
+             realtime=False, duration=None, queue_size=2, detection=None, threshold=0.6, engine=None,
+             stop_event=None, motion=None):
+    """Takes attendance from a live video source until it ends, `duration` passes or `stop_event` is set.
+
+    Faces are tracked across frames and only new tracks and periodic
+    re-checks are embedded and matched. Every `flush_interval` seconds the
+    session's rolling recognitions are posted to the API (if `api_url` is
+    set), finished tracks are dropped from memory and the gallery is
+    refreshed, so people enrolled meanwhile are recognized too.
+
+    Args:
+        source: Camera index, RTSP/HTTP URL, or a video file
+        session_id: Name of the attendance session (e.g. class and date)
+        api_url: Base URL of the pipeline API to flush to (None = log only)
+        interval_seconds: Seconds between analysed frames
+        flush_interval: Seconds between flushes
+        roster: Optional list of expected person ids; only they are matched
+        realtime: Replay a file at its real frame rate (for testing)
+        duration: Optional number of seconds after which to stop
+        queue_size: Frames buffered between the reader and inference; older ones are dropped
+        detection: DetectionConfig (defaults to the engine's)
+        threshold: Similarity needed for a match
+        engine: FaceRecognitionEngine to use (defaults to the shared engine)
+        stop_event: Optional threading.Event that ends the session when set
+        motion: Optional MotionGate; frames that barely differ from the last
+                analysed one skip detection (a still classroom camera
+                mostly needs none)
+
+    Returns:
+        The final session snapshot
+    """
+    engine = engine or get_shared_engine()
+    stop_event = stop_event or threading.Event()
+    reader = LiveFrameReader(source, interval_seconds=interval_seconds, queue_size=queue_size,
+                             realtime=realtime).start()
+    logger.info("[*] Live session %s on %s (%.1f fps)", session_id, source, reader.fps)
+
+    def stop_after_duration():
+        stop_event.wait(duration)
+        reader.stop()
+    threading.Thread(target=stop_after_duration, name="live-stop", daemon=True).start()
+
+    tracker = FaceTracker()
+    session = LiveSession(session_id, str(source), roster)
+    gallery = _gallery(roster)
+    next_flush = time.monotonic() + flush_interval
+
+    def stream_stats():
+        stats = reader.stats()
+        if motion is not None:
+            stats["frames_motion_skipped"] = motion.skipped
+        return stats
+    try:
+        for frame_index, faces in engine.scan_stream(source, tracker=tracker, detection=detection, reader=reader,
+                                                     motion=motion):
+            session.frames_analyzed += 1
+            embeddings = [face["embedding"] for face in faces if face["embedding"] is not None]
+            matches = iter(gallery.match(np.stack(embeddings), threshold=threshold) if embeddings else [])
+            for face in faces:
+                track = face["track"]
+                if face["embedding"] is not None:
+                    track.vote(*next(matches))
+                if track.person_id not in (None, "Unknown"):
+                    session.see(track.person_id, track.confidence, frame_index)
+
+            if time.monotonic() >= next_flush:
+                session.tracks_finished += len(tracker.pop_finished())
+                gallery = _gallery(roster)
+                if api_url:
+                    flush(api_url, session.snapshot(stream_stats()))
+                next_flush = time.monotonic() + flush_interval
+    finally:
+        stop_event.set()
+        reader.stop()
+        snapshot = session.snapshot(stream_stats(), final=True)
+        if api_url:
+            flush(api_url, snapshot)
+        logger.info("[*] Live session %s ended: %d frames analysed, %d dropped, %d people recognized",
+                    session_id, session.frames_analyzed, reader.frames_dropped, len(session.people))
+    return snapshot
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Take attendance from a live camera or stream.")
+    parser.add_argument('--source', type=str, required=True,
+                        help='Camera index (e.g. 0), RTSP/HTTP URL, or a video file (see --realtime)')
+    parser.add_argument('--session', type=str, required=True, help='Session id, e.g. cs101_2025-01-31')
+    parser.add_argument('--api_url', type=str, default='http://localhost:5000',
+                        help='Pipeline API to flush recognitions to; empty to only log (default: http://localhost:5000)')
+    parser.add_argument('--interval', type=float, default=1.0, help='Seconds between analysed frames (default: 1).')
+    parser.add_argument('--flush_interval', type=float, default=10.0,
+                        help='Seconds between flushes to the API (default: 10).')
+    parser.add_argument('--roster', type=str, help='Comma-separated person ids expected in the session.')
+    parser.add_argument('--duration', type=float, help='Stop after this many seconds (default: run until stopped).')
+    parser.add_argument('--realtime', action='store_true',
+                        help='Replay a video file at its real frame rate, as if it were a camera.')
+    parser.add_argument('--queue_size', type=int, default=2,
+                        help='Frames buffered ahead of inference; older ones are dropped (default: 2).')
+    parser.add_argument('--det_size', type=str, default='640x640',
+                        help='Detector input: WxH, or one number for the longest side keeping the aspect ratio (default: 640x640).')
+    parser.add_argument('--min_face_size', type=int, default=0, help='Ignore faces smaller than this many pixels.')
+    parser.add_argument('--motion_gate', action='store_true',
+                        help='Skip face detection on frames that barely differ from the last analysed one.')
+    parser.add_argument('--motion_threshold', type=float, default=0.002,
+                        help='Fraction of (downsampled) pixels that must change for a frame to be analysed (default: 0.002).')
+    parser.add_argument('--motion_max_gap', type=int, default=5,
+                        help='With --motion_gate, analyse at least every this many frames (default: 5).')
+    args = parser.parse_args()
+    configure_logging()
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+    roster = [p.strip() for p in args.roster.split(",") if p.strip()] if args.roster else None
+    try:
+        run_live(args.source, args.session, api_url=args.api_url or None, interval_seconds=args.interval,
+                 flush_interval=args.flush_interval, roster=roster, realtime=args.realtime,
+                 duration=args.duration, queue_size=args.queue_size,
+                 detection=DetectionConfig(det_size=args.det_size, min_face_size=args.min_face_size),
+                 stop_event=stop,
+                 motion=MotionGate(threshold=args.motion_threshold, max_gap=args.motion_max_gap)
+                 if args.motion_gate else None)
+    except KeyboardInterrupt:
+        pass
+    except IOError as e:
+        logger.error("❌ %s", e)
+        exit(1)
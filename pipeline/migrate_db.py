@@ -0,0 +1,34 @@
+import argparse
+import os
+from face_lib.store import PackedEmbeddingStore
+
+def migrate_known_db(db_dir):
+    """Converts a per-person .npy known_db directory into the packed store format.
+
+    Args:
+        db_dir: Embedding database directory to migrate in place
+
+    Returns:
+        Number of identities in the packed store after migration
+    """
+    if not os.path.isdir(db_dir):
+        print(f"❌ Database directory does not exist: {db_dir}")
+        return None
+
+    store = PackedEmbeddingStore(db_dir)
+    legacy = store.legacy_files()
+    print(f"📦 Packing {len(legacy)} per-person embedding file(s) in: {db_dir}")
+
+    version = store.migrate()
+    count = len(set(store.read_index()["ids"]) - {None})
+    print(f"✅ Packed store is at version {version} with {count} identities")
+    return count
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert a per-person .npy embedding database into the packed store format.")
+    parser.add_argument('--db_dir', type=str, default='data/output/embeddings/known_db',
+                       help='Embedding database directory (default: data/output/embeddings/known_db)')
+    args = parser.parse_args()
+
+    if migrate_known_db(os.path.abspath(args.db_dir)) is None:
+        exit(1)
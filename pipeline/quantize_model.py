@@ -0,0 +1,169 @@
+import argparse
+import json
+import os
+import time
+
+import cv2
+import numpy as np
+from insightface.utils import face_align
+from onnxruntime.quantization import (CalibrationDataReader, QuantFormat, QuantType, quantize_dynamic,
+                                      quantize_static)
+
+from face_lib.engine import FaceRecognitionEngine
+from face_lib.enrollment import find_person_images
+from face_lib.gallery import EmbeddingGallery
+from face_lib.log import configure_logging, get_logger
+from face_lib.models import ModelConfig, load_model
+
+logger = get_logger("quantize")
+
+def aligned_faces(engine, people):
+    """Aligned recognition crops of the most confident face in each photo. Returns (person ids, crops)."""
+    owners, crops = [], []
+    input_size = engine.rec_model.input_size[0]
+    for person_id, paths in people.items():
+        for path in paths:
+            image = cv2.imread(path)
+            if image is None:
+                continue
+            _, kpss = engine.detect_faces(image)
+            if len(kpss):
+                owners.append(person_id)
+                crops.append(face_align.norm_crop(image, landmark=kpss[0], image_size=input_size))
+    return owners, crops
+
+class FaceCalibrationReader(CalibrationDataReader):
+    """Feeds face crops to the static quantiser, preprocessed as the recognition model expects them."""
+
+    def __init__(self, rec_model, crops, batch_size=16):
+        self.rec_model = rec_model
+        self.crops = crops
+        self.batch_size = batch_size
+        self.position = 0
+
+    def get_next(self):
+        if self.position >= len(self.crops):
+            return None
+        batch = self.crops[self.position:self.position + self.batch_size]
+        self.position += self.batch_size
+        model = self.rec_model
+        blob = cv2.dnn.blobFromImages(batch, 1.0 / model.input_std, model.input_size,
+                                      (model.input_mean, model.input_mean, model.input_mean), swapRB=True)
+        return {model.input_name: blob}
+
+def quantize(rec_model, output_path, method="static", crops=None):
+    """Writes an INT8 copy of the recognition model.
+
+    static quantises weights and activations (QDQ format, per-channel
+    weights) with ranges calibrated on real face crops; it is the faster of
+    the two for a convolutional network. dynamic only needs the model but
+    computes activation ranges at run time.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    if method == "dynamic":
+        quantize_dynamic(rec_model.model_file, output_path, weight_type=QuantType.QInt8)
+    else:
+        if not crops:
+            raise ValueError("Static quantisation needs calibration faces")
+        quantize_static(rec_model.model_file, output_path, FaceCalibrationReader(rec_model, crops),
+                        quant_format=QuantFormat.QDQ, per_channel=True,
+                        activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8)
+
+def embed(model, crops, batch_size=32):
+    """L2-normalised embeddings of aligned crops, and the seconds it took."""
+    start = time.perf_counter()
+    feats = np.concatenate([model.get_feat(crops[i:i + batch_size]) for i in range(0, len(crops), batch_size)])
+    seconds = time.perf_counter() - start
+    return feats / np.linalg.norm(feats, axis=1, keepdims=True), seconds
+
+def check_accuracy(reference, candidate, owners, crops, gallery, threshold=0.6):
+    """Compares a candidate recognition model with the reference one on the same face crops.
+
+    Both models' embeddings are matched against the enrolled gallery (built
+    with the reference model, as it is in production).
+
+    Returns:
+        Dict with the cosine similarity between the two models' embeddings
+        (mean and worst), how often both pick the same identity, each
+        model's accuracy against the person the photo belongs to, and
+        milliseconds per face for each model
+    """
+    ref_embs, ref_seconds = embed(reference, crops)
+    cand_embs, cand_seconds = embed(candidate, crops)
+    cosine = np.sum(ref_embs * cand_embs, axis=1)
+    ref_matches = [name for name, _ in gallery.match(ref_embs, threshold=threshold)]
+    cand_matches = [name for name, _ in gallery.match(cand_embs, threshold=threshold)]
+    enrolled = [person_id in gallery for person_id in owners]
+    n_enrolled = max(sum(enrolled), 1)
+    return {
+        "faces": len(crops),
+        "cosine_mean": round(float(cosine.mean()), 4),
+        "cosine_min": round(float(cosine.min()), 4),
+        "agreement": round(sum(r == c for r, c in zip(ref_matches, cand_matches)) / len(crops), 4),
+        "reference_accuracy": round(sum(e and m == o for e, m, o in zip(enrolled, ref_matches, owners)) / n_enrolled, 4),
+        "candidate_accuracy": round(sum(e and m == o for e, m, o in zip(enrolled, cand_matches, owners)) / n_enrolled, 4),
+        "reference_ms_per_face": round(1000 * ref_seconds / len(crops), 3),
+        "candidate_ms_per_face": round(1000 * cand_seconds / len(crops), 3),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Write an INT8 copy of the face recognition model and check it against the full model.")
+    parser.add_argument('--images', type=str, required=True,
+                        help='Directory with one folder of photos per person (e.g. the enrollment photos)')
+    parser.add_argument('--output', type=str,
+                        help='Where to write the INT8 model (default: data/models/<model>_int8.onnx)')
+    parser.add_argument('--method', choices=('static', 'dynamic'), default='static',
+                        help='static (calibrated on --images, faster) or dynamic quantisation (default: static)')
+    parser.add_argument('--calibration_faces', type=int, default=200,
+                        help='Faces used to calibrate static quantisation (default: 200)')
+    parser.add_argument('--check_only', type=str, help='Skip quantising; check this recognition model instead')
+    parser.add_argument('--db_dir', type=str, default='data/output/embeddings/known_db',
+                        help='Enrolled gallery to match against (default: data/output/embeddings/known_db)')
+    parser.add_argument('--min_agreement', type=float, default=0.99,
+                        help='Fail if the models pick the same identity for fewer faces than this (default: 0.99)')
+    parser.add_argument('--report', type=str, help='Also write the accuracy report to this JSON file')
+    args = parser.parse_args()
+    configure_logging()
+
+    # The reference is always the pack's own full-precision recognition model
+    config = ModelConfig(**dict(ModelConfig.from_env().to_dict(), rec_model=None))
+    engine = FaceRecognitionEngine(models=config)
+    owners, crops = aligned_faces(engine, find_person_images(args.images))
+    if not crops:
+        logger.error("❌ No faces found in %s", args.images)
+        exit(1)
+    logger.info("[*] %d face(s) from %d people", len(crops), len(set(owners)))
+
+    candidate_path = args.check_only
+    if candidate_path is None:
+        stem = os.path.splitext(os.path.basename(engine.rec_model.model_file))[0]
+        candidate_path = args.output or os.path.join("data", "models", f"{stem}_int8.onnx")
+        logger.info("[*] Quantising %s (%s) -> %s", engine.rec_model.model_file, args.method, candidate_path)
+        quantize(engine.rec_model, candidate_path, args.method, crops[::max(1, len(crops) // args.calibration_faces)])
+        logger.info("   Size: %.1f MB -> %.1f MB", os.path.getsize(engine.rec_model.model_file) / 2**20,
+                    os.path.getsize(candidate_path) / 2**20)
+
+    candidate = load_model(candidate_path, config)
+    candidate.prepare(ctx_id=0)
+    gallery = EmbeddingGallery(args.db_dir)
+    gallery.refresh(force=True)
+    if len(gallery) == 0:
+        logger.error("❌ No enrolled gallery at %s to measure identity agreement on; run enroll.py first", args.db_dir)
+        exit(1)
+    report = check_accuracy(engine.rec_model, candidate, owners, crops, gallery)
+    report["model"] = candidate_path
+    logger.info("\n".join(["", "[*] Candidate vs full-precision model:",
+                           f"  Embedding similarity: mean {report['cosine_mean']}, worst {report['cosine_min']}",
+                           f"  Same identity picked: {report['agreement']:.2%} of {report['faces']} faces",
+                           f"  Accuracy: {report['reference_accuracy']:.2%} -> {report['candidate_accuracy']:.2%}",
+                           f"  Speed: {report['reference_ms_per_face']} -> {report['candidate_ms_per_face']} ms per face"]))
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if report["agreement"] < args.min_agreement:
+        logger.error("❌ Agreement %.2f%% is below %.2f%%; keep the full-precision model",
+                     100 * report["agreement"], 100 * args.min_agreement)
+        exit(1)
+    logger.info("✅ Use it with PIPELINE_REC_MODEL=%s (enrolled embeddings stay valid)", os.path.abspath(candidate_path))
@@ -1,16 +1,463 @@
 import argparse
+import json
 import os
-from face_lib.engine import FaceRecognitionEngine
+import time
+import math
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import cv2
+import numpy as np
+from face_lib.detection import DetectionConfig
+from face_lib.engine import get_shared_engine
+from face_lib.gallery import get_gallery
+from face_lib.log import configure_logging, get_logger
+from face_lib.metrics import REGISTRY, StageTimings
+from face_lib.motion import MotionGate
+from face_lib.sampling import FrameSampler, SAMPLING_POLICIES, DECODE_STRATEGIES
+from face_lib.tracking import FaceTracker
 
 # Use relative path from the pipeline directory
 DB_DIR = os.path.join(os.path.dirname(__file__), "data", "output", "embeddings", "known_db")
+# Candidates listed per face in the debug similarity dump, and faces dumped per segment
+DEBUG_TOP_K = 5
+DEBUG_MAX_FACES = 500
+# Longest time range of a video analysed as one task in a batch
+BATCH_SEGMENT_SECONDS = 300
 
-def analyze_video(video_path, return_results=False):
+logger = get_logger("analysis")
+
+def display_name(person_id):
+    """Extracts the user name from a person_id (format: name_rollno or prof_name_subject)."""
+    if person_id.startswith("prof_"):
+        # Professor format: prof_name_subject
+        return person_id[5:]  # Remove 'prof_' prefix
+    # Student format: name_rollno - extract just the name
+    parts = person_id.split("_")
+    return parts[0] if parts else person_id
+
+def _video_frame_count(video_path):
+    """Frame count reported by the container (0 if unknown)."""
+    if not os.path.isfile(video_path):
+        return 0  # e.g. a pipe fed by a streaming upload; opening it here would consume it
+    cap = cv2.VideoCapture(video_path)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    return max(total_frames, 0)
+
+def _analyze_segment(engine, gallery, video_path, sampler, start_frame=0, end_frame=None,
+                     progress_callback=None, total_frames=0, on_recognized=None,
+                     roster=None, deadline=None, tracking=True, detection=None, debug=False, motion=None):
+    """Recognizes faces in frames [start_frame, end_frame) of a video.
+
+    With tracking, faces are followed across sampled frames by a FaceTracker
+    and only new tracks and periodic re-checks are embedded and matched; the
+    other faces inherit their track's identity.
+
+    If given, progress_callback is called with a progress dict after every
+    sampled frame; it may raise to abort the analysis. on_recognized is called
+    with (person_id, confidence, frame_index) the first time a person is found.
+    Scanning stops early once everyone in `roster` has been recognized or
+    time.time() passes `deadline`. With debug, the best DEBUG_TOP_K gallery
+    candidates of every embedded face are logged and returned. A copy of
+    `motion` (a MotionGate) skips detection on unchanged frames.
+
+    Returns:
+        Dict with 'face_count', 'frames_scanned', 'frames_covered' (video
+        frames up to where scanning stopped), 'stop_reason' (None if the whole
+        range was scanned) and 'details' (person id -> confidence, first_frame
+        and first_detection, the 1-based index of the face within this segment).
+        With tracking also 'tracks' (per-track timelines) and 'embedded' /
+        'embeddings_skipped' (recognition-model calls made and avoided).
+        'timings' is the segment's StageTimings; with debug also 'debug_matches'
+        and with motion also 'frames_motion_skipped'
+    """
+    details = {}
+    face_count = 0
+    frames_scanned = 0
+    last_frame = None
+    stop_reason = None
+
+    tracker = FaceTracker() if tracking else None
+    gate = motion.copy() if motion is not None else None
+    timings = StageTimings()
+    debug_matches = [] if debug else None
+
+    # Faces arrive per sampled frame; match each frame's faces in one batch
+    frames = engine.scan_video(video_path, sampler=sampler, start_frame=start_frame, end_frame=end_frame,
+                               tracker=tracker, detection=detection, timings=timings, motion=gate)
+    for frame_index, faces in frames:
+        frames_scanned += 1
+        last_frame = frame_index
+        if progress_callback is not None:
+            progress_callback({
+                "frames_scanned": frames_scanned,
+                "current_frame": frame_index,
+                "percent": round(100.0 * frame_index / total_frames, 1) if total_frames else None,
+                "faces_detected": face_count,
+                "recognized_count": len(details),
+            })
+
+        embeddings = [face["embedding"] for face in faces if face["embedding"] is not None]
+        matches = []
+        if embeddings:
+            with timings.stage("match"):
+                matches = gallery.match(np.stack(embeddings), threshold=0.6)
+            if debug:
+                _dump_similarities(gallery, frame_index, [f for f in faces if f["embedding"] is not None],
+                                   embeddings, matches, debug_matches)
+        matches = iter(matches)
+        for face in faces:
+            face_count += 1
+            track = face.get("track")
+            if face["embedding"] is not None:
+                name, score = next(matches)
+                if track is not None:
+                    track.vote(name, score)
+            elif track is None:
+                # Recognition failed and there is no track to inherit an identity from
+                continue
+            if track is not None:
+                # The track's identity so far, from all of its matched embeddings
+                if track.person_id is None:
+                    continue
+                name, score = track.person_id, track.confidence
+
+            if name != "Unknown":
+                if name not in details:
+                    logger.info("[+] Found %s! (Similarity: %.2f)", name, score)
+                    details[name] = {"confidence": score, "first_detection": face_count,
+                                     "first_frame": frame_index}
+                    if on_recognized is not None:
+                        on_recognized(name, score, frame_index)
+                else:
+                    logger.debug("  Already recognized: %s (score: %.4f)", name, score)
+                    # Update confidence if higher
+                    if score > details[name]["confidence"]:
+                        details[name]["confidence"] = score
+
+        if roster is not None and roster <= details.keys():
+            stop_reason = "roster_complete"
+            break
+        if deadline is not None and time.time() >= deadline:
+            stop_reason = "time_budget"
+            break
+
+    frames.close()
+
+    if stop_reason is None:
+        range_end = end_frame if end_frame is not None else total_frames
+        frames_covered = max(range_end - start_frame, 0)
+    else:
+        frames_covered = 0 if last_frame is None else last_frame + 1 - start_frame
+    result = {"face_count": face_count, "frames_scanned": frames_scanned, "frames_covered": frames_covered,
+              "stop_reason": stop_reason, "details": details, "timings": timings}
+    if debug:
+        result["debug_matches"] = debug_matches
+    if gate is not None:
+        result["frames_motion_skipped"] = gate.skipped
+    if tracker is not None:
+        result["tracks"] = tracker.timelines()
+        result["embedded"] = tracker.embedded
+        result["embeddings_skipped"] = tracker.skipped
+    return result
+
+def _dump_similarities(gallery, frame_index, faces, embeddings, matches, dump):
+    """Logs and appends to `dump` the best gallery candidates of each embedded face of a frame."""
+    top_ids, top_scores = gallery.search(np.stack(embeddings), top_k=DEBUG_TOP_K)
+    for face, (name, score), ids, scores in zip(faces, matches, top_ids, top_scores):
+        candidates = [{"person_id": person_id, "score": round(float(s), 4)}
+                      for person_id, s in zip(ids, scores) if person_id is not None]
+        # One record per face, so the rate limit cannot cut a face's candidates short
+        logger.info("    Frame %d face %s -> %s (%.4f): %s", frame_index, [int(v) for v in face["bbox"]], name,
+                    score, ", ".join(f"{c['person_id']} {c['score']:.4f}" for c in candidates),
+                    extra={"fields": {"frame": int(frame_index), "match": name, "candidates": candidates}})
+        if len(dump) < DEBUG_MAX_FACES:
+            dump.append({"frame": int(frame_index), "bbox": [int(v) for v in face["bbox"]],
+                         "match": name, "score": round(float(score), 4), "candidates": candidates})
+
+def _merge_segments(segments):
+    """Combines per-segment results (in video order) into what a single pass would report."""
+    face_count = 0
+    details = {}
+    for segment in segments:
+        for name, detail in segment["details"].items():
+            if name not in details:
+                # Face indices continue from the faces seen in earlier segments
+                details[name] = {"confidence": detail["confidence"],
+                                 "first_detection": face_count + detail["first_detection"],
+                                 "first_frame": detail["first_frame"]}
+            elif detail["confidence"] > details[name]["confidence"]:
+                details[name]["confidence"] = detail["confidence"]
+        face_count += segment["face_count"]
+    return face_count, details
+
+def _merge_tracks(segments):
+    """Concatenates the per-segment track timelines, renumbering the tracks in video order."""
+    tracks = []
+    for segment in segments:
+        for track in segment.get("tracks", []):
+            tracks.append(dict(track, track_id=len(tracks) + 1))
+    return tracks
+
+def _presence_seconds(tracks):
+    """Seconds each recognized person was on screen: the union of their tracks' time spans."""
+    spans = {}
+    for track in tracks:
+        if track["person_id"] is not None and "start_seconds" in track:
+            spans.setdefault(track["person_id"], []).append((track["start_seconds"], track["end_seconds"]))
+
+    presence = {}
+    for person_id, person_spans in spans.items():
+        total, covered_until = 0.0, None
+        for start, end in sorted(person_spans):
+            if covered_until is not None:
+                start = max(start, covered_until)
+            if end > start:
+                total += end - start
+            covered_until = end if covered_until is None else max(covered_until, end)
+        presence[person_id] = round(total, 2)
+    return presence
+
+# Processes in the shared pool; a caller asking for more workers is capped to this
+POOL_WORKERS = int(os.environ.get("PIPELINE_VIDEO_WORKERS", "1"))
+_pool = None
+_pool_size = 0
+
+def _get_pool(workers):
+    """The one shared process pool, created on first use and kept for later videos.
+
+    It gets max(workers, POOL_WORKERS) processes and is never resized, so
+    callers can not fork more model-loading processes than that.
+
+    Returns:
+        (pool, workers), the number of workers capped to the pool's size
+    """
+    global _pool, _pool_size
+    if _pool is None:
+        _pool_size = max(workers, POOL_WORKERS)
+        _pool = ProcessPoolExecutor(max_workers=_pool_size, initializer=_init_worker)
+    if workers > _pool_size:
+        logger.info("[!] Capping %d workers to the pool's %d", workers, _pool_size)
+    return _pool, min(workers, _pool_size)
+
+def _init_worker():
+    # Spawned workers do not inherit the parent's logging setup
+    configure_logging()
+    # Load the model once per worker process, before any segment arrives
+    get_shared_engine()
+
+def _worker_analyze_segment(video_path, sampler, start_frame, end_frame, total_frames, roster, deadline,
+                            tracking, detection, debug, motion):
+    gallery = get_gallery(DB_DIR)
+    if roster is not None:
+        gallery = gallery.subset(roster)
+    return _analyze_segment(get_shared_engine(), gallery, video_path, sampler, start_frame, end_frame,
+                            total_frames=total_frames, roster=roster, deadline=deadline, tracking=tracking,
+                            detection=detection, debug=debug, motion=motion)
+
+def _segment_bounds(total_frames, segments):
+    """Start frames of `segments` equal time ranges, followed by None (the end of the video)."""
+    return [total_frames * i // segments for i in range(segments)] + [None]
+
+def _split_settings(segments, tracking, motion):
+    """(tracking, motion) for a video analysed as `segments` separate time ranges.
+
+    A range would start with a fresh tracker and motion gate, so a face on
+    screen across a boundary would get new tracks, votes and re-checks there.
+    Split videos are therefore analysed without either, which merges into the
+    same results as a serial run without them.
+    """
+    if segments > 1 and (tracking or motion is not None):
+        logger.info("[!] Analysing %d segments without face tracking or motion gate, to match a serial run",
+                    segments)
+        return False, None
+    return tracking, motion
+
+def _analyze_in_parallel(video_path, sampler, workers, total_frames, progress_callback=None,
+                         on_recognized=None, roster=None, deadline=None, tracking=True, detection=None,
+                         debug=False, motion=None):
+    """Splits the video into `workers` time ranges and analyses them in worker processes.
+
+    Returns the per-segment results in video order, or None if the video
+    length is unknown and it has to be analysed serially. Progress is
+    reported once per finished segment. Once the segments finished so far
+    (in video order) cover the whole roster, the remaining ones are dropped.
+    """
+    if total_frames <= 0:
+        logger.info("[!] Unknown video length, analysing serially")
+        return None
+
+    pool, workers = _get_pool(workers)
+    bounds = _segment_bounds(total_frames, workers)
+    logger.info("[*] Splitting video into %d segments", workers)
+    futures = [pool.submit(_worker_analyze_segment, video_path, sampler, bounds[i], bounds[i + 1],
+                           total_frames, roster, deadline, tracking, detection, debug, motion)
+               for i in range(workers)]
+    try:
+        results = []
+        reported = set()
+        for i, future in enumerate(futures):
+            results.append(future.result())
+            face_count, details = _merge_segments(results)
+            if on_recognized is not None:
+                for name in details.keys() - reported:
+                    on_recognized(name, details[name]["confidence"], details[name]["first_frame"])
+                reported.update(details)
+            if progress_callback is not None:
+                progress_callback({
+                    "segments_done": i + 1,
+                    "segments": workers,
+                    "percent": round(100.0 * (i + 1) / workers, 1),
+                    "faces_detected": face_count,
+                    "recognized_count": len(details),
+                })
+            if roster is not None and roster <= details.keys() and i + 1 < workers:
+                results[-1]["stop_reason"] = "roster_complete"
+                break
+        return results
+    finally:
+        for future in futures:
+            future.cancel()
+
+def _apply_roster(gallery, roster):
+    """Restricts the gallery to a roster. Returns (gallery, roster as a set of enrolled ids, not enrolled ids)."""
+    if roster is None:
+        return gallery, None, []
+    roster = set(roster)
+    not_enrolled = sorted(person_id for person_id in roster if person_id not in gallery)
+    roster -= set(not_enrolled)
+    logger.info("[*] Matching against a roster of %d people", len(roster))
+    return gallery.subset(roster), roster, not_enrolled
+
+def _summarize(segments, elapsed, total_frames, roster=None, not_enrolled=(), tracking=True, motion=None,
+               timings=None, debug=False, label=None):
+    """Merges a video's segment results, records its metrics, logs its statistics and returns the API results."""
+    face_count, recognition_details = _merge_segments(segments)
+    analysis = StageTimings()
+    for segment in segments:
+        analysis.merge(segment["timings"])
+    REGISTRY.record(analysis)
+    REGISTRY.observe("pipeline_video_seconds", elapsed, "Wall-clock time to analyse one video")
+    frames_scanned = sum(segment["frames_scanned"] for segment in segments)
+    stop_reasons = [segment["stop_reason"] for segment in segments if segment["stop_reason"]]
+    stopped_early = stop_reasons[0] if stop_reasons else None
+    scanned_fraction = None
+    if total_frames:
+        covered = sum(segment["frames_covered"] for segment in segments)
+        scanned_fraction = round(min(covered / total_frames, 1.0), 4)
+    if stopped_early:
+        logger.info("[*] Stopped early (%s) after scanning %d frames", stopped_early, frames_scanned)
+    recognized_people = set(recognition_details)
+    processed_faces = face_count
+    tracks = _merge_tracks(segments)
+    presence = _presence_seconds(tracks)
+    
+    # One record for the whole report, so the rate limit cannot cut it short
+    report = ["", f"[*] Statistics{f' for {label}' if label else ''}:",
+              f"  Total faces detected: {face_count}",
+              f"  Faces processed: {processed_faces}",
+              f"  Analysis time: {elapsed:.2f}s ({frames_scanned / max(elapsed, 1e-9):.1f} frames/s)"]
+    if tracking:
+        embedded = sum(segment.get("embedded", 0) for segment in segments)
+        skipped = sum(segment.get("embeddings_skipped", 0) for segment in segments)
+        report.append(f"  Face tracks: {len(tracks)}")
+        report.append(f"  Faces embedded: {embedded} (skipped {skipped} already-tracked faces)")
+    if motion is not None:
+        motion_skipped = sum(segment.get("frames_motion_skipped", 0) for segment in segments)
+        report.append(f"  Frames without detection: {motion_skipped} of {frames_scanned} (unchanged picture)")
+
+    report += ["", "--- Analysis Complete ---"]
+    if recognized_people:
+        report.append("Recognized individuals in the video:")
+        report += [f"- {person}" for person in sorted(recognized_people)]
+    else:
+        report.append("No known individuals were recognized in the video.")
+    logger.info("\n".join(report), extra={"fields": {"frames_scanned": frames_scanned, "faces": face_count,
+                                                       "seconds": round(elapsed, 4),
+                                                       "recognized": sorted(recognized_people)}})
+    
+    # Format results for API response
+    summary = []
+    for person in sorted(recognized_people, key=lambda p: recognition_details[p]["first_detection"]):
+        summary.append({
+            "user": display_name(person),
+            "person_id": person,
+            "confidence": float(recognition_details[person]["confidence"]),  # Convert to Python float
+            "first_detection_frame": int(recognition_details[person]["first_detection"]),  # Convert to Python int
+            "presence_seconds": presence.get(person)
+        })
+    
+    results = {
+        "success": True,
+        "frames_scanned": frames_scanned,
+        "scanned_fraction": scanned_fraction,
+        "stopped_early": stopped_early,
+        "total_faces_detected": face_count,
+        "faces_processed": processed_faces,
+        "recognized_count": len(recognized_people),
+        "summary": summary
+    }
+    if tracking:
+        results["faces_embedded"] = embedded
+        results["embeddings_skipped"] = skipped
+        results["tracks"] = tracks
+    if motion is not None:
+        results["frames_motion_skipped"] = motion_skipped
+    if debug:
+        results["debug_matches"] = [match for segment in segments for match in segment.get("debug_matches", [])]
+    if timings is not None:
+        timings.merge(analysis)
+        results["timing"] = dict(timings.to_dict(), seconds=round(elapsed, 4),
+                                 frames_per_second=round(frames_scanned / max(elapsed, 1e-9), 2),
+                                 faces_per_second=round(face_count / max(elapsed, 1e-9), 2))
+    if roster is not None:
+        results["roster"] = {
+            "expected": len(roster) + len(not_enrolled),
+            "absent": sorted(roster - recognized_people),
+            "not_enrolled": not_enrolled,
+        }
+    return results
+
+def analyze_video(video_path, return_results=False, engine=None, sampler=None, workers=1,
+                  progress_callback=None, on_recognized=None, roster=None, time_budget=None, tracking=True,
+                  detection=None, timings=None, debug=False, motion=None):
     """Runs the full face recognition pipeline on a video.
     
     Args:
         video_path: Path to the video file
         return_results: If True, return detailed results instead of just success/failure
+        engine: FaceRecognitionEngine to use (defaults to the shared, already-loaded engine)
+        sampler: FrameSampler choosing which frames to analyse (defaults to one every 2 seconds)
+        workers: Number of worker processes; above 1 the video is split into that
+                 many time ranges that are analysed in parallel, each worker with
+                 its own warm engine. Tracks and the motion gate can not carry
+                 over a range boundary, so a split video is analysed without
+                 them (this is logged) and the results match a serial run with
+                 tracking=False and no motion gate
+        progress_callback: Optional callable receiving a progress dict (frames
+                 scanned, percent, faces found so far) while the video is analysed;
+                 an exception raised from it aborts the analysis
+        on_recognized: Optional callable receiving (person_id, confidence, frame_index)
+                 as soon as each person is first recognized
+        roster: Optional list of expected person ids. Only these are matched, and
+                 the analysis stops once all of them have been recognized
+        time_budget: Optional number of seconds after which the analysis stops
+        tracking: Follow faces across sampled frames and only re-run recognition
+                 on new tracks and periodic re-checks (default). The results then
+                 include per-track timelines and each person's presence time
+        detection: DetectionConfig with the detector resolution and face filters
+                 (defaults to the engine's)
+        timings: Optional StageTimings (e.g. already holding the upload time).
+                 The per-stage times of this analysis are added to it and the
+                 results then include a 'timing' breakdown
+        debug: Log the best gallery candidates and their similarities for every
+                 embedded face and return them as 'debug_matches' (slow; meant
+                 for diagnosing single requests)
+        motion: Optional MotionGate. Sampled frames that barely differ from the
+                 last analysed one skip face detection and reuse its faces; the
+                 results then report 'frames_motion_skipped'
+    
+    Stage times and frame/face counts are always added to the process-wide
+    metrics (face_lib.metrics.REGISTRY).
     
     Returns:
         If return_results=False: Boolean indicating success
@@ -19,107 +466,306 @@ def analyze_video(video_path, return_results=False):
     # Validate video file exists
     if not os.path.exists(video_path):
         error_msg = f"[ERROR] Video file does not exist: {video_path}"
-        print(error_msg)
+        logger.error(error_msg)
         if return_results:
             return {"success": False, "error": error_msg, "summary": []}
         return False
     
-    # Check if database directory exists
-    if not os.path.exists(DB_DIR) or not os.listdir(DB_DIR):
+    # Check that the database has at least one enrolled person
+    gallery = get_gallery(DB_DIR)
+    if len(gallery) == 0:
         error_msg = f"[ERROR] No known faces database found at: {DB_DIR}"
-        print(error_msg)
-        print("Please run enroll.py first to add known faces to the database.")
+        logger.error("%s\nPlease run enroll.py first to add known faces to the database.", error_msg)
         if return_results:
             return {"success": False, "error": error_msg, "summary": []}
         return False
     
-    print(f"[*] Analyzing video: {video_path}")
-    print(f"[*] Using database: {DB_DIR}")
+    logger.info("[*] Analyzing video: %s", video_path)
+    logger.info("[*] Using database: %s", DB_DIR)
     
-    engine = FaceRecognitionEngine()
+    gallery, roster, not_enrolled = _apply_roster(gallery, roster)
+    deadline = time.time() + time_budget if time_budget else None
+    start = time.perf_counter()
     
-    recognized_people = set()
-    recognition_details = {}
-    face_count = 0
-    processed_faces = 0
-
-    # Generator function yields embeddings directly
-    embedding_generator = engine.detect_faces_and_embeddings(video_path)
-
-    for input_embedding in embedding_generator:
-        face_count += 1
-        print(f"  Processing face #{face_count}...")
-        
-        if input_embedding is not None:
-            processed_faces += 1
-            print(f"    Got embedding with shape: {input_embedding.shape}")
-            # Compare against the known database with debug info
-            name, score = engine.compare_embeddings(input_embedding, DB_DIR, threshold=0.6, debug=True)
-            
-            if name != "Unknown":
-                if name not in recognized_people:
-                    print(f"[+] Found {name}! (Similarity: {score:.2f})")
-                    recognized_people.add(name)
-                    recognition_details[name] = {"confidence": score, "first_detection": face_count}
-                else:
-                    print(f"  Already recognized: {name} (score: {score:.4f})")
-                    # Update confidence if higher
-                    if score > recognition_details[name]["confidence"]:
-                        recognition_details[name]["confidence"] = score
-        else:
-            print(f"  Could not process face #{face_count}")
-    
-    print(f"\n[*] Statistics:")
-    print(f"  Total faces detected: {face_count}")
-    print(f"  Faces processed: {processed_faces}")
+    total_frames = _video_frame_count(video_path)
+    segments = None
+    if workers > 1 and total_frames > 0:
+        tracking, motion = _split_settings(workers, tracking, motion)
+        segments = _analyze_in_parallel(video_path, sampler, workers, total_frames, progress_callback,
+                                        on_recognized, roster, deadline, tracking, detection, debug, motion)
+    if segments is None:
+        segments = [_analyze_segment(engine or get_shared_engine(), gallery, video_path, sampler,
+                                     progress_callback=progress_callback, total_frames=total_frames,
+                                     on_recognized=on_recognized, roster=roster, deadline=deadline,
+                                     tracking=tracking, detection=detection, debug=debug, motion=motion)]
+    elapsed = time.perf_counter() - start
+    results = _summarize(segments, elapsed, total_frames, roster, not_enrolled, tracking=tracking, motion=motion,
+                         timings=timings, debug=debug)
+    return results if return_results else True
 
-    print("\n--- Analysis Complete ---")
-    if recognized_people:
-        print("Recognized individuals in the video:")
-        for person in sorted(list(recognized_people)):
-            print(f"- {person}")
+def _video_length(video_path):
+    """(frame count, fps) of a video; the count is 0 if unknown."""
+    cap = cv2.VideoCapture(video_path)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    cap.release()
+    return max(total_frames, 0), fps if fps and fps > 0 else 25.0
+
+def analyze_videos(videos, workers=1, engine=None, sampler=None, tracking=True, detection=None, timings=None,
+                   debug=False, motion=None, progress_callback=None, segment_seconds=BATCH_SEGMENT_SECONDS):
+    """Analyses a batch of videos, e.g. a day's classroom recordings, sharing one pool of workers.
+
+    Every video is cut into time segments of at most `segment_seconds` (and
+    into enough segments that a batch smaller than the pool still keeps every
+    worker busy). The segments of all videos run on the shared pool of warm
+    worker processes, longest first and at most `workers` at a time, so
+    decoding and inference of different videos overlap and the batch scales
+    with the number of cores instead of waiting for each video in turn. With workers=1 the
+    videos are analysed one after another with the shared engine.
+
+    Args:
+        videos: List of dicts with 'video' (path) and optionally 'tag' (e.g.
+                the class) and 'roster' (expected person ids; only they are
+                matched in that video, and its remaining segments are dropped
+                once all of them have been found)
+        workers: Worker processes shared by all videos
+        engine: FaceRecognitionEngine for workers=1 (defaults to the shared engine)
+        sampler, tracking, detection, debug, motion: As for analyze_video, for every video
+                (a video split into several segments is analysed without
+                tracking and motion gate, as with analyze_video)
+        timings: Optional StageTimings; the stage times of all videos are added
+                to it and every result then includes its own 'timing'
+        progress_callback: Optional callable receiving a progress dict (videos
+                and segments done) whenever a segment finishes
+        segment_seconds: Longest time range analysed as one task
+
+    Returns:
+        Dict with 'success', 'videos' (one result per input video, in input
+        order, as analyze_video(return_results=True) returns it, plus 'video'
+        and 'tag'), 'videos_failed', and 'frames_scanned', 'seconds' and
+        'frames_per_second' for the whole batch
+    """
+    gallery = get_gallery(DB_DIR)
+    if len(gallery) == 0:
+        error_msg = f"[ERROR] No known faces database found at: {DB_DIR}"
+        logger.error("%s\nPlease run enroll.py first to add known faces to the database.", error_msg)
+        return {"success": False, "error": error_msg, "videos": []}
+
+    logger.info("[*] Analyzing a batch of %d video(s) with %d worker(s)", len(videos), workers)
+    start = time.perf_counter()
+    results = [None] * len(videos)
+    batch = []  # videos that exist, with their gallery, roster and segment bounds
+    for index, entry in enumerate(videos):
+        video_path = entry["video"]
+        label = entry.get("tag") or os.path.basename(video_path)
+        if not os.path.exists(video_path):
+            error_msg = f"[ERROR] Video file does not exist: {video_path}"
+            logger.error(error_msg)
+            results[index] = {"success": False, "error": error_msg, "summary": []}
+            continue
+        video_gallery, roster, not_enrolled = _apply_roster(gallery, entry.get("roster"))
+        total_frames, fps = _video_length(video_path)
+        segments = 1
+        if workers > 1 and total_frames > 0:
+            segments = max(math.ceil(workers / len(videos)), math.ceil(total_frames / (segment_seconds * fps)))
+            segments = min(segments, total_frames)
+        video_tracking, video_motion = _split_settings(segments, tracking, motion)
+        batch.append({"index": index, "path": video_path, "label": label, "gallery": video_gallery,
+                      "roster": roster, "not_enrolled": not_enrolled, "total_frames": total_frames,
+                      "tracking": video_tracking, "motion": video_motion,
+                      "bounds": _segment_bounds(total_frames, segments), "segments": [None] * segments})
+
+    def finish(video, segments):
+        elapsed = time.perf_counter() - start  # the batch's wall-clock time until this video was done
+        video_timings = StageTimings() if timings is not None else None
+        results[video["index"]] = _summarize(segments, elapsed, video["total_frames"], video["roster"],
+                                             video["not_enrolled"], tracking=video["tracking"],
+                                             motion=video["motion"],
+                                             timings=video_timings, debug=debug, label=video["label"])
+        if timings is not None:
+            timings.merge(video_timings)
+
+    def report_progress(segments_done, segments_total):
+        if progress_callback is not None:
+            videos_done = sum(result is not None for result in results)
+            progress_callback({"videos_done": videos_done, "videos": len(videos),
+                               "segments_done": segments_done, "segments": segments_total,
+                               "percent": round(100.0 * segments_done / max(segments_total, 1), 1)})
+
+    if workers <= 1:
+        for done, video in enumerate(batch, 1):
+            logger.info("[*] Analyzing video: %s", video["path"])
+            try:
+                segment = _analyze_segment(engine or get_shared_engine(), video["gallery"], video["path"], sampler,
+                                           total_frames=video["total_frames"], roster=video["roster"],
+                                           tracking=tracking, detection=detection, debug=debug, motion=motion)
+                finish(video, [segment])
+            except Exception as e:
+                logger.warning("⚠️ Warning: Analysis of %s failed: %s", video["path"], e)
+                results[video["index"]] = {"success": False, "error": str(e), "summary": []}
+            report_progress(done, len(batch))
     else:
-        print("No known individuals were recognized in the video.")
-    
-    if return_results:
-        # Format results for API response
-        summary = []
-        for person in recognized_people:
-            # Extract student name from person_id (format: name_rollno or prof_name_subject)
-            if person.startswith("prof_"):
-                # Professor format: prof_name_subject
-                user_name = person[5:]  # Remove 'prof_' prefix
-            else:
-                # Student format: name_rollno - extract just the name
-                parts = person.split("_")
-                user_name = parts[0] if parts else person
-            
-            summary.append({
-                "user": user_name,
-                "person_id": person,
-                "confidence": float(recognition_details[person]["confidence"]),  # Convert to Python float
-                "first_detection_frame": int(recognition_details[person]["first_detection"])  # Convert to Python int
-            })
-        
-        return {
-            "success": True,
-            "total_faces_detected": face_count,
-            "faces_processed": processed_faces,
-            "recognized_count": len(recognized_people),
-            "summary": summary
-        }
-    
-    return True
+        pool, workers = _get_pool(workers)
+        tasks = [(video, k) for video in batch for k in range(len(video["segments"]))]
+
+        def task_frames(task):
+            video, k = task
+            bounds = video["bounds"]
+            end = bounds[k + 1] if bounds[k + 1] is not None else video["total_frames"]
+            return end - bounds[k]
+        # Longest segments first, so a long video does not start last and finish alone
+        tasks.sort(key=task_frames, reverse=True)
+        queue = iter(tasks)
+        owners = {}  # futures in flight -> (video, segment)
+
+        done = 0
+
+        def submit_next():
+            # The pool is shared with other requests, so keep at most `workers` segments in flight
+            nonlocal done
+            while len(owners) < workers:
+                task = next(queue, None)
+                if task is None:
+                    return
+                video, k = task
+                if results[video["index"]] is not None:
+                    done += 1  # the video already failed or found its whole roster
+                    continue
+                future = pool.submit(_worker_analyze_segment, video["path"], sampler, video["bounds"][k],
+                                     video["bounds"][k + 1], video["total_frames"], video["roster"], None,
+                                     video["tracking"], detection, debug, video["motion"])
+                owners[future] = (video, k)
+
+        try:
+            submit_next()
+            while owners:
+                finished_futures, _ = wait(owners, return_when=FIRST_COMPLETED)
+                for future in finished_futures:
+                    video, k = owners.pop(future)
+                    done += 1
+                    if results[video["index"]] is not None:
+                        report_progress(done, len(tasks))
+                        continue
+                    try:
+                        video["segments"][k] = future.result()
+                    except Exception as e:
+                        logger.warning("⚠️ Warning: Analysis of %s failed: %s", video["path"], e)
+                        results[video["index"]] = {"success": False, "error": str(e), "summary": []}
+                        report_progress(done, len(tasks))
+                        continue
+
+                    # Segments finished so far, in video order
+                    finished = []
+                    for segment in video["segments"]:
+                        if segment is None:
+                            break
+                        finished.append(segment)
+                    if len(finished) == len(video["segments"]):
+                        finish(video, finished)
+                    elif video["roster"] is not None and video["roster"] <= _merge_segments(finished)[1].keys():
+                        finished[-1]["stop_reason"] = "roster_complete"
+                        finish(video, finished)
+                    report_progress(done, len(tasks))
+                submit_next()
+        finally:
+            for future in owners:
+                future.cancel()
+
+    elapsed = time.perf_counter() - start
+    videos_results = [dict(result, video=os.path.basename(entry["video"]), tag=entry.get("tag"))
+                      for entry, result in zip(videos, results)]
+    frames_scanned = sum(result.get("frames_scanned", 0) for result in videos_results)
+    failed = sum(not result["success"] for result in videos_results)
+    logger.info("[*] Batch done: %d video(s), %d failed, %d frames in %.2fs (%.1f frames/s)", len(videos), failed,
+                frames_scanned, elapsed, frames_scanned / max(elapsed, 1e-9))
+    batch_results = {"success": True, "videos": videos_results, "videos_failed": failed,
+                     "frames_scanned": frames_scanned, "seconds": round(elapsed, 4),
+                     "frames_per_second": round(frames_scanned / max(elapsed, 1e-9), 2)}
+    if timings is not None:
+        batch_results["timing"] = timings.to_dict()
+    return batch_results
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Analyze a video to recognize known faces.")
-    parser.add_argument('--video', type=str, required=True, help='Path to the input video file.')
+    parser.add_argument('--video', type=str, nargs='+',
+                        help='Path to the input video file; several paths are analysed as one batch.')
+    parser.add_argument('--batch', type=str,
+                        help='JSON file listing videos to analyse as one batch: [{"video": path, "tag": "cs101", '
+                             '"roster": [ids]}, ...]; relative paths are relative to the file.')
+    parser.add_argument('--output', type=str, help='Write the batch results as JSON to this file.')
+    parser.add_argument('--sampling', choices=SAMPLING_POLICIES, default='interval',
+                        help='Frame sampling policy: one frame every --interval seconds, or --num_frames frames in total.')
+    parser.add_argument('--interval', type=float, default=2.0, help='Seconds between analysed frames (default: 2).')
+    parser.add_argument('--num_frames', type=int, help='Number of frames to analyse with --sampling count.')
+    parser.add_argument('--decode', choices=DECODE_STRATEGIES, default='grab',
+                        help='How skipped frames are passed over (default: grab).')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Worker processes; the video is split into this many time segments (default: 1).')
+    parser.add_argument('--roster', type=str,
+                        help='Comma-separated person ids expected in the video; stop once all are found.')
+    parser.add_argument('--time_budget', type=float, help='Stop analysing after this many seconds.')
+    parser.add_argument('--det_size', type=str, default='640x640',
+                        help='Detector input: WxH, or one number for the longest side keeping the aspect ratio (default: 640x640).')
+    parser.add_argument('--det_max_side', type=int,
+                        help='Downscale frames to this longest side before detection; faces are still cropped at full resolution.')
+    parser.add_argument('--min_face_size', type=int, default=0, help='Ignore faces smaller than this many pixels.')
+    parser.add_argument('--max_faces', type=int, default=0, help='Keep at most this many faces per frame (0 = all).')
+    parser.add_argument('--no_tracking', action='store_true',
+                        help='Embed and match every detected face instead of following faces across frames.')
+    parser.add_argument('--motion_gate', action='store_true',
+                        help='Skip face detection on sampled frames that barely differ from the last analysed one.')
+    parser.add_argument('--motion_threshold', type=float, default=0.002,
+                        help='Fraction of (downsampled) pixels that must change for a frame to be analysed (default: 0.002).')
+    parser.add_argument('--motion_max_gap', type=int, default=5,
+                        help='With --motion_gate, analyse at least every this many sampled frames (default: 5).')
+    parser.add_argument('--timing', action='store_true', help='Print the time spent in each pipeline stage.')
+    parser.add_argument('--debug', action='store_true',
+                        help='Log the best gallery candidates and similarities for every embedded face.')
+    parser.add_argument('--log_level', type=str, help='DEBUG, INFO (default), WARNING or ERROR.')
+    parser.add_argument('--log_json', type=str, help='Also append log records as JSON lines to this file.')
     args = parser.parse_args()
+    if not args.video and not args.batch:
+        parser.error("one of --video or --batch is required")
+    configure_logging(level=args.log_level, json_path=args.log_json)
     
-    # Convert to absolute path
-    video_path = os.path.abspath(args.video)
-    
-    success = analyze_video(video_path)
+    sampler = FrameSampler(policy=args.sampling, interval_seconds=args.interval,
+                           num_frames=args.num_frames, strategy=args.decode)
+    detection = DetectionConfig(det_size=args.det_size, max_side=args.det_max_side,
+                                min_face_size=args.min_face_size, max_faces=args.max_faces)
+    roster = [p.strip() for p in args.roster.split(",") if p.strip()] if args.roster else None
+    motion = MotionGate(threshold=args.motion_threshold, max_gap=args.motion_max_gap) if args.motion_gate else None
+    timings = StageTimings() if args.timing else None
+    if args.batch or len(args.video) > 1:
+        videos = [{"video": os.path.abspath(path), "roster": roster} for path in args.video or []]
+        if args.batch:
+            with open(args.batch, encoding="utf-8") as f:
+                manifest = json.load(f)
+            base_dir = os.path.dirname(os.path.abspath(args.batch))
+            videos += [dict(entry, video=os.path.join(base_dir, entry["video"])) for entry in manifest]
+        results = analyze_videos(videos, workers=args.workers, sampler=sampler, tracking=not args.no_tracking,
+                                 detection=detection, timings=timings, debug=args.debug, motion=motion)
+        for video in results["videos"]:
+            label = f"{video['tag']} ({video['video']})" if video["tag"] else video["video"]
+            if video["success"]:
+                print(f"- {label}: {', '.join(p['person_id'] for p in video['summary']) or 'nobody recognized'}")
+            else:
+                print(f"- {label}: FAILED ({video['error']})")
+        if args.output:
+            os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=2)
+            print(f"📝 Results written to: {args.output}")
+        success = results["success"] and not results["videos_failed"]
+    else:
+        # Convert to absolute path
+        video_path = os.path.abspath(args.video[0])
+        success = analyze_video(video_path, sampler=sampler, workers=args.workers,
+                                roster=roster, time_budget=args.time_budget, tracking=not args.no_tracking,
+                                detection=detection, timings=timings, debug=args.debug, motion=motion)
+    if timings is not None:
+        print("\n[*] Time per stage:")
+        for stage, entry in timings.to_dict()["stages"].items():
+            print(f"  {stage:<8} {entry['seconds']:8.3f}s  ({entry['calls']} calls)")
     
     if not success:
         exit(1)
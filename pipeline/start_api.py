@@ -4,6 +4,8 @@ Startup script for the Pipeline API Server
 This script ensures the API server starts with proper configuration
 """
 
+import argparse
+import importlib.util
 import os
 import sys
 
@@ -14,13 +16,46 @@ sys.path.insert(0, current_dir)
 # Set up environment
 os.chdir(current_dir)
 
+def run_production(threads):
+    """Serves wsgi:application with gunicorn (POSIX) or waitress (Windows); never returns."""
+    if os.name != "nt" and importlib.util.find_spec("gunicorn"):
+        print("🏭 Starting gunicorn (settings in gunicorn.conf.py)...")
+        os.execvp(sys.executable, [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "wsgi:application"])
+    if importlib.util.find_spec("waitress"):
+        # waitress has no worker processes; one process serves requests from a thread pool
+        from waitress import serve
+        from wsgi import application, start_gallery_watcher
+        print(f"🏭 Starting waitress with {threads} threads...")
+        start_gallery_watcher()
+        host, port = os.environ.get("PIPELINE_BIND", "0.0.0.0:5000").rsplit(":", 1)
+        serve(application, host=host, port=int(port), threads=threads)
+        sys.exit(0)
+    print("❌ Production mode needs gunicorn (Linux/macOS) or waitress (Windows):")
+    print("pip install -r requirements.txt")
+    sys.exit(1)
+
 # Import and run the API server
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Start the Pipeline API Server.")
+    parser.add_argument('--warmup', action='store_true',
+                        help='Load the face recognition model at startup instead of on the first request')
+    parser.add_argument('--production', action='store_true',
+                        help='Serve with a production WSGI server instead of the Flask development server')
+    args = parser.parse_args()
+
     print("🚀 Starting Pipeline API Server...")
     print(f"📁 Working directory: {current_dir}")
     
     try:
+        if args.production:
+            run_production(threads=int(os.environ.get("PIPELINE_WEB_THREADS", "8")))
         from api_server import app
+        # With debug=True the Werkzeug reloader re-runs this script in a child
+        # process; only warm up the child that actually serves requests.
+        if args.warmup and os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+            from face_lib.engine import get_shared_engine
+            print("🔥 Warming up face recognition model...")
+            get_shared_engine()
         app.run(host="0.0.0.0", port=5000, debug=True)
     except ImportError as e:
         print(f"❌ Import error: {e}")
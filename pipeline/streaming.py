@@ -0,0 +1,76 @@
+"""
+Feeds an HTTP upload to the video decoder while it is still arriving
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+
+CHUNK_SIZE = 1 << 20
+
+
+class UploadPipe:
+    """Exposes an incoming upload stream as a path that cv2.VideoCapture can open.
+
+    On POSIX systems the path is a named pipe (FIFO) and a background thread
+    copies the upload into it, so decoding starts with the first bytes instead
+    of after the whole file has been saved, and no copy of the video is kept on
+    disk. This only works for containers that can be read front to back
+    (MKV/WebM, MPEG-TS, fragmented or "faststart" MP4); an MP4 whose index sits
+    at the end of the file cannot be decoded from a pipe.
+
+    Where named pipes are unavailable (Windows) the upload is saved to a
+    temporary file first, as the regular endpoint does.
+    """
+
+    def __init__(self, stream, suffix=".mp4", chunk_size=CHUNK_SIZE):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.bytes_received = 0
+        self.error = None
+        self.streaming = hasattr(os, "mkfifo")
+        self._dir = tempfile.mkdtemp(prefix="pipeline_upload_")
+        self.path = os.path.join(self._dir, "upload" + suffix)
+        self._thread = None
+
+    def start(self):
+        """Starts feeding the upload. Returns self."""
+        if self.streaming:
+            os.mkfifo(self.path)
+            self._thread = threading.Thread(target=self._pump, name="upload-pipe", daemon=True)
+            self._thread.start()
+        else:
+            with open(self.path, "wb") as f:
+                self._copy(f)
+        return self
+
+    def _copy(self, out):
+        while True:
+            chunk = self.stream.read(self.chunk_size)
+            if not chunk:
+                break
+            out.write(chunk)
+            self.bytes_received += len(chunk)
+
+    def _pump(self):
+        try:
+            # Blocks until the decoder opens the other end
+            with open(self.path, "wb") as fifo:
+                self._copy(fifo)
+        except (BrokenPipeError, OSError) as e:
+            # The decoder stopped reading (finished early or gave up)
+            self.error = e
+
+    def close(self):
+        """Stops feeding the decoder and removes the pipe or temporary file."""
+        if self._thread is not None and self._thread.is_alive():
+            # If the decoder never opened the pipe the writer is still blocked in
+            # open(); opening the read end ourselves lets it fail and exit.
+            try:
+                fd = os.open(self.path, os.O_RDONLY | os.O_NONBLOCK)
+                os.close(fd)
+            except OSError:
+                pass
+            self._thread.join(timeout=5)
+        shutil.rmtree(self._dir, ignore_errors=True)
@@ -46,9 +46,17 @@ def test_pipeline_integration():
     print("\n📋 Available endpoints:")
     print("  - POST /enroll (student enrollment)")
     print("  - POST /enroll-professor (professor enrollment)")
-    print("  - POST /video_recognize (video analysis)")
+    print("  - POST /enroll/bulk (zip with one folder per person, async=1 for a background job)")
+    print("  - POST /video_recognize (video analysis, async=1 for a background job)")
+    print("  - POST /video_recognize/stream (raw video body, NDJSON results while uploading)")
+    print("  - POST /video_recognize/batch (many videos with tags/rosters, one shared worker pool)")
+    print("  - GET /jobs/<job_id> (job progress and result)")
+    print("  - DELETE /jobs/<job_id> (cancel job)")
+    print("  - POST /live/<session_id>/recognitions (live session flush from live_attendance.py)")
+    print("  - GET /live/<session_id> (latest recognitions of a live session)")
     print("  - POST /delete_person (delete person)")
     print("  - GET /health (health check)")
+    print("  - GET /metrics (Prometheus metrics)")
     
     print(f"\n📁 Database directory: {os.path.abspath('data/output/embeddings/known_db')}")
     
@@ -0,0 +1,59 @@
+"""
+Production WSGI entry point for the Pipeline API Server
+
+    gunicorn -c gunicorn.conf.py wsgi:application      (Linux/macOS)
+    python start_api.py --production                   (picks gunicorn or waitress)
+
+The face models and the gallery are loaded here, at import time. With
+gunicorn's preload_app the master imports this module once before forking
+its workers, so every worker shares the same model and gallery pages
+copy-on-write instead of loading its own copy. Set PIPELINE_PRELOAD=0 to
+let each worker load them on first use instead.
+"""
+
+import os
+import threading
+import time
+
+from api_server import PIPELINE_DB_DIR, app
+from face_lib.engine import get_shared_engine
+from face_lib.gallery import get_gallery
+from face_lib.log import get_logger
+
+logger = get_logger("wsgi")
+
+def preload():
+    """Loads the shared engine and the gallery into this process."""
+    get_shared_engine()
+    gallery = get_gallery(PIPELINE_DB_DIR)
+    logger.info("🔥 Preloaded face models and %d enrolled people", len(gallery))
+
+def start_gallery_watcher(interval=None):
+    """Reloads the gallery in the background whenever known_db changes.
+
+    Run once in every worker (gunicorn's post_fork hook does this). An
+    enrollment handled by one worker, or a migration or CLI enrollment
+    writing to known_db, bumps the store version; every other worker then
+    swaps in the new gallery within `interval` seconds
+    (PIPELINE_GALLERY_WATCH, default 2). Requests keep matching against
+    the previous snapshot while it loads, so nothing waits on the reload.
+    """
+    interval = interval or float(os.environ.get("PIPELINE_GALLERY_WATCH", "2"))
+
+    def watch():
+        gallery = get_gallery(PIPELINE_DB_DIR)
+        while True:
+            try:
+                gallery.refresh()
+            except Exception as e:
+                logger.warning("⚠️ Warning: Gallery reload failed: %s", e)
+            time.sleep(interval)
+
+    thread = threading.Thread(target=watch, name="gallery-watcher", daemon=True)
+    thread.start()
+    return thread
+
+if os.environ.get("PIPELINE_PRELOAD", "1") != "0":
+    preload()
+
+application = app